@@ -0,0 +1,258 @@
+# benchmarks/bench_database.py - database.py mikro-benchmarklari (2k / 50k / 500k qator)
+#
+# Har bir hajm uchun vaqtinchalik bazaga sintetik talabalar va javoblar
+# yoziladi, so'ng public Database metodlari (executor bilan birga) o'lchanadi:
+#   find_student (unique_id, passport, jshshir, talaba_id),
+#   add_student (yangi / mavjud), save_survey_response (yangi / qayta),
+#   get_statistics, get_all_responses, clear_all_surveys.
+# Natija JSON faylga yoziladi (commit, python va sqlite versiyalari bilan).
+# --compare bilan oldingi natijaga solishtiriladi: biror amal medianasi
+# `--threshold` dan ko'proq sekinlashsa skript 1 kodi bilan tugaydi.
+#
+# Ishlatish:
+#   python benchmarks/bench_database.py --json db_base.json
+#   python benchmarks/bench_database.py --scales 2000,50000 --json db_new.json --compare db_base.json
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database import Database  # noqa: E402
+
+FACULTIES = ("Iqtisodiyot", "Axborot texnologiyalari", "Pedagogika", "Tibbiyot", "Filologiya", "Huquq")
+
+# Shovqin chegarasi: bundan kichik farqlar regressiya hisoblanmaydi (ms)
+NOISE_MS = 0.05
+
+
+def make_student(i: int) -> dict:
+    return {
+        'row': i,
+        'unique_id': str(i),
+        'fullname': f"Talaba {i}",
+        'passport': f"AB{i:07d}",
+        'jshshir': f"{30000000000000 + i}",
+        'talaba_id': f"{300000000000 + i}",
+        'faculty': FACULTIES[i % len(FACULTIES)],
+        'course': str(i % 4 + 1),
+        'group_name': f"{i % 400}-guruh",
+        'phone': f"+99890{i % 10000000:07d}",
+    }
+
+
+def make_response(unique_id: str, user_id: int) -> dict:
+    return {
+        'user_id': user_id,
+        'unique_id': unique_id,
+        'fullname': f"Talaba {unique_id}",
+        'phone': "+998901234567",
+        'permanent_address': "Andijon viloyati, Andijon shahri, Ozodlik MFY, 23-uy",
+        'permanent_location': "40.78,72.35",
+        'previous_education': "5-maktab",
+        'document_number': "AT1234567",
+        'has_achievements': "Yo'q",
+        'has_certificate': "Ha",
+        'certificate_type': "IELTS",
+        'certificate_details': "6.5",
+        'has_grant': "Yo'q",
+        'social_protection': "Yo'q",
+        'iron_book': "Yo'q",
+        'youth_book': "Yo'q",
+        'father_name': "Karimov Karim",
+        'father_alive': "Ha",
+        'mother_name': "Karimova Malika",
+        'mother_alive': "Ha",
+        'parents_together': "Ha",
+        'living_type': "Uydan",
+        'is_working': "Yo'q",
+        'is_married': "Yo'q",
+        'has_foreign_passport': "Yo'q",
+        'has_social_channels': "Yo'q",
+    }
+
+
+def summarize(samples: list) -> dict:
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        'ops': n,
+        'total_s': round(sum(ordered), 6),
+        'mean_ms': round(sum(ordered) / n * 1000, 4),
+        'p50_ms': round(ordered[n // 2] * 1000, 4),
+        'p95_ms': round(ordered[min(n - 1, int(n * 0.95))] * 1000, 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+    }
+
+
+async def measure(calls) -> dict:
+    """calls - korutina yaratuvchi funksiyalar ro'yxati, ketma-ket bajariladi"""
+    samples = []
+    for call in calls:
+        start = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+async def seed(db: Database, students: int, response_ratio: float) -> dict:
+    results = {}
+    start = time.perf_counter()
+    chunk = 20000
+    for offset in range(1, students + 1, chunk):
+        await db.bulk_upsert_students([make_student(i) for i in range(offset, min(offset + chunk, students + 1))])
+    results['seed_students'] = summarize([time.perf_counter() - start])
+
+    # Javoblar to'g'ridan-to'g'ri (executemany) - save_survey_response alohida o'lchanadi
+    answered = int(students * response_ratio)
+    fields = tuple(make_response('1', 1))
+    sql = f"INSERT INTO survey_responses ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})"
+    start = time.perf_counter()
+    for offset in range(1, answered + 1, chunk):
+        rows = [
+            tuple(make_response(str(i), 100000 + i).values())
+            for i in range(offset, min(offset + chunk, answered + 1))
+        ]
+        await db.run_write(lambda cursor: cursor.executemany(sql, rows))
+    results['seed_responses'] = summarize([time.perf_counter() - start])
+    return results
+
+
+async def run_scale(students: int, ops: int, response_ratio: float, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        await db.init_db()
+        results = await seed(db, students, response_ratio)
+        answered = int(students * response_ratio)
+
+        # find_student: har bir identifikator turi, tasodifiy mavjud talabalar
+        picks = [rng.randint(1, students) for _ in range(ops)]
+        for kind, value_of in (
+            ('unique_id', lambda i: str(i)),
+            ('passport', lambda i: f"ab{i:07d}"),
+            ('jshshir', lambda i: f"{30000000000000 + i}"),
+            ('talaba_id', lambda i: f"{300000000000 + i}"),
+        ):
+            results[f'find_student.{kind}'] = await measure(
+                [lambda v=value_of(i): db.find_student(v) for i in picks]
+            )
+        results['find_student.missing'] = await measure(
+            [lambda v=f"ZZ{i:07d}": db.find_student(v) for i in range(ops)]
+        )
+
+        # add_student: yangi talaba (INSERT) va mavjudini yangilash (UPDATE)
+        new_ids = range(students + 1, students + ops + 1)
+        results['add_student.insert'] = await measure(
+            [lambda d={**make_student(i), 'unique_id': None}: db.add_student(d) for i in new_ids]
+        )
+        results['add_student.update'] = await measure(
+            [lambda d={**make_student(i), 'unique_id': None, 'phone': '+998911111111'}: db.add_student(d) for i in picks]
+        )
+
+        # save_survey_response: javob bermagan talabalar (yangi) va qayta topshirish
+        fresh = [str(i) for i in range(answered + 1, min(students, answered + ops) + 1)]
+        results['save_survey_response.new'] = await measure(
+            [lambda d=make_response(uid, 500000000 + n): db.save_survey_response(d) for n, uid in enumerate(fresh)]
+        )
+        resubmit = [str(rng.randint(1, max(answered, 1))) for _ in range(ops)]
+        results['save_survey_response.resubmit'] = await measure(
+            [lambda d=make_response(uid, 600000000 + n): db.save_survey_response(d) for n, uid in enumerate(resubmit)]
+        )
+
+        results['get_statistics'] = await measure([db.get_statistics] * ops)
+        results['get_all_responses'] = await measure([db.get_all_responses] * 3)
+        results['clear_all_surveys'] = await measure([db.clear_all_surveys])
+
+        db.close()
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or 'unknown'
+    except Exception:
+        return 'unknown'
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> int:
+    """Sekinlashgan amallar sonini qaytaradi"""
+    regressions = 0
+    print(f"\nSolishtirish: {baseline['meta'].get('commit')} -> {current['meta'].get('commit')}")
+    for scale, ops in current['scales'].items():
+        base_ops = baseline['scales'].get(scale)
+        if not base_ops:
+            continue
+        for name, stats in ops.items():
+            base = base_ops.get(name)
+            if not base or not base['p50_ms']:
+                continue
+            # Mediana - GC va fon jarayonlari pauzalariga chidamliroq
+            ratio = stats['p50_ms'] / base['p50_ms']
+            slower = ratio > 1 + threshold and stats['p50_ms'] - base['p50_ms'] > NOISE_MS
+            regressions += slower
+            mark = '❌' if slower else ('✅' if ratio < 1 - threshold else '  ')
+            print(f" {mark} {scale:>7} {name:<32} {base['p50_ms']:10.3f} -> {stats['p50_ms']:10.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="database.py micro-benchmarks")
+    parser.add_argument('--scales', default='2000,50000,500000', help="talabalar soni, vergul bilan")
+    parser.add_argument('--ops', type=int, default=200, help="har bir amal necha marta o'lchanadi")
+    parser.add_argument('--response-ratio', type=float, default=0.3, help="javob bergan talabalar ulushi")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="natija fayli (default: bench_database_<commit>.json)")
+    parser.add_argument('--compare', help="oldingi natija fayli bilan solishtirish")
+    parser.add_argument('--threshold', type=float, default=0.25, help="ruxsat etilgan sekinlashish (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    result = {
+        'meta': {
+            'commit': commit,
+            'date': datetime.now().isoformat(' ', 'seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'ops': args.ops,
+            'response_ratio': args.response_ratio,
+        },
+        'scales': {},
+    }
+
+    for scale in (int(s) for s in args.scales.split(',') if s.strip()):
+        print(f"\n=== {scale} talaba ===")
+        ops = asyncio.run(run_scale(scale, args.ops, args.response_ratio, args.seed))
+        result['scales'][str(scale)] = ops
+        for name, stats in ops.items():
+            print(f"  {name:<32} {stats['ops']:>5} ta  o'rtacha {stats['mean_ms']:10.3f}ms  "
+                  f"p95 {stats['p95_ms']:10.3f}ms")
+
+    json_path = args.json or f"bench_database_{commit}.json"
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nNatija: {json_path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
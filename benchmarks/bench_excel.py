@@ -0,0 +1,196 @@
+# benchmarks/bench_excel.py - Excel import/export benchmarki (sintetik roster korpusi)
+#
+# Har bir korpus fayli (make_excel_corpus.py) uchun vaqtinchalik bazada:
+#   import_students (bo'sh baza - INSERT yo'li), import_students (qayta - UPDATE yo'li),
+#   export_students, export_survey_responses (to'liq qurish, kesh protsess ichida)
+# o'lchanadi. Har bir amal alohida bola protsessda bajariladi - shunda eng
+# yuqori RSS (peak RSS) aynan shu amalga tegishli bo'ladi. Hisobot: vaqt,
+# qatorlar/s, peak RSS va importdan oldingi boshlang'ich RSS dan o'sish.
+#
+# Ishlatish:
+#   python benchmarks/bench_excel.py
+#   python benchmarks/bench_excel.py --rows 2500,25000 --response-ratio 0.5 --json excel.json
+#   python benchmarks/bench_excel.py --files data/excel_files/roster.xlsx
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from make_excel_corpus import DEFAULT_OUT, ensure_corpus  # noqa: E402
+from bench_database import git_commit, make_response  # noqa: E402
+
+# (amal, bola protsess argumenti) - tartib muhim: har biri oldingisining bazasidan foydalanadi
+STEPS = (
+    ('import_students.fresh', 'import'),
+    ('import_students.again', 'import'),
+    ('seed_responses', 'seed'),
+    ('export_students', 'export_students'),
+    ('export_survey_responses', 'export_responses'),
+)
+
+
+def peak_rss_mb() -> float:
+    """Protsessning eng yuqori RSS qiymati (MB), mavjud bo'lmasa 0"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux - KB, macOS - bayt
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+async def child_step(step: str, file_path: str, workdir: str, response_ratio: float, seed: int) -> dict:
+    """Bola protsessda bitta amal: natija JSON sifatida qaytariladi"""
+    from database import Database
+    from excel_handler import ExcelHandler
+
+    db = Database(os.path.join(workdir, 'bench.db'))
+    await db.init_db()
+    handler = ExcelHandler(db, os.path.join(workdir, 'excel'), os.path.join(workdir, 'exports'))
+    baseline = peak_rss_mb()
+    result = {}
+
+    start = time.perf_counter()
+    # ExcelHandler jarayonni print qiladi - o'lchov chiqishini buzmasligi uchun yutiladi
+    with contextlib.redirect_stdout(io.StringIO()):
+        if step == 'import':
+            outcome = await handler.import_students(file_path)
+            result = {'rows': outcome['rows'], 'added': outcome['added'],
+                      'updated': outcome['updated'], 'errors': len(outcome['errors']),
+                      'ok': outcome['success']}
+        elif step == 'seed':
+            result = {'rows': await seed_responses(db, response_ratio, seed), 'ok': True}
+        elif step == 'export_students':
+            result = {'ok': bool(await handler.export_students())}
+        elif step == 'export_responses':
+            result = {'ok': bool(await handler.export_survey_responses())}
+        else:
+            raise ValueError(f"Unknown step: {step}")
+    wall = time.perf_counter() - start
+    if step.startswith('export'):
+        table = 'students' if step == 'export_students' else 'survey_responses'
+        result['rows'] = await db.run_read(count_rows, table)
+
+    db.close()
+    result.update({
+        'wall_s': round(wall, 3),
+        'rows_per_s': round(result['rows'] / wall, 1) if wall else 0.0,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_growth_mb': round(peak_rss_mb() - baseline, 1),
+    })
+    return result
+
+
+def count_rows(cursor, table: str) -> int:
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+async def seed_responses(db, response_ratio: float, seed: int) -> int:
+    """Import qilingan talabalarning bir qismiga javob yozish (export uchun)"""
+    unique_ids = await db.run_read(
+        lambda cursor: [row[0] for row in cursor.execute("SELECT unique_id FROM students").fetchall()]
+    )
+    picked = random.Random(seed).sample(unique_ids, int(len(unique_ids) * response_ratio))
+    fields = tuple(make_response('1', 1))
+    sql = f"INSERT INTO survey_responses ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})"
+    rows = [tuple(make_response(uid, 100000 + n).values()) for n, uid in enumerate(picked)]
+    await db.run_write(lambda cursor: cursor.executemany(sql, rows))
+    return len(rows)
+
+
+def run_step(step: str, file_path: str, workdir: str, response_ratio: float, seed: int) -> dict:
+    """Amalni yangi protsessda bajarish: peak RSS faqat shu amalniki"""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', step, '--file', file_path,
+         '--workdir', workdir, '--response-ratio', str(response_ratio), '--seed', str(seed)],
+        capture_output=True, text=True, cwd=workdir,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{step} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_file(file_path: str, response_ratio: float, seed: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, step in STEPS:
+            results[name] = stats = run_step(step, file_path, workdir, response_ratio, seed)
+            if step == 'seed':
+                print(f"  {name:<32} {stats['rows']:>8} ta")
+                continue
+            print(f"  {name:<32} {stats['rows']:>8} qator  {stats['wall_s']:8.2f}s  "
+                  f"{stats['rows_per_s']:>10.0f} qator/s  peak {stats['peak_rss_mb']:7.1f}MB "
+                  f"(+{stats['rss_growth_mb']:.1f}MB){'' if stats['ok'] else '  ❌'}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel import/export benchmark")
+    parser.add_argument('--rows', default='2500,25000,100000', help="korpus hajmlari, vergul bilan")
+    parser.add_argument('--files', help="tayyor roster fayllari (vergul bilan) - --rows o'rniga")
+    parser.add_argument('--corpus', default=DEFAULT_OUT, help="korpus papkasi")
+    parser.add_argument('--response-ratio', type=float, default=0.3, help="javob bergan talabalar ulushi")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="natijani JSON faylga yozish")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--file', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(child_step(args.child, args.file, args.workdir, args.response_ratio, args.seed))
+        print(json.dumps(result))
+        return
+
+    if args.files:
+        files = [os.path.abspath(f) for f in args.files.split(',') if f.strip()]
+    else:
+        sizes = [int(s) for s in args.rows.split(',') if s.strip()]
+        print(f"Korpus: {args.corpus}")
+        files = ensure_corpus(os.path.abspath(args.corpus), sizes, seed=args.seed)
+
+    result = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now().isoformat(' ', 'seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'response_ratio': args.response_ratio,
+        },
+        'files': {},
+    }
+    failed = 0
+    for file_path in files:
+        print(f"\n=== {os.path.basename(file_path)} ({os.path.getsize(file_path) / 1e6:.1f}MB) ===")
+        steps = run_file(file_path, args.response_ratio, args.seed)
+        result['files'][os.path.basename(file_path)] = steps
+        failed += sum(not stats['ok'] for stats in steps.values())
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nNatija: {args.json}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
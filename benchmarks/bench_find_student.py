@@ -0,0 +1,122 @@
+# benchmarks/bench_find_student.py - find_student indexlarini tekshirish
+#
+# Vaqtinchalik bazaga N ta sintetik talaba yoziladi, so'ng har bir
+# identifikator turi uchun:
+#   1) EXPLAIN QUERY PLAN - student_lookup_queries dagi har bir so'rov rejasi
+#      index bo'yicha qidiruv (SEARCH students USING ... INDEX) bo'lishi
+#   2) o'rtacha qidiruv vaqti
+# tekshiriladi. Reja index SEARCH bo'lmasa yoki qidiruv chegaradan sekin
+# bo'lsa skript 1 kodi bilan tugaydi.
+#
+# Repoda test to'plami yo'q - bu skript find_student uchun regressiya
+# tekshiruvi: database.py dagi qidiruv yoki indexlar o'zgarganda ishga
+# tushiriladi (--plans-only - faqat rejalar, bir necha soniyada).
+#
+# Ishlatish:
+#   python benchmarks/bench_find_student.py --students 100000
+#   python benchmarks/bench_find_student.py --plans-only
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+
+def make_student(i: int) -> dict:
+    return {
+        'row': i,
+        'fullname': f"Talaba {i}",
+        'passport': f"AB{i:07d}",
+        'jshshir': f"{30000000000000 + i}",
+        'talaba_id': f"{300000000000 + i}",
+        'group_name': f"{i % 400}-guruh",
+    }
+
+
+def lookup_samples(n: int) -> dict:
+    i = n // 2
+    return {
+        'passport': f"ab{i:07d}",
+        'jshshir': f"{30000000000000 + i}",
+        'talaba_id': f"{300000000000 + i}",
+        'unique_id': str(i),
+    }
+
+
+def index_search(plan: str) -> bool:
+    """Reja students jadvalini faqat index orqali qidiradimi"""
+    steps = [step for step in plan.split(' | ') if 'students' in step]
+    return bool(steps) and all(step.startswith('SEARCH') and 'INDEX' in step for step in steps)
+
+
+def explain(db: Database, cursor, search_value: str) -> list:
+    plans = []
+    for sql, params in db.student_lookup_queries(search_value):
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        plans.append(' | '.join(row['detail'] for row in cursor.fetchall()))
+    return plans
+
+
+async def run(students: int, lookups: int, max_ms: float, plans_only: bool = False) -> int:
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        await db.init_db()
+
+        start = time.perf_counter()
+        chunk = 20000
+        for offset in range(1, students + 1, chunk):
+            batch = [make_student(i) for i in range(offset, min(offset + chunk, students + 1))]
+            await db.bulk_upsert_students(batch)
+        print(f"{students} ta talaba yozildi: {time.perf_counter() - start:.2f}s\n")
+
+        for kind, value in lookup_samples(students).items():
+            plans = await db.run_read(lambda cursor: explain(db, cursor, value))
+            scan = not all(index_search(plan) for plan in plans)
+            if plans_only:
+                failed += scan
+                print(f"[{'FAIL' if scan else 'OK'}] {kind}")
+                for plan in plans:
+                    print(f"       {plan}")
+                continue
+
+            # Sof SQL vaqti (executor overheadsiz)
+            def timed(cursor):
+                t0 = time.perf_counter()
+                for _ in range(lookups):
+                    found = db._find_student(cursor, value)
+                return (time.perf_counter() - t0) / lookups * 1000, found
+
+            avg_ms, found = await db.run_read(timed)
+            status = 'OK'
+            if scan or not found or avg_ms > max_ms:
+                status = 'FAIL'
+                failed += 1
+            print(f"[{status}] {kind:<10} {avg_ms:.4f} ms")
+            for plan in plans:
+                print(f"       {plan}")
+
+        db.close()
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="find_student index benchmark")
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--max-ms', type=float, default=1.0, help="bitta qidiruv uchun chegara (ms)")
+    parser.add_argument('--plans-only', action='store_true',
+                        help="faqat EXPLAIN rejalarini tekshirish (vaqt o'lchanmaydi)")
+    args = parser.parse_args()
+    students = min(args.students, 2000) if args.plans_only else args.students
+    sys.exit(asyncio.run(run(students, args.lookups, args.max_ms, args.plans_only)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/bench_roster_parse.py - roster normalizatsiyasi: qatorma-qator vs vektorli
+#
+# Eski import_students dagi qatorma-qator sikl (df.iloc[row_idx] + safe_get)
+# va yangi normalize_roster() bir xil DataFrame ustida ishga tushiriladi.
+# Natijalar bir xilligi tekshiriladi va ikkala usul vaqti chiqariladi.
+# Natijalar farq qilsa skript 1 kodi bilan tugaydi.
+#
+# Ishlatish:
+#   python benchmarks/bench_roster_parse.py
+#   python benchmarks/bench_roster_parse.py --file "IT va ijtimoiy umumiy ro'yhad.xlsx" --repeat 5
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from excel_handler import normalize_roster  # noqa: E402
+
+
+def legacy_parse(df: pd.DataFrame) -> list:
+    """Eski (qatorma-qator) parser - taqqoslash uchun"""
+    records = []
+    for row_idx in range(1, len(df)):
+        row = df.iloc[row_idx]
+
+        fullname = str(row.iloc[2]).strip() if pd.notna(row.iloc[2]) else None
+        if not fullname or fullname.replace('.', '').isdigit() or fullname.lower() == 'nan':
+            continue
+
+        passport = str(row.iloc[10]).strip().upper() if len(row) > 10 and pd.notna(row.iloc[10]) else None
+        if not passport or passport == 'NAN':
+            continue
+
+        jshshir = str(row.iloc[11]).strip() if len(row) > 11 and pd.notna(row.iloc[11]) else None
+        if jshshir:
+            jshshir = jshshir.replace('.0', '').strip()
+            if jshshir.lower() == 'nan' or not jshshir.isdigit():
+                jshshir = None
+
+        talaba_id = str(row.iloc[1]).strip() if len(row) > 1 and pd.notna(row.iloc[1]) else None
+        if talaba_id:
+            talaba_id = talaba_id.replace('.0', '').strip()
+            if talaba_id.lower() == 'nan':
+                talaba_id = None
+
+        def text(idx):
+            if len(row) > idx and pd.notna(row.iloc[idx]):
+                val = str(row.iloc[idx]).strip()
+                return val if val.lower() != 'nan' else None
+            return None
+
+        def safe_get(idx, default=None):
+            if len(row) > idx and pd.notna(row.iloc[idx]):
+                val = str(row.iloc[idx]).strip().replace('.0', '')
+                return val if val.lower() != 'nan' else default
+            return default
+
+        records.append({
+            'row': row_idx + 1,
+            'talaba_id': talaba_id,
+            'fullname': fullname,
+            'citizenship': safe_get(3),
+            'country': safe_get(4),
+            'nationality': safe_get(5),
+            'region': safe_get(6),
+            'district': safe_get(7),
+            'gender': safe_get(8),
+            'birth_date': text(9),
+            'passport': passport,
+            'jshshir': jshshir,
+            'passport_date': text(12),
+            'course': safe_get(13),
+            'faculty': safe_get(14),
+            'group_name': safe_get(15),
+            'language': safe_get(16),
+            'study_year': safe_get(17),
+            'semester': safe_get(18),
+            'graduate': safe_get(19),
+            'specialty': safe_get(20),
+            'education_type': safe_get(21),
+            'education_form': safe_get(22),
+            'payment_type': safe_get(23),
+            'grant_type': safe_get(24),
+            'previous_education': safe_get(25),
+            'student_category': safe_get(26),
+            'social_category': safe_get(27),
+            'family_members': safe_get(28),
+        })
+    return records
+
+
+def best_of(fn, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roster parser benchmark")
+    parser.add_argument('--file', default=os.path.join(ROOT, "IT va ijtimoiy umumiy ro'yhad.xlsx"))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scale', type=int, default=1, help="DataFrame ni necha marta takrorlash")
+    args = parser.parse_args()
+
+    df = pd.read_excel(args.file, sheet_name=0, header=None, dtype=str, engine='openpyxl')
+    if args.scale > 1:
+        df = pd.concat([df] + [df.iloc[1:]] * (args.scale - 1), ignore_index=True)
+    print(f"{len(df) - 1} qator, {len(df.columns)} ustun\n")
+
+    legacy_time, legacy = best_of(lambda: legacy_parse(df), args.repeat)
+    vector_time, vector = best_of(lambda: normalize_roster(df.iloc[1:]), args.repeat)
+
+    print(f"qatorma-qator : {legacy_time:.3f}s ({len(legacy)} ta yozuv)")
+    print(f"vektorli      : {vector_time:.3f}s ({len(vector)} ta yozuv)")
+    print(f"tezlashish    : {legacy_time / vector_time:.1f}x")
+
+    if legacy != vector:
+        diffs = [
+            (a['row'], key, a[key], b.get(key))
+            for a, b in zip(legacy, vector)
+            for key in a
+            if a[key] != b.get(key)
+        ]
+        print(f"\n❌ Natijalar farq qiladi ({len(diffs)} ta maydon):")
+        for diff in diffs[:20]:
+            print(f"   qator {diff[0]}: {diff[1]} {diff[2]!r} != {diff[3]!r}")
+        sys.exit(1)
+    print("\n✅ Natijalar bir xil")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+# benchmarks/bench_routing.py - update marshrutlash (routing) narxi: oddiy Router va IndexedRouter
+#
+# bot.py dagi barcha handlerlar (filtrlari bilan) ikki routerga ko'chiriladi:
+# aiogram ning oddiy Router (handlerlar ro'yxati tartib bo'yicha tekshiriladi)
+# va dispatch.IndexedRouter (FSM holati / callback data indeksi). Handler
+# funksiyalari bo'sh stub bilan almashtiriladi - o'lchanadigan narsa faqat
+# filtrlarni tekshirib handlerni topish vaqti (observer.trigger).
+# Har bir SurveyStates holati uchun mos update (matn, lokatsiya yoki tugma),
+# shuningdek admin callbacklari, "orqaga" prefiksi va hech bir handlerga mos
+# kelmaydigan update o'lchanadi. Ikkala router bir xil handlerni tanlashi
+# tekshiriladi (farq bo'lsa skript 1 kodi bilan tugaydi).
+#
+# Ishlatish:
+#   python benchmarks/bench_routing.py
+#   python benchmarks/bench_routing.py --iterations 5000 --json routing.json
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_harness import load_bot_module  # noqa: E402
+
+
+def make_stub(name: str):
+    async def handler(*args, **kwargs):
+        return name
+    handler.__name__ = name
+    return handler
+
+
+def copy_router(source, router_class):
+    """Handlerlar va filtrlar nusxasi, funksiyalar stub bilan"""
+    router = router_class()
+    for event_name in ('message', 'callback_query'):
+        target = router.observers[event_name]
+        for handler in source.observers[event_name].handlers:
+            filters = [f.magic if f.magic is not None else f.callback for f in handler.filters or ()]
+            target.register(make_stub(handler.callback.__name__), *filters, flags=handler.flags)
+    return router
+
+
+def build_events(bot_module) -> list:
+    """(nom, update turi, event, raw_state) ro'yxati"""
+    from aiogram.types import CallbackQuery, Message
+    from survey_flow import CHOICE, LOCATION, MESSAGE_KINDS, SURVEY, YES_NO
+
+    bot = bot_module.bot
+    user = {'id': 700000001, 'is_bot': False, 'first_name': "Talaba"}
+
+    def message(**content):
+        return Message.model_validate({
+            'message_id': 1, 'date': int(time.time()),
+            'chat': {'id': user['id'], 'type': 'private'}, 'from': user, **content,
+        }, context={'bot': bot})
+
+    def callback(data: str):
+        return CallbackQuery.model_validate({
+            'id': '1', 'from': user, 'chat_instance': '1', 'data': data,
+            'message': {'message_id': 1, 'date': int(time.time()),
+                        'chat': {'id': user['id'], 'type': 'private'}, 'text': ''},
+        }, context={'bot': bot})
+
+    states = bot_module.SurveyStates
+    admin = bot_module.AdminStates
+    events = [('entering_search', 'message', message(text="AB1234567"), states.entering_search.state)]
+    for question in SURVEY.questions:
+        raw_state = getattr(states, question.id).state
+        if question.kind == LOCATION:
+            events.append((question.id, 'message', message(location={'latitude': 40.7, 'longitude': 72.3}), raw_state))
+        elif question.kind in MESSAGE_KINDS:
+            events.append((question.id, 'message', message(text="javob"), raw_state))
+        elif question.kind == YES_NO:
+            events.append((question.id, 'callback_query', callback(f"{question.prefix}yes"), raw_state))
+        elif question.kind == CHOICE:
+            events.append((question.id, 'callback_query', callback(f"{question.prefix}{question.options[0][0]}"), raw_state))
+
+    events += [
+        ('back_q5 (q6 holatida)', 'callback_query', callback("back_q5"), states.q6_achievements.state),
+        ('/start (q12 holatida)', 'message', message(text="/start"), states.q12_youth_book.state),
+        ('admin_stats', 'callback_query', callback("admin_stats"), None),
+        ('confirm_clear_no', 'callback_query', callback("confirm_clear_no"), None),
+        ('completion_f_', 'callback_query', callback(f"completion_f_{bot_module.faculty_key('Iqtisodiyot')}"), None),
+        ('waiting_staff_id', 'message', message(text="123456"), admin.waiting_staff_id.state),
+        ('mos kelmaydi: matn (q10)', 'message', message(text="salom"), states.q10_social_protection.state),
+        ('mos kelmaydi: callback', 'callback_query', callback("eski_tugma"), None),
+    ]
+    return events
+
+
+async def measure(observer, event, kwargs: dict, iterations: int, repeats: int) -> float:
+    """Bitta trigger chaqiruvining eng yaxshi o'rtacha vaqti (mikrosoniya)"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await observer.trigger(event, **kwargs)
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best * 1e6
+
+
+async def run(args, bot_module) -> dict:
+    from aiogram import Router
+    from dispatch import IndexedRouter
+
+    plain = copy_router(bot_module.router, Router)
+    indexed = copy_router(bot_module.router, IndexedRouter)
+    survey_states = {name for name in bot_module.SurveyStates.__all_states_names__}
+
+    rows = []
+    mismatches = 0
+    for name, event_name, event, raw_state in build_events(bot_module):
+        kwargs = {'raw_state': raw_state, 'bot': bot_module.bot}
+        plain_observer = plain.observers[event_name]
+        indexed_observer = indexed.observers[event_name]
+
+        plain_result = await plain_observer.trigger(event, **kwargs)
+        indexed_result = await indexed_observer.trigger(event, **kwargs)
+        matched = plain_result if isinstance(plain_result, str) else '-'
+        if plain_result != indexed_result:
+            mismatches += 1
+            print(f"  ❌ {name}: {plain_result} != {indexed_result}")
+
+        plain_us = await measure(plain_observer, event, kwargs, args.iterations, args.repeats)
+        indexed_us = await measure(indexed_observer, event, kwargs, args.iterations, args.repeats)
+        rows.append({
+            'update': name,
+            'type': event_name,
+            'handler': matched,
+            'survey_state': raw_state in survey_states,
+            'handlers': len(plain_observer.handlers),
+            'candidates': len(indexed_observer.candidates(event, raw_state)),
+            'plain_us': round(plain_us, 2),
+            'indexed_us': round(indexed_us, 2),
+        })
+
+    def mean(key, selected):
+        return sum(row[key] for row in selected) / len(selected) if selected else 0.0
+
+    survey_rows = [row for row in rows if row['survey_state']]
+    return {
+        'iterations': args.iterations,
+        'repeats': args.repeats,
+        'updates': rows,
+        'survey_plain_us': round(mean('plain_us', survey_rows), 2),
+        'survey_indexed_us': round(mean('indexed_us', survey_rows), 2),
+        'all_plain_us': round(mean('plain_us', rows), 2),
+        'all_indexed_us': round(mean('indexed_us', rows), 2),
+        'mismatches': mismatches,
+    }
+
+
+def report(result: dict):
+    print(f"{'update':<28} {'handler':<26} {'nomzod':>9} {'Router':>10} {'Indexed':>10} {'tezlik':>7}")
+    for row in result['updates']:
+        print(f"{row['update']:<28} {row['handler']:<26} {row['candidates']:>3}/{row['handlers']:<5} "
+              f"{row['plain_us']:>8.2f}us {row['indexed_us']:>8.2f}us "
+              f"{row['plain_us'] / row['indexed_us']:>6.1f}x")
+    print(f"\nSurveyStates bo'yicha o'rtacha: {result['survey_plain_us']:.2f}us -> "
+          f"{result['survey_indexed_us']:.2f}us "
+          f"({result['survey_plain_us'] / result['survey_indexed_us']:.1f}x)")
+    print(f"Barcha updatelar bo'yicha     : {result['all_plain_us']:.2f}us -> "
+          f"{result['all_indexed_us']:.2f}us "
+          f"({result['all_plain_us'] / result['all_indexed_us']:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-update routing overhead: Router vs IndexedRouter")
+    parser.add_argument('--iterations', type=int, default=2000, help="har bir o'lchovdagi chaqiruvlar soni")
+    parser.add_argument('--repeats', type=int, default=5, help="o'lchovlar soni (eng yaxshisi olinadi)")
+    parser.add_argument('--json', help="natijani JSON faylga yozish")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    bot_module = load_bot_module(tempfile.mkdtemp(prefix='bench_routing_'))
+    result = asyncio.run(run(args, bot_module))
+    report(result)
+
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nNatija: {json_path}")
+    if result['mismatches']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
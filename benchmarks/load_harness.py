@@ -0,0 +1,339 @@
+# benchmarks/load_harness.py - haqiqiy router ustida end-to-end yuklama sinovi
+#
+# bot.py dagi dispatcher va handlerlar o'zgarishsiz ishlatiladi: sintetik
+# Update obyektlari dp.feed_update orqali beriladi, Bot sessiyasi esa
+# tarmoqqa chiqmaydi - yuborilgan so'rovlarni yozib, soxta javob qaytaradi.
+# N ta talaba bir vaqtda /start -> qidiruv -> barcha SurveyStates savollari
+# -> finish_survey yo'lini bosib o'tadi (Ha/Yo'q tarmoqlari tasodifiy).
+# Har bir qadamda talaba FSM holatiga qarab javob beradi.
+#
+# Hisobot: updates/s, update kechikishi p50/p99, har bir FSM holati
+# (handler) bo'yicha p50/p99, DB yozish tezligi va writer bandligi,
+# Telegram API chaqiruvlari. Hamma talaba so'rovnomani tugatmasa skript
+# 1 kodi bilan tugaydi.
+#
+# Ishlatish:
+#   python benchmarks/load_harness.py --students 200
+#   python benchmarks/load_harness.py --students 1000 --api-latency 50 --think 200 --json natija.json
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASE_USER_ID = 700000000
+MAX_STEPS = 80
+
+YES_NO = ('answer_yes', 'answer_no')
+
+# FSM holati -> talaba javobi: ('text', matn) | ('location', None) | ('callback', variantlar)
+STATE_ACTIONS = {
+    'q1_phone': ('text', "+998901234567"),
+    'q2_address': ('text', "Andijon viloyati, Andijon shahri, Ozodlik MFY, 23-uy"),
+    'q3_location': ('location', None),
+    'q4_previous_education': ('text', "Andijon shahri, 5-maktab, 2025-yil"),
+    'q5_document': ('text', "AT1234567"),
+    'q6_achievements': ('callback', YES_NO),
+    'q6_achievements_details': ('text', "Shahmat bo'yicha viloyat chempioni"),
+    'q7_certificate': ('callback', YES_NO),
+    'q7_certificate_type': ('callback', ('cert_ielts', 'cert_milliy', 'cert_cefr', 'cert_other')),
+    'q7_certificate_details': ('text', "IELTS 6.5, 01.01.2025, 01.01.2027"),
+    'q9_grant': ('callback', YES_NO),
+    'q9_grant_details': ('text', "100% 1-yil"),
+    'q10_social_protection': ('callback', YES_NO),
+    'q11_iron_book': ('callback', YES_NO),
+    'q12_youth_book': ('callback', YES_NO),
+    'q13_father_name': ('text', "Karimov Karim Karimovich"),
+    'q14_father_alive': ('callback', YES_NO),
+    'q14_father_phone': ('text', "+998911234567"),
+    'q15_mother_name': ('text', "Karimova Malika"),
+    'q16_mother_alive': ('callback', YES_NO),
+    'q16_mother_phone': ('text', "+998931234567"),
+    'q17_parents_together': ('callback', YES_NO),
+    'q18_living_type': ('callback', ('living_home', 'living_ttj', 'living_rent', 'living_relatives')),
+    'q18_ttj_type': ('callback', ('ttj_kuaf', 'ttj_jevachi', 'ttj_ijara')),
+    'q19_rent_address': ('text', "Andijon shahri, Navoiy ko'chasi, 12-uy"),
+    'q20_rent_location': ('location', None),
+    'q21_rent_owner': ('text', "Aliyev Vali, +998901112233"),
+    'q22_working': ('callback', YES_NO),
+    'q23_workplace': ('text', "Kafe, ofitsiant"),
+    'q24_married': ('callback', YES_NO),
+    'q25_foreign_passport': ('callback', YES_NO),
+    'q26_social_channels': ('callback', YES_NO),
+    'q26_social_links': ('text', "https://t.me/example"),
+}
+
+
+def load_bot_module(workdir: str):
+    """bot.py ni vaqtinchalik baza va kataloglar bilan import qilish"""
+    os.environ.update({
+        'BOT_TOKEN': '123456789:LOADTEST',
+        'SUPER_ADMIN_IDS': '',
+        'CHANNEL_USERNAME': '',
+        'DATABASE_PATH': os.path.join(workdir, 'data', 'survey.db'),
+        'EXCEL_DIR': os.path.join(workdir, 'excel'),
+        'EXPORT_DIR': os.path.join(workdir, 'exports'),
+        'METRICS_PORT': '0',
+        'SLOW_QUERY_MS': '0',
+        'WORKERS': '1',
+    })
+    os.makedirs(os.path.join(workdir, 'logs'), exist_ok=True)
+    os.chdir(workdir)  # bot.py logs/bot.log ni joriy katalogda ochadi
+
+    import logging
+    import bot as bot_module
+    logging.getLogger().setLevel(logging.WARNING)
+    return bot_module
+
+
+def make_session_class():
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Message
+
+    class RecordingSession(BaseSession):
+        """Tarmoqsiz sessiya: so'rovlarni sanaydi, Message/True qaytaradi"""
+
+        def __init__(self, latency: float = 0.0):
+            super().__init__()
+            self.latency = latency
+            self.calls = Counter()
+            self.last_message = {}
+            self._message_id = 0
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls[method.__api_method__] += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            chat_id = getattr(method, 'chat_id', None)
+            if method.__returning__ is bool or chat_id is None:
+                return True
+            self._message_id += 1
+            message = {
+                'message_id': self._message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': bot.id, 'is_bot': True, 'first_name': 'bot'},
+                'text': getattr(method, 'text', None) or '',
+            }
+            self.last_message[chat_id] = message
+            return Message.model_validate(message, context={'bot': bot})
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b''
+
+        async def close(self):
+            pass
+
+    return RecordingSession
+
+
+class Harness:
+    def __init__(self, bot_module, session, think: float, seed: int):
+        from aiogram.types import Update
+        self.Update = Update
+        self.bot = bot_module.bot
+        self.dp = bot_module.dp
+        self.session = session
+        self.think = think
+        self.rng = random.Random(seed)
+        self.update_id = 0
+        self.latencies = []
+        self.by_state = defaultdict(list)
+        self.completed = 0
+        self.failed = []
+
+    def _user(self, user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f"Talaba{user_id}"}
+
+    def _message(self, user_id: int, **content) -> dict:
+        return {
+            'message_id': self.update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+            **content,
+        }
+
+    async def feed(self, user_id: int, label: str, payload: dict):
+        self.update_id += 1
+        update = self.Update.model_validate(
+            {'update_id': self.update_id, **payload}, context={'bot': self.bot}
+        )
+        start = time.perf_counter()
+        await self.dp.feed_update(self.bot, update)
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        self.by_state[label].append(elapsed)
+
+    async def run_student(self, index: int, passport: str):
+        user_id = BASE_USER_ID + index
+        context = self.dp.fsm.get_context(bot=self.bot, chat_id=user_id, user_id=user_id)
+        await asyncio.sleep(self.rng.random() * self.think)
+        await self.feed(user_id, 'start', {'message': self._message(user_id, text='/start')})
+
+        for _ in range(MAX_STEPS):
+            state = await context.get_state()
+            if state is None:
+                # finish_survey holatni tozalaydi
+                self.completed += 1
+                return
+            name = state.split(':', 1)[1]
+            if self.think:
+                await asyncio.sleep(self.rng.expovariate(1 / self.think))
+
+            if name == 'entering_search':
+                payload = {'message': self._message(user_id, text=passport)}
+            elif name not in STATE_ACTIONS:
+                self.failed.append((index, f"unknown state {state}"))
+                return
+            else:
+                kind, value = STATE_ACTIONS[name]
+                if kind == 'text':
+                    payload = {'message': self._message(user_id, text=value)}
+                elif kind == 'location':
+                    location = {'latitude': 40.78 + self.rng.random() / 10, 'longitude': 72.35 + self.rng.random() / 10}
+                    payload = {'message': self._message(user_id, location=location)}
+                else:
+                    payload = {'callback_query': {
+                        'id': str(self.update_id),
+                        'from': self._user(user_id),
+                        'chat_instance': str(user_id),
+                        'message': self.session.last_message.get(user_id) or self._message(user_id, text=''),
+                        'data': self.rng.choice(value),
+                    }}
+            await self.feed(user_id, name, payload)
+        self.failed.append((index, f"stuck in {await context.get_state()}"))
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def write_seconds(metrics_module):
+    """Writer threadda bajarilgan chaqiruvlar soni va umumiy vaqti"""
+    count = total = 0
+    for (method, mode), (_, seconds, calls) in metrics_module.DB_SECONDS.snapshot().items():
+        if mode == 'write':
+            count += calls
+            total += seconds
+    return count, total
+
+
+async def run(args, bot_module):
+    import metrics
+
+    session = make_session_class()(latency=args.api_latency / 1000)
+    session.middleware(metrics.ApiMetricsMiddleware())
+    bot_module.bot.session = session
+
+    db = bot_module.db
+    await db.init_db()
+    students = [
+        {'row': i, 'fullname': f"Talaba {i}", 'passport': f"LT{i:07d}", 'group_name': f"{i % 40}-guruh"}
+        for i in range(1, args.students + 1)
+    ]
+    await db.bulk_upsert_students(students)
+
+    harness = Harness(bot_module, session, args.think / 1000, args.seed)
+    writes_before = write_seconds(metrics)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        harness.run_student(i, student['passport']) for i, student in enumerate(students)
+    ))
+    wall = time.perf_counter() - started
+    writes_after = write_seconds(metrics)
+    saved = (await db.get_statistics())['completed_surveys']
+
+    writes = writes_after[0] - writes_before[0]
+    write_busy = writes_after[1] - writes_before[1]
+    steps = [
+        {
+            'state': label,
+            'count': len(values),
+            'avg_ms': sum(values) / len(values) * 1000,
+            'p50_ms': percentile(values, 0.5) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+        }
+        for label, values in harness.by_state.items()
+    ]
+    steps.sort(key=lambda step: step['avg_ms'] * step['count'], reverse=True)
+
+    result = {
+        'students': args.students,
+        'api_latency_ms': args.api_latency,
+        'think_ms': args.think,
+        'wall_s': wall,
+        'updates': len(harness.latencies),
+        'updates_per_s': len(harness.latencies) / wall,
+        'update_p50_ms': percentile(harness.latencies, 0.5) * 1000,
+        'update_p99_ms': percentile(harness.latencies, 0.99) * 1000,
+        'update_max_ms': max(harness.latencies) * 1000 if harness.latencies else 0.0,
+        'completed': harness.completed,
+        'saved_responses': saved,
+        'db_writes': writes,
+        'db_writes_per_s': writes / wall,
+        'db_writer_busy_pct': write_busy / wall * 100,
+        'api_calls': dict(session.calls),
+        'steps': steps,
+        'failed': harness.failed[:20],
+    }
+    db.close()
+    return result
+
+
+def report(result: dict):
+    print(f"{result['students']} talaba, API kechikishi {result['api_latency_ms']}ms, "
+          f"o'ylash {result['think_ms']}ms\n")
+    print(f"vaqt            : {result['wall_s']:.2f}s")
+    print(f"updatelar       : {result['updates']} ({result['updates_per_s']:.0f} update/s)")
+    print(f"update kechikish: p50 {result['update_p50_ms']:.1f}ms, p99 {result['update_p99_ms']:.1f}ms, "
+          f"max {result['update_max_ms']:.1f}ms")
+    print(f"DB yozish       : {result['db_writes']} ({result['db_writes_per_s']:.0f}/s), "
+          f"writer band {result['db_writer_busy_pct']:.0f}%")
+    print("API chaqiruvlar : " + ', '.join(f"{k}={v}" for k, v in sorted(result['api_calls'].items())))
+    print(f"tugatdi         : {result['completed']}/{result['students']}, "
+          f"bazada {result['saved_responses']} javob")
+    print("\nqadamlar (FSM holati bo'yicha, umumiy vaqt tartibida):")
+    for step in result['steps'][:12]:
+        print(f"  {step['state']:<26} {step['count']:>6}  o'rtacha {step['avg_ms']:7.2f}ms  "
+              f"p50 {step['p50_ms']:7.2f}ms  p99 {step['p99_ms']:7.2f}ms")
+    for index, reason in result['failed']:
+        print(f"  ❌ talaba {index}: {reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load harness (dp.feed_update)")
+    parser.add_argument('--students', type=int, default=200, help="bir vaqtdagi talabalar soni")
+    parser.add_argument('--api-latency', type=float, default=0.0, help="soxta Telegram API kechikishi (ms)")
+    parser.add_argument('--think', type=float, default=0.0, help="javoblar orasidagi o'rtacha pauza (ms)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="natijani JSON faylga yozish")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix='load_harness_')
+    bot_module = load_bot_module(workdir)
+    result = asyncio.run(run(args, bot_module))
+    report(result)
+
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if result['completed'] != args.students or result['saved_responses'] != args.students:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/make_excel_corpus.py - sintetik roster Excel fayllari generatori
+#
+# Haqiqiy roster bilan bir xil 36 ustunli shablonda (A ustun - tartib raqami,
+# B - Talaba ID, ... K - Pasport, L - JSHSHIR ...) berilgan hajmdagi fayllar
+# yaratiladi. Ma'lumotlar to'liq sintetik, lekin haqiqiy fayllardagi
+# "iflosliklar" qo'shiladi:
+#   - ID ustunlarida float qiymatlar (519241102451.0), ba'zan matn
+#   - bo'sh kataklar, "nan" matni, bo'shliqli qiymatlar, kichik harfli pasport
+#   - takroriy pasportlar (boshqa Talaba ID bilan - yangilash yo'li)
+#   - ismi yoki pasporti yo'q qatorlar (o'tkazib yuborilishi kerak)
+#   - sanalar goh datetime, goh matn; oxirida bo'sh qatorlar
+#
+# Ishlatish:
+#   python benchmarks/make_excel_corpus.py --rows 2500,25000,100000
+#   python benchmarks/make_excel_corpus.py --rows 50000 --out /tmp/corpus --duplicates 0.05
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT = os.path.join(ROOT, 'benchmarks', 'corpus')
+
+HEADER = (
+    None, 'Talaba ID', 'To‘liq ismi', 'Fuqarolik', 'Davlat', 'Millat', 'Viloyat', 'Tuman', 'Jins',
+    'Tug‘ilgan sana', 'Pasport raqami', 'JSHSHIR-kod', 'Pasport berilgan sana', 'Kurs', 'Fakultet',
+    'Guruh', "Ta'lim tili", 'O‘quv yili', 'Semestr', 'Bitiruvchi', 'Mutaxassislik', 'Ta’lim turi',
+    'Ta’lim shakli', 'To‘lov shakli', 'Grant turi', "Avvalgi ta'lim ma'lumoti", 'Talaba toifasi',
+    'Ijtimoiy toifa', 'Birga yashaydiganlar soni', 'Birga yashaydiganlar toifasi',
+    'Yashash joyi statusi', 'Yashash joyi geolokatsiyasi', 'Buyruq', 'GPA', 'Kontrakt №', 'Shartnoma turi',
+)
+
+FIRST_NAMES = ("BARCHINOY", "LAYLO", "MUSLIMAXON", "SARDOR", "JASUR", "DILNOZA", "AZIZBEK", "MALIKA", "BOBUR", "NODIRA")
+LAST_NAMES = ("AVAZBEKOV", "ODILOV", "ABDULAZIZOV", "KARIMOV", "YUSUPOV", "RAHIMOV", "TOSHMATOV", "ERGASHEV")
+REGIONS = (
+    ("Andijon viloyati", ("Andijon tumani", "Xo‘jaobod tumani", "Jalaquduq tumani", "Asaka tumani")),
+    ("Farg‘ona viloyati", ("Farg‘ona tumani", "Qo‘qon shahri", "Marg‘ilon shahri")),
+    ("Namangan viloyati", ("Chust tumani", "Pop tumani", "Namangan shahri")),
+)
+FACULTIES = ("IT va ijtimoiy-gumanitar", "Iqtisodiyot", "Pedagogika", "Tibbiyot")
+GROUP_PREFIXES = ("FTO'(ing)", "IQT", "PED", "DAV", "AKT")
+PAYMENTS = ("To‘lov-shartnoma", "Davlat granti")
+
+
+def make_row(i: int, rng: random.Random, passports: list, duplicates: float, messy: float) -> tuple:
+    """i - tartib raqami (1 dan). Qaytaradi: 36 ta katak"""
+    talaba_id = 519240000000 + i
+    jshshir = 60000000000000 + i * 7
+    gender = rng.choice(("Ayol", "Erkak"))
+    suffix = "QIZI" if gender == "Ayol" else "O‘G‘LI"
+    fullname = f"{rng.choice(LAST_NAMES)}{'A' if gender == 'Ayol' else ''} {rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)} {suffix}"
+    region, districts = rng.choice(REGIONS)
+    course = rng.randint(1, 4)
+    birth = datetime(2002, 1, 1) + timedelta(days=rng.randint(0, 2500))
+    issued = birth + timedelta(days=16 * 365 + rng.randint(0, 900))
+
+    if passports and rng.random() < duplicates:
+        # Takroriy pasport: boshqa Talaba ID bilan qayta kelgan talaba
+        passport = rng.choice(passports)
+    else:
+        passport = f"A{rng.choice('BCDE')}{rng.randint(1000000, 9999999)}"
+        passports.append(passport)
+
+    row = [
+        i,
+        float(talaba_id) if rng.random() < 0.5 else str(talaba_id),
+        fullname,
+        "O‘zbekiston Respublikasi fuqarosi", "O‘zbekiston", "O‘zbeklar",
+        region, rng.choice(districts), gender,
+        birth if rng.random() < 0.5 else birth.strftime('%Y-%m-%d'),
+        passport,
+        float(jshshir) if rng.random() < 0.5 else str(jshshir),
+        issued if rng.random() < 0.5 else issued.strftime('%Y-%m-%d'),
+        f"{course}-kurs",
+        rng.choice(FACULTIES),
+        f"{rng.choice(GROUP_PREFIXES)}_{25 - course}-{rng.randint(1, 12):02d}",
+        "O‘zbek", "2025-2026", f"{course * 2 - 1}-semestr", "Yo'q",
+        float(60230101 + rng.randint(0, 40)),
+        "Bakalavr", "Kunduzgi", rng.choice(PAYMENTS), "11 - Kontrakt",
+        f"{2010 + rng.randint(0, 13)}-{2021 + rng.randint(0, 3)}, {rng.randint(1, 60)}-sonli umumiy o‘rta ta'lim maktabi",
+        "Oddiy", "Boshqa",
+        float(rng.randint(2, 9)) if rng.random() < 0.3 else None,
+        None, None, None,
+        f"№ {rng.randint(10, 99)}-T / 16.10.2024",
+        f"{rng.uniform(2, 5):.2f}",
+        None, None,
+    ]
+
+    if rng.random() < messy:
+        kind = rng.randrange(7)
+        if kind == 0:
+            row[rng.choice((1, 11, 13, 14, 15))] = None              # bo'sh katak
+        elif kind == 1:
+            row[rng.choice((1, 3, 11, 15, 16))] = 'nan'              # "nan" matni
+        elif kind == 2:
+            row[10] = f"  {passport.lower()} "                       # bo'shliq + kichik harf
+        elif kind == 3:
+            row[11] = f"{jshshir}x"                                  # noto'g'ri JSHSHIR
+        elif kind == 4:
+            row[2] = rng.choice((None, '', str(rng.randint(1, 99)), 'nan'))  # ismsiz - o'tkaziladi
+        elif kind == 5:
+            row[10] = rng.choice((None, '', 'nan'))                  # pasportsiz - o'tkaziladi
+        else:
+            row[14] = f" {row[14]} "                                 # bo'shliqli fakultet
+    return tuple(row)
+
+
+def write_roster(path: str, rows: int, seed: int = 1, duplicates: float = 0.02, messy: float = 0.05) -> float:
+    """Roster faylini yozish (openpyxl write_only), sarflangan vaqtni qaytaradi"""
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    passports: list = []
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(HEADER)
+    for i in range(1, rows + 1):
+        sheet.append(make_row(i, rng, passports, duplicates, messy))
+    for _ in range(3):
+        sheet.append((None,) * len(HEADER))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    workbook.save(path)
+    return time.perf_counter() - start
+
+
+def corpus_path(out_dir: str, rows: int) -> str:
+    return os.path.join(out_dir, f"roster_{rows}.xlsx")
+
+
+def ensure_corpus(out_dir: str, sizes: list, seed: int = 1, force: bool = False, **options) -> list:
+    """Yo'q fayllarni yaratish; fayl yo'llari ro'yxatini qaytaradi"""
+    paths = []
+    for rows in sizes:
+        path = corpus_path(out_dir, rows)
+        if force or not os.path.exists(path):
+            elapsed = write_roster(path, rows, seed=seed, **options)
+            print(f"  {os.path.basename(path)}: {rows} qator, {os.path.getsize(path) / 1e6:.1f}MB, {elapsed:.1f}s")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic roster workbook generator")
+    parser.add_argument('--rows', default='2500,25000,100000', help="qatorlar soni, vergul bilan")
+    parser.add_argument('--out', default=DEFAULT_OUT)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--duplicates', type=float, default=0.02, help="takroriy pasportli qatorlar ulushi")
+    parser.add_argument('--messy', type=float, default=0.05, help="iflos qatorlar ulushi")
+    parser.add_argument('--force', action='store_true', help="mavjud fayllarni qayta yaratish")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.rows.split(',') if s.strip()]
+    print(f"Korpus: {args.out}")
+    ensure_corpus(args.out, sizes, seed=args.seed, force=args.force,
+                  duplicates=args.duplicates, messy=args.messy)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,16 @@
 # bot.py - KUAF So'rovnoma Bot (O'zbek tili)
 
 import asyncio
+import hashlib
 import os
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 
-from aiogram import Bot, Dispatcher, F, Router
-from aiogram.filters import Command, StateFilter
+from aiogram import Bot, Dispatcher, F
+from aiogram.filters import BaseFilter, Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import (
     Message, CallbackQuery, 
     InlineKeyboardMarkup, InlineKeyboardButton,
@@ -21,7 +21,17 @@ from aiogram.exceptions import TelegramBadRequest
 from dotenv import load_dotenv
 
 from database import Database
+from dispatch import IndexedRouter
+from broadcast import Broadcaster
 from excel_handler import ExcelHandler
+from import_jobs import ImportJobQueue
+import metrics
+from query_log import SlowQueryLog
+from storage import SQLiteStorage
+from subscription import SubscriptionChecker
+from survey_flow import CHOICE, LOCATION, MESSAGE_KINDS, SURVEY, YES_NO, Question
+from webhook import run_webhook
+from workers import WorkerPool, serve_worker
 
 # Environment variables
 load_dotenv()
@@ -31,6 +41,28 @@ DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/survey.db')
 EXCEL_DIR = os.getenv('EXCEL_DIR', 'data/excel_files')
 EXPORT_DIR = os.getenv('EXPORT_DIR', 'data/exports')
 CHANNEL_USERNAME = os.getenv('CHANNEL_USERNAME', '')
+# Qayta topshirilgan so'rovnomalarning eski javoblarini saqlash
+SURVEY_HISTORY = os.getenv('SURVEY_HISTORY', '1') not in ('0', 'false', 'no')
+# Sekin SQL so'rovlar jurnali: chegara millisekundlarda (0 - o'chirilgan)
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '0'))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+
+# Ishga tushirish rejimi: polling (default) yoki webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', '8080'))
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv('WEBHOOK_MAX_CONCURRENCY', '50'))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '30'))
+
+# Worker protsesslar soni (1 - bitta protsess, oddiy rejim)
+WORKERS = int(os.getenv('WORKERS', '1'))
+
+# Prometheus metrikalari endpointi (0 - o'chirilgan)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
 
 # Logging sozlash
 logging.basicConfig(
@@ -45,13 +77,32 @@ logger = logging.getLogger(__name__)
 
 # Bot va Database
 bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
+db = Database(
+    DATABASE_PATH,
+    keep_response_history=SURVEY_HISTORY,
+    slow_query_ms=SLOW_QUERY_MS,
+    slow_query_log=SLOW_QUERY_LOG,
+)
+excel_handler = ExcelHandler(db, EXCEL_DIR, EXPORT_DIR)
+
+# FSM holatlari user_states jadvalida saqlanadi - restartda so'rovnoma yo'qolmaydi
+storage = SQLiteStorage(db)
 dp = Dispatcher(storage=storage)
-router = Router()
+# Handlerlar FSM holati va callback data bo'yicha indekslanadi (dispatch.py)
+router = IndexedRouter()
 dp.include_router(router)
 
-db = Database(DATABASE_PATH)
-excel_handler = ExcelHandler(db, EXCEL_DIR, EXPORT_DIR)
+# Handler, DB va Telegram API kechikishlari (metrics.py)
+metrics.setup_metrics(dp, bot)
+
+subscription_checker = SubscriptionChecker(bot, CHANNEL_USERNAME)
+
+# Talabalar importi fon rejimida; vazifalar import_jobs jadvalidan olinadi -
+# barcha workerlar bo'yicha bir vaqtda bitta import
+import_jobs = ImportJobQueue(db, excel_handler, bot)
+
+# E'lonlar navbati (Telegram limitlari ostida, restartda davom etadi)
+broadcaster = Broadcaster(db, bot)
 
 
 # ================= MATNLAR (O'ZBEK TILI) =================
@@ -88,6 +139,7 @@ TEXTS = {
     
     # Ijara savollari
     'q18_living_type': "🏠 Qayerda yashaysiz?",
+    'q18_ttj_type': "🏢 KUAF ga qayerdan qatnaysiz?",
     'q19_rent_address': "🏠 Ijara xonadonining manzilini kiriting:\n\nMasalan: Andijon shahar, Bobur shox ko'chasi, Sanoat MFY, 12-uy, 34-xonadon",
     'q20_rent_location': "📍 Ijara xonadonining lokatsiyasini yuboring:",
     'q21_rent_owner': "👤 Ijara xonadoni egasining ISM va FAMILIYASini kiriting:",
@@ -117,6 +169,7 @@ TEXTS = {
     'excel_export': "📤 Excel Export",
     'excel_import': "📥 Excel Import",
     'statistics': "📊 Statistika",
+    'completion': "📈 To'ldirish holati",
     'add_staff': "➕ Xodim qo'shish",
     'remove_staff': "➖ Xodim o'chirish",
     'send_announcement': "📢 E'lon yuborish",
@@ -202,47 +255,11 @@ def get_yes_no_skip_keyboard(back_callback: str = None) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def get_certificate_type_keyboard(back_callback: str = None) -> InlineKeyboardMarkup:
-    """Sertifikat turi klaviaturasi"""
+def get_choice_keyboard(question: Question, back_callback: str = None) -> InlineKeyboardMarkup:
+    """Tanlov savoli klaviaturasi (variantlar survey_flow.py da)"""
     buttons = [
-        [InlineKeyboardButton(text="IELTS", callback_data="cert_ielts")],
-        [InlineKeyboardButton(text="Milliy sertifikat", callback_data="cert_milliy")],
-        [InlineKeyboardButton(text="TOEFL iBT", callback_data="cert_toefl_ibt")],
-        [InlineKeyboardButton(text="TOEFL ITP", callback_data="cert_toefl_itp")],
-        [InlineKeyboardButton(text="Cambridge", callback_data="cert_cambridge")],
-        [InlineKeyboardButton(text="Linguaskill", callback_data="cert_linguaskill")],
-        [InlineKeyboardButton(text="Duolingo", callback_data="cert_duolingo")],
-        [InlineKeyboardButton(text="CEFR", callback_data="cert_cefr")],
-        [InlineKeyboardButton(text="Boshqa", callback_data="cert_other")],
-    ]
-    if back_callback:
-        buttons.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data=back_callback)])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
-
-
-def get_living_type_keyboard(back_callback: str = None) -> InlineKeyboardMarkup:
-    """Yashash turi klaviaturasi"""
-    buttons = [
-        [InlineKeyboardButton(text="🏠 Uydan (oila bilan)", callback_data="living_home")],
-        [InlineKeyboardButton(text="🏢 TTJ (talabalar turar joyi)", callback_data="living_ttj")],
-        [InlineKeyboardButton(text="🏘 Ijaradan", callback_data="living_rent")],
-        [InlineKeyboardButton(text="👨‍👩‍👧 Qarindoshlarnikida", callback_data="living_relatives")],
-    ]
-    if back_callback:
-        buttons.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data=back_callback)])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
-
-
-def get_ttj_type_keyboard(back_callback: str = None) -> InlineKeyboardMarkup:
-    """TTJ turar joylari klaviaturasi"""
-    buttons = [
-        [InlineKeyboardButton(text="Uydan", callback_data="ttj_uydan")],
-        [InlineKeyboardButton(text="Jevachi TTJ dan", callback_data="ttj_jevachi")],
-        [InlineKeyboardButton(text="KUAF TTJ dan", callback_data="ttj_kuaf")],
-        [InlineKeyboardButton(text="Texnika DXSH dan", callback_data="ttj_texnika")],
-        [InlineKeyboardButton(text="Kamolot Ko'cha TTJ dan", callback_data="ttj_kamolot")],
-        [InlineKeyboardButton(text="FAMILY MED TTJ dan", callback_data="ttj_family_med")],
-        [InlineKeyboardButton(text="Ijaradan (kvartira)", callback_data="ttj_ijara")],
+        [InlineKeyboardButton(text=label, callback_data=f"{question.prefix}{suffix}")]
+        for suffix, label, _ in question.options
     ]
     if back_callback:
         buttons.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data=back_callback)])
@@ -278,12 +295,24 @@ def get_back_keyboard(back_callback: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def get_question_keyboard(question: Question, back_callback: str):
+    """Savol turiga mos klaviatura"""
+    if question.kind == YES_NO:
+        return get_yes_no_keyboard(back_callback)
+    if question.kind == CHOICE:
+        return get_choice_keyboard(question, back_callback)
+    if question.kind == LOCATION:
+        return get_location_keyboard(back_callback)
+    return get_back_keyboard(back_callback)
+
+
 def get_admin_keyboard() -> InlineKeyboardMarkup:
     """Admin panel klaviaturasi"""
     buttons = [
         [InlineKeyboardButton(text=TEXTS['excel_export'], callback_data="admin_export")],
         [InlineKeyboardButton(text=TEXTS['excel_import'], callback_data="admin_import")],
         [InlineKeyboardButton(text=TEXTS['statistics'], callback_data="admin_stats")],
+        [InlineKeyboardButton(text=TEXTS['completion'], callback_data="admin_completion")],
         [InlineKeyboardButton(text=TEXTS['add_staff'], callback_data="admin_add_staff")],
         [InlineKeyboardButton(text=TEXTS['remove_staff'], callback_data="admin_remove_staff")],
         [InlineKeyboardButton(text=TEXTS['send_announcement'], callback_data="admin_announce")],
@@ -298,21 +327,19 @@ async def is_super_admin(user_id: int) -> bool:
     return user_id in SUPER_ADMIN_IDS
 
 
-async def is_staff_member(user_id: int) -> bool:
-    """Xodim ekanligini tekshirish"""
-    return await db.is_staff(user_id)
+async def is_staff_member(user_id: int, privileged: bool = True) -> bool:
+    """
+    Xodim ekanligini tekshirish. Ko'p protsessli rejimda ruxsat tekshiruvi
+    bazadan o'qiladi - boshqa workerda o'chirilgan xodim darhol ruxsatini yo'qotadi
+    """
+    return await db.is_staff(user_id, fresh=privileged and WORKERS > 1)
 
 
-async def check_subscription(user_id: int) -> bool:
-    """Kanal obunasini tekshirish"""
+async def check_subscription(user_id: int, recheck: bool = False) -> bool:
+    """Kanal obunasini tekshirish (keshlangan)"""
     if not CHANNEL_USERNAME:
         return True
-    try:
-        member = await bot.get_chat_member(chat_id=f"@{CHANNEL_USERNAME}", user_id=user_id)
-        return member.status in ['creator', 'administrator', 'member']
-    except Exception as e:
-        logger.error(f"Error checking subscription: {e}")
-        return True
+    return await subscription_checker.check(user_id, recheck=recheck)
 
 
 def get_subscription_keyboard() -> InlineKeyboardMarkup:
@@ -334,7 +361,8 @@ async def cmd_start(message: Message, state: FSMContext):
         await state.clear()
         
         # Admin/xodim uchun obuna shart emas
-        if not (await is_super_admin(message.from_user.id) or await is_staff_member(message.from_user.id)):
+        if not (await is_super_admin(message.from_user.id)
+                or await is_staff_member(message.from_user.id, privileged=False)):
             if CHANNEL_USERNAME and not await check_subscription(message.from_user.id):
                 await message.answer(
                     "❗️ Botdan foydalanish uchun avval kanalimizga obuna bo'ling!",
@@ -355,7 +383,7 @@ async def cmd_start(message: Message, state: FSMContext):
 async def process_check_subscription(callback: CallbackQuery, state: FSMContext):
     """Obunani tekshirish"""
     try:
-        if await check_subscription(callback.from_user.id):
+        if await check_subscription(callback.from_user.id, recheck=True):
             await callback.message.edit_text("✅ Obuna tasdiqlandi!")
             await asyncio.sleep(0.5)
             await callback.message.answer(text=TEXTS['welcome'])
@@ -366,136 +394,74 @@ async def process_check_subscription(callback: CallbackQuery, state: FSMContext)
         logger.error(f"Error in check_subscription: {e}")
 
 
+# ================= SO'ROVNOMA DVIGATELI =================
+# Savollar grafi survey_flow.py da; har bir holat uchun alohida handler o'rniga
+# ikkita umumiy handler - savol joriy FSM holati bo'yicha lug'atdan olinadi.
+QUESTION_BY_STATE = {getattr(SurveyStates, q.id).state: q for q in SURVEY.questions}
+STATE_BY_QUESTION = {q.id: getattr(SurveyStates, q.id) for q in SURVEY.questions}
+
+
+class SurveyQuestionFilter(BaseFilter):
+    """Joriy holatdagi savol shu update turini qabul qilsa, handlerga `question` beriladi"""
+
+    def __init__(self):
+        # IndexedRouter handlerni faqat shu holatlar uchun nomzod qiladi
+        self.states = tuple(QUESTION_BY_STATE)
+
+    async def __call__(self, event: Union[Message, CallbackQuery], raw_state: Optional[str] = None):
+        question = QUESTION_BY_STATE.get(raw_state)
+        if question is None:
+            return False
+        if isinstance(event, CallbackQuery):
+            if not question.prefix or not (event.data or '').startswith(question.prefix):
+                return False
+        elif question.kind not in MESSAGE_KINDS:
+            return False
+        return {'question': question}
+
+
+async def ask_question(message: Message, state: FSMContext, question: Question, back_key: str, edit: bool = False):
+    """Savolni ko'rsatish va holatni o'rnatish (edit - callback xabarini tahrirlash)"""
+    text = TEXTS[question.text]
+    keyboard = get_question_keyboard(question, f"back_{back_key}")
+    if edit and question.kind != LOCATION:
+        await message.edit_text(text=text, reply_markup=keyboard)
+    else:
+        # ReplyKeyboard uchun yangi xabar yuborish kerak
+        if edit:
+            await message.delete()
+        await message.answer(text=text, reply_markup=keyboard)
+    await state.set_state(STATE_BY_QUESTION[question.id])
+
+
+def get_back_key(question: Question, data: Dict[str, Any]) -> str:
+    """Savolning "Orqaga" tugmasi: yo'ldagi oldingi savol yoki qidiruv"""
+    previous = SURVEY.previous(question.id, data)
+    return previous.key if previous else "search"
+
+
+async def ask_previous(message: Message, state: FSMContext, question: Question):
+    """ReplyKeyboard dagi "Orqaga": oldingi savolni yangi xabar bilan ko'rsatish"""
+    data = await state.get_data()
+    previous = SURVEY.previous(question.id, data)
+    if previous is None:
+        await message.answer(text=TEXTS['welcome'], reply_markup=ReplyKeyboardRemove())
+        await state.set_state(SurveyStates.entering_search)
+        return
+    await ask_question(message, state, previous, get_back_key(previous, data))
+
+
 # ================= ORQAGA QAYTISH HANDLER =================
 @router.callback_query(F.data.startswith("back_"))
 async def process_back(callback: CallbackQuery, state: FSMContext):
-    """Orqaga qaytish"""
+    """Orqaga qaytish: back_<savol key> - o'sha savol, back_search - qidiruv"""
     try:
         back_to = callback.data.replace("back_", "")
+        question = SURVEY.by_key.get(back_to)
         
-        if back_to == "q1":
-            await callback.message.edit_text(text=TEXTS['q1_phone'], reply_markup=get_back_keyboard("back_search"))
-            await state.set_state(SurveyStates.q1_phone)
-        elif back_to == "q2":
-            await callback.message.edit_text(text=TEXTS['q2_address'], reply_markup=get_back_keyboard("back_q1"))
-            await state.set_state(SurveyStates.q2_address)
-        elif back_to == "q4":
-            await callback.message.edit_text(text=TEXTS['q4_previous_education'], reply_markup=get_back_keyboard("back_q3"))
-            await state.set_state(SurveyStates.q4_previous_education)
-        elif back_to == "q5":
-            await callback.message.edit_text(text=TEXTS['q5_document'], reply_markup=get_back_keyboard("back_q4"))
-            await state.set_state(SurveyStates.q5_document)
-        elif back_to == "q6":
-            await callback.message.edit_text(text=TEXTS['q6_achievements'], reply_markup=get_yes_no_keyboard("back_q5"))
-            await state.set_state(SurveyStates.q6_achievements)
-        elif back_to == "q7":
-            await callback.message.edit_text(text=TEXTS['q7_certificate'], reply_markup=get_yes_no_keyboard("back_q6"))
-            await state.set_state(SurveyStates.q7_certificate)
-        elif back_to == "q9":
-            await callback.message.edit_text(text=TEXTS['q9_grant'], reply_markup=get_yes_no_keyboard("back_q7"))
-            await state.set_state(SurveyStates.q9_grant)
-        elif back_to == "q10":
-            await callback.message.edit_text(text=TEXTS['q10_social_protection'], reply_markup=get_yes_no_keyboard("back_q9"))
-            await state.set_state(SurveyStates.q10_social_protection)
-        elif back_to == "q11":
-            await callback.message.edit_text(text=TEXTS['q11_iron_book'], reply_markup=get_yes_no_keyboard("back_q10"))
-            await state.set_state(SurveyStates.q11_iron_book)
-        elif back_to == "q12":
-            await callback.message.edit_text(text=TEXTS['q12_youth_book'], reply_markup=get_yes_no_keyboard("back_q11"))
-            await state.set_state(SurveyStates.q12_youth_book)
-        elif back_to == "q14":  # Ota hayotdami
-            await callback.message.edit_text(text=TEXTS['q14_father_alive'], reply_markup=get_yes_no_keyboard("back_q12"))
-            await state.set_state(SurveyStates.q14_father_alive)
-        elif back_to == "q13":  # Ota ismi
-            await callback.message.edit_text(text=TEXTS['q13_father_name'], reply_markup=get_back_keyboard("back_q14"))
-            await state.set_state(SurveyStates.q13_father_name)
-        elif back_to == "q14_phone":  # Ota telefoni
-            await callback.message.edit_text(text=TEXTS['q14_father_phone'], reply_markup=get_back_keyboard("back_q13"))
-            await state.set_state(SurveyStates.q14_father_phone)
-        elif back_to == "q16":  # Ona hayotdami
-            data = await state.get_data()
-            if data.get('father_alive') == "Ha":
-                await callback.message.edit_text(text=TEXTS['q16_mother_alive'], reply_markup=get_yes_no_keyboard("back_q14_phone"))
-            else:
-                await callback.message.edit_text(text=TEXTS['q16_mother_alive'], reply_markup=get_yes_no_keyboard("back_q14"))
-            await state.set_state(SurveyStates.q16_mother_alive)
-        elif back_to == "q15":  # Ona ismi
-            await callback.message.edit_text(text=TEXTS['q15_mother_name'], reply_markup=get_back_keyboard("back_q16"))
-            await state.set_state(SurveyStates.q15_mother_name)
-        elif back_to == "q16_phone":  # Ona telefoni
-            await callback.message.edit_text(text=TEXTS['q16_mother_phone'], reply_markup=get_back_keyboard("back_q15"))
-            await state.set_state(SurveyStates.q16_mother_phone)
-        elif back_to == "q17":  # Ota-ona birgami
-            data = await state.get_data()
-            if data.get('mother_alive') == "Ha":
-                await callback.message.edit_text(text=TEXTS['q17_parents_together'], reply_markup=get_yes_no_keyboard("back_q16_phone"))
-            else:
-                await callback.message.edit_text(text=TEXTS['q17_parents_together'], reply_markup=get_yes_no_keyboard("back_q16"))
-            await state.set_state(SurveyStates.q17_parents_together)
-        elif back_to == "q18":  # Yashash turi
-            data = await state.get_data()
-            if data.get('father_alive') == "Ha" and data.get('mother_alive') == "Ha":
-                await callback.message.edit_text(text=TEXTS['q18_living_type'], reply_markup=get_living_type_keyboard("back_q17"))
-            elif data.get('mother_alive') == "Ha":
-                await callback.message.edit_text(text=TEXTS['q18_living_type'], reply_markup=get_living_type_keyboard("back_q16_phone"))
-            elif data.get('father_alive') == "Ha":
-                await callback.message.edit_text(text=TEXTS['q18_living_type'], reply_markup=get_living_type_keyboard("back_q16"))
-            else:
-                await callback.message.edit_text(text=TEXTS['q18_living_type'], reply_markup=get_living_type_keyboard("back_q16"))
-            await state.set_state(SurveyStates.q18_living_type)
-        elif back_to == "q18_ttj":  # TTJ tanlash
-            await callback.message.edit_text(text="🏢 KUAF ga qayerdan qatnaysiz?", reply_markup=get_ttj_type_keyboard("back_q18"))
-            await state.set_state(SurveyStates.q18_ttj_type)
-        elif back_to == "q3":  # Lokatsiya
-            # ReplyKeyboard uchun yangi xabar yuborish kerak
-            await callback.message.delete()
-            await callback.message.answer(text=TEXTS['q3_location'], reply_markup=get_location_keyboard("back_q2"))
-            await state.set_state(SurveyStates.q3_location)
-        elif back_to == "q19":  # Ijara manzili
-            await callback.message.edit_text(text=TEXTS['q19_rent_address'], reply_markup=get_back_keyboard("back_q18"))
-            await state.set_state(SurveyStates.q19_rent_address)
-        elif back_to == "q20":  # Ijara lokatsiyasi
-            # ReplyKeyboard uchun yangi xabar yuborish kerak
-            await callback.message.delete()
-            await callback.message.answer(text=TEXTS['q20_rent_location'], reply_markup=get_location_keyboard("back_q19"))
-            await state.set_state(SurveyStates.q20_rent_location)
-        elif back_to == "q21":  # Ijara egasi
-            await callback.message.edit_text(text=TEXTS['q21_rent_owner'], reply_markup=get_back_keyboard("back_q20"))
-            await state.set_state(SurveyStates.q21_rent_owner)
-        elif back_to == "q22":  # Ishlaydimi
-            data = await state.get_data()
-            living_type = data.get('living_type', '')
-            if "Ijaradan" in living_type:
-                await callback.message.edit_text(text=TEXTS['q22_working'], reply_markup=get_yes_no_keyboard("back_q21"))
-            elif "TTJ" in living_type:
-                await callback.message.edit_text(text=TEXTS['q22_working'], reply_markup=get_yes_no_keyboard("back_q18_ttj"))
-            else:
-                await callback.message.edit_text(text=TEXTS['q22_working'], reply_markup=get_yes_no_keyboard("back_q18"))
-            await state.set_state(SurveyStates.q22_working)
-        elif back_to == "q23":  # Ish joyi
-            data = await state.get_data()
-            living_type = data.get('living_type', '')
-            if "Ijaradan" in living_type:
-                back_btn = "back_q21"
-            elif "TTJ" in living_type:
-                back_btn = "back_q18_ttj"
-            else:
-                back_btn = "back_q18"
-            await callback.message.edit_text(text=TEXTS['q23_workplace'], reply_markup=get_back_keyboard(back_btn))
-            await state.set_state(SurveyStates.q23_workplace)
-        elif back_to == "q24":  # Oilalikmisiz
+        if question is not None:
             data = await state.get_data()
-            if data.get('is_working') == "Ha":
-                await callback.message.edit_text(text=TEXTS['q24_married'], reply_markup=get_yes_no_keyboard("back_q23"))
-            else:
-                await callback.message.edit_text(text=TEXTS['q24_married'], reply_markup=get_yes_no_keyboard("back_q22"))
-            await state.set_state(SurveyStates.q24_married)
-        elif back_to == "q25":  # Xorijga chiqish pasporti
-            await callback.message.edit_text(text=TEXTS['q25_foreign_passport'], reply_markup=get_yes_no_keyboard("back_q24"))
-            await state.set_state(SurveyStates.q25_foreign_passport)
-        elif back_to == "q26":  # Ijtimoiy tarmoqlar
-            await callback.message.edit_text(text=TEXTS['q26_social_channels'], reply_markup=get_yes_no_keyboard("back_q25"))
-            await state.set_state(SurveyStates.q26_social_channels)
+            await ask_question(callback.message, state, question, get_back_key(question, data), edit=True)
         elif back_to == "search":
             await callback.message.edit_text(text=TEXTS['welcome'])
             await state.set_state(SurveyStates.entering_search)
@@ -537,603 +503,69 @@ async def process_student_search(message: Message, state: FSMContext):
         
         await asyncio.sleep(0.5)
         
-        # Q1 - Telefon raqam
-        await message.answer(text=TEXTS['q1_phone'], reply_markup=get_back_keyboard("back_search"))
-        await state.set_state(SurveyStates.q1_phone)
+        # Birinchi savol - telefon raqam
+        await ask_question(message, state, SURVEY.first, "search")
     
     except Exception as e:
         logger.error(f"Error in process_student_search: {e}")
         await message.answer(TEXTS['error'])
 
 
-# Q1 - Telefon
-@router.message(StateFilter(SurveyStates.q1_phone))
-async def process_q1_phone(message: Message, state: FSMContext):
-    """Telefon raqam"""
-    try:
-        await state.update_data(phone=message.text.strip())
-        await message.answer(text=TEXTS['q2_address'], reply_markup=get_back_keyboard("back_q1"))
-        await state.set_state(SurveyStates.q2_address)
-    except Exception as e:
-        logger.error(f"Error in q1: {e}")
-
-
-# Q2 - Manzil
-@router.message(StateFilter(SurveyStates.q2_address))
-async def process_q2_address(message: Message, state: FSMContext):
-    """Doimiy manzil"""
+# Matn va lokatsiya javoblari
+@router.message(SurveyQuestionFilter())
+async def process_survey_message(message: Message, state: FSMContext, question: Question):
+    """Xabar bilan javob beriladigan savollar"""
     try:
-        await state.update_data(permanent_address=message.text.strip())
-        await message.answer(text=TEXTS['q3_location'], reply_markup=get_location_keyboard("back_q2"))
-        await state.set_state(SurveyStates.q3_location)
-    except Exception as e:
-        logger.error(f"Error in q2: {e}")
-
-
-# Q3 - Lokatsiya
-@router.message(StateFilter(SurveyStates.q3_location))
-async def process_q3_location(message: Message, state: FSMContext):
-    """Doimiy manzil lokatsiyasi"""
-    try:
-        # Orqaga tugmasi bosildi
-        if message.text == "⬅️ Orqaga":
-            await message.answer(text=TEXTS['q2_address'], reply_markup=get_back_keyboard("back_q1"))
-            await state.set_state(SurveyStates.q2_address)
-            return
-        
-        if message.location:
-            location = f"{message.location.latitude},{message.location.longitude}"
-            await state.update_data(permanent_location=location)
-        elif message.text == "⏭ O'tkazib yuborish":
-            await state.update_data(permanent_location="")
-        else:
-            await state.update_data(permanent_location=message.text.strip())
-        
-        await message.answer(text=TEXTS['q4_previous_education'], reply_markup=get_back_keyboard("back_q3"))
-        await state.set_state(SurveyStates.q4_previous_education)
-    except Exception as e:
-        logger.error(f"Error in q3: {e}")
-
-
-# Q4 - Avvalgi ta'lim
-@router.message(StateFilter(SurveyStates.q4_previous_education))
-async def process_q4_education(message: Message, state: FSMContext):
-    """Avvalgi ta'lim muassasasi"""
-    try:
-        await state.update_data(previous_education=message.text.strip())
-        await message.answer(text=TEXTS['q5_document'], reply_markup=get_back_keyboard("back_q4"))
-        await state.set_state(SurveyStates.q5_document)
-    except Exception as e:
-        logger.error(f"Error in q4: {e}")
-
-
-# Q5 - Hujjat
-@router.message(StateFilter(SurveyStates.q5_document))
-async def process_q5_document(message: Message, state: FSMContext):
-    """Hujjat seriya raqami"""
-    try:
-        await state.update_data(document_number=message.text.strip())
-        await message.answer(text=TEXTS['q6_achievements'], reply_markup=get_yes_no_keyboard("back_q5"))
-        await state.set_state(SurveyStates.q6_achievements)
-    except Exception as e:
-        logger.error(f"Error in q5: {e}")
-
-
-# Q6 - Yutuqlar
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q6_achievements))
-async def process_q6_achievements(callback: CallbackQuery, state: FSMContext):
-    """Yutuqlar bormi"""
-    try:
-        answer = callback.data.split("_")[1]
-        
-        if answer == "yes":
-            await state.update_data(has_achievements="Ha")
-            await callback.message.edit_text(text=TEXTS['q6_achievements_details'], reply_markup=get_back_keyboard("back_q6"))
-            await state.set_state(SurveyStates.q6_achievements_details)
-        else:
-            await state.update_data(has_achievements="Yo'q", achievements="")
-            await callback.message.edit_text(text=TEXTS['q7_certificate'], reply_markup=get_yes_no_keyboard("back_q6"))
-            await state.set_state(SurveyStates.q7_certificate)
-        
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q6: {e}")
-
-
-# Q6 - Yutuqlar detallari
-@router.message(StateFilter(SurveyStates.q6_achievements_details))
-async def process_q6_details(message: Message, state: FSMContext):
-    """Yutuqlar tafsilotlari"""
-    try:
-        await state.update_data(achievements=message.text.strip())
-        await message.answer(text=TEXTS['q7_certificate'], reply_markup=get_yes_no_keyboard("back_q6"))
-        await state.set_state(SurveyStates.q7_certificate)
-    except Exception as e:
-        logger.error(f"Error in q6 details: {e}")
-
-
-# Q7 - Sertifikat
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q7_certificate))
-async def process_q7_certificate(callback: CallbackQuery, state: FSMContext):
-    """Til sertifikati bormi"""
-    try:
-        answer = callback.data.split("_")[1]
-        
-        if answer == "yes":
-            await state.update_data(has_certificate="Ha")
-            await callback.message.edit_text(text=TEXTS['q7_certificate_type'], reply_markup=get_certificate_type_keyboard("back_q7"))
-            await state.set_state(SurveyStates.q7_certificate_type)
-        else:
-            await state.update_data(has_certificate="Yo'q", certificate_type="", certificate_details="", certificate_file="")
-            await callback.message.edit_text(text=TEXTS['q9_grant'], reply_markup=get_yes_no_keyboard("back_q7"))
-            await state.set_state(SurveyStates.q9_grant)
-        
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q7: {e}")
-
-
-# Q7 - Sertifikat turi
-@router.callback_query(F.data.startswith("cert_"), StateFilter(SurveyStates.q7_certificate_type))
-async def process_q7_cert_type(callback: CallbackQuery, state: FSMContext):
-    """Sertifikat turi"""
-    try:
-        cert_type = callback.data.replace("cert_", "").upper()
-        await state.update_data(certificate_type=cert_type)
-        await callback.message.edit_text(text=TEXTS['q7_certificate_details'])
-        await state.set_state(SurveyStates.q7_certificate_details)
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q7 type: {e}")
-
-
-# Q7 - Sertifikat detallari
-@router.message(StateFilter(SurveyStates.q7_certificate_details))
-async def process_q7_cert_details(message: Message, state: FSMContext):
-    """Sertifikat ma'lumotlari"""
-    try:
-        await state.update_data(certificate_details=message.text.strip(), certificate_file="")
-        # To'g'ridan-to'g'ri Q9 ga o'tish
-        await message.answer(text=TEXTS['q9_grant'], reply_markup=get_yes_no_keyboard("back_q7"))
-        await state.set_state(SurveyStates.q9_grant)
-    except Exception as e:
-        logger.error(f"Error in q7 details: {e}")
-
-
-# Q9 - Grant
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q9_grant))
-async def process_q9_grant(callback: CallbackQuery, state: FSMContext):
-    """Grant bormi"""
-    try:
-        answer = callback.data.split("_")[1]
-        
-        if answer == "yes":
-            await state.update_data(has_grant="Ha")
-            await callback.message.edit_text(text=TEXTS['q9_grant_details'], reply_markup=get_back_keyboard("back_q9"))
-            await state.set_state(SurveyStates.q9_grant_details)
-        else:
-            await state.update_data(has_grant="Yo'q", grant_details="")
-            await callback.message.edit_text(text=TEXTS['q10_social_protection'], reply_markup=get_yes_no_keyboard("back_q9"))
-            await state.set_state(SurveyStates.q10_social_protection)
-        
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q9: {e}")
-
-
-# Q9 - Grant detallari
-@router.message(StateFilter(SurveyStates.q9_grant_details))
-async def process_q9_details(message: Message, state: FSMContext):
-    """Grant tafsilotlari"""
-    try:
-        await state.update_data(grant_details=message.text.strip())
-        await message.answer(text=TEXTS['q10_social_protection'], reply_markup=get_yes_no_keyboard("back_q9"))
-        await state.set_state(SurveyStates.q10_social_protection)
-    except Exception as e:
-        logger.error(f"Error in q9 details: {e}")
-
-
-# Q10 - Ijtimoiy himoya
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q10_social_protection))
-async def process_q10(callback: CallbackQuery, state: FSMContext):
-    """Ijtimoiy himoya reestri"""
-    try:
-        answer = "Ha" if callback.data == "answer_yes" else "Yo'q"
-        await state.update_data(social_protection=answer)
-        await callback.message.edit_text(text=TEXTS['q11_iron_book'], reply_markup=get_yes_no_keyboard("back_q10"))
-        await state.set_state(SurveyStates.q11_iron_book)
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q10: {e}")
-
-
-# Q11 - Temir daftar
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q11_iron_book))
-async def process_q11(callback: CallbackQuery, state: FSMContext):
-    """Temir daftar"""
-    try:
-        answer = "Ha" if callback.data == "answer_yes" else "Yo'q"
-        await state.update_data(iron_book=answer)
-        await callback.message.edit_text(text=TEXTS['q12_youth_book'], reply_markup=get_yes_no_keyboard("back_q11"))
-        await state.set_state(SurveyStates.q12_youth_book)
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q11: {e}")
-
-
-# Q12 - Yoshlar daftari
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q12_youth_book))
-async def process_q12(callback: CallbackQuery, state: FSMContext):
-    """Yoshlar daftari"""
-    try:
-        answer = "Ha" if callback.data == "answer_yes" else "Yo'q"
-        await state.update_data(youth_book=answer)
-        # Avval ota hayotdami savolini so'rash
-        await callback.message.edit_text(text=TEXTS['q14_father_alive'], reply_markup=get_yes_no_keyboard("back_q12"))
-        await state.set_state(SurveyStates.q14_father_alive)
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q12: {e}")
-
-
-# Q14 - Ota hayotdami (avval shu so'raladi)
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q14_father_alive))
-async def process_q14(callback: CallbackQuery, state: FSMContext):
-    """Ota hayotdami"""
-    try:
-        answer = callback.data.split("_")[1]
-        
-        if answer == "yes":
-            await state.update_data(father_alive="Ha")
-            # Ha bo'lsa - ism so'raladi
-            await callback.message.edit_text(text=TEXTS['q13_father_name'], reply_markup=get_back_keyboard("back_q14"))
-            await state.set_state(SurveyStates.q13_father_name)
-        else:
-            # Yo'q bo'lsa - ona hayotdami savoliga o'tish
-            await state.update_data(father_alive="Yo'q", father_name="", father_phone="")
-            await callback.message.edit_text(text=TEXTS['q16_mother_alive'], reply_markup=get_yes_no_keyboard("back_q14"))
-            await state.set_state(SurveyStates.q16_mother_alive)
-        
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q14: {e}")
-
-
-# Q13 - Ota ismi (faqat hayot bo'lsa so'raladi)
-@router.message(StateFilter(SurveyStates.q13_father_name))
-async def process_q13(message: Message, state: FSMContext):
-    """Ota ismi"""
-    try:
-        await state.update_data(father_name=message.text.strip())
-        await message.answer(text=TEXTS['q14_father_phone'], reply_markup=get_back_keyboard("back_q13"))
-        await state.set_state(SurveyStates.q14_father_phone)
-    except Exception as e:
-        logger.error(f"Error in q13: {e}")
-
-
-# Q14 - Ota telefoni
-@router.message(StateFilter(SurveyStates.q14_father_phone))
-async def process_q14_phone(message: Message, state: FSMContext):
-    """Ota telefoni"""
-    try:
-        await state.update_data(father_phone=message.text.strip())
-        # Ona hayotdami savoliga o'tish
-        await message.answer(text=TEXTS['q16_mother_alive'], reply_markup=get_yes_no_keyboard("back_q14_phone"))
-        await state.set_state(SurveyStates.q16_mother_alive)
-    except Exception as e:
-        logger.error(f"Error in q14 phone: {e}")
-
-
-# Q16 - Ona hayotdami (avval shu so'raladi)
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q16_mother_alive))
-async def process_q16(callback: CallbackQuery, state: FSMContext):
-    """Ona hayotdami"""
-    try:
-        answer = callback.data.split("_")[1]
-        data = await state.get_data()
-        
-        if answer == "yes":
-            await state.update_data(mother_alive="Ha")
-            # Ha bo'lsa - ism so'raladi
-            await callback.message.edit_text(text=TEXTS['q15_mother_name'], reply_markup=get_back_keyboard("back_q16"))
-            await state.set_state(SurveyStates.q15_mother_name)
-        else:
-            # Yo'q bo'lsa - keyingi savolga o'tish
-            await state.update_data(mother_alive="Yo'q", mother_name="", mother_phone="")
-            # Ikkalasi ham vafot etgan bo'lsa, ota-ona birgami savolini o'tkazish
-            if data.get('father_alive') == "Yo'q":
-                await state.update_data(parents_together="")
-                await callback.message.edit_text(text=TEXTS['q18_living_type'], reply_markup=get_living_type_keyboard("back_q16"))
-                await state.set_state(SurveyStates.q18_living_type)
+        if question.kind == LOCATION:
+            # Orqaga tugmasi bosildi (ReplyKeyboard)
+            if message.text == TEXTS['back']:
+                await ask_previous(message, state, question)
+                return
+            if message.location:
+                value = f"{message.location.latitude},{message.location.longitude}"
+            elif message.text == TEXTS['skip']:
+                value = ""
             else:
-                await callback.message.edit_text(text=TEXTS['q17_parents_together'], reply_markup=get_yes_no_keyboard("back_q16"))
-                await state.set_state(SurveyStates.q17_parents_together)
-        
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q16: {e}")
-
-
-# Q15 - Ona ismi (faqat hayot bo'lsa so'raladi)
-@router.message(StateFilter(SurveyStates.q15_mother_name))
-async def process_q15(message: Message, state: FSMContext):
-    """Ona ismi"""
-    try:
-        await state.update_data(mother_name=message.text.strip())
-        await message.answer(text=TEXTS['q16_mother_phone'], reply_markup=get_back_keyboard("back_q15"))
-        await state.set_state(SurveyStates.q16_mother_phone)
-    except Exception as e:
-        logger.error(f"Error in q15: {e}")
-
-
-# Q16 - Ona telefoni
-@router.message(StateFilter(SurveyStates.q16_mother_phone))
-async def process_q16_phone(message: Message, state: FSMContext):
-    """Ona telefoni"""
-    try:
-        await state.update_data(mother_phone=message.text.strip())
-        
-        # Ota ham tirik bo'lsa, ota-ona birgami savoli
-        data = await state.get_data()
-        if data.get('father_alive') == "Ha":
-            await message.answer(text=TEXTS['q17_parents_together'], reply_markup=get_yes_no_keyboard("back_q16_phone"))
-            await state.set_state(SurveyStates.q17_parents_together)
+                value = (message.text or "").strip()
+        elif message.text:
+            value = message.text.strip()
         else:
-            await state.update_data(parents_together="")
-            await message.answer(text=TEXTS['q18_living_type'], reply_markup=get_living_type_keyboard("back_q16_phone"))
-            await state.set_state(SurveyStates.q18_living_type)
-    except Exception as e:
-        logger.error(f"Error in q16 phone: {e}")
-
-
-# Q17 - Ota-ona birgami
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q17_parents_together))
-async def process_q17(callback: CallbackQuery, state: FSMContext):
-    """Ota-ona birga yashaydimi"""
-    try:
-        answer = "Ha" if callback.data == "answer_yes" else "Yo'q"
-        await state.update_data(parents_together=answer)
-        await callback.message.edit_text(text=TEXTS['q18_living_type'], reply_markup=get_living_type_keyboard("back_q17"))
-        await state.set_state(SurveyStates.q18_living_type)
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q17: {e}")
-
-
-# Q18 - Yashash turi
-@router.callback_query(F.data.startswith("living_"), StateFilter(SurveyStates.q18_living_type))
-async def process_q18(callback: CallbackQuery, state: FSMContext):
-    """Yashash turi"""
-    try:
-        living_type = callback.data.replace("living_", "")
-        living_map = {
-            'home': "Uydan (oila bilan)",
-            'ttj': "TTJ",
-            'rent': "Ijaradan",
-            'relatives': "Qarindoshlarnikida"
-        }
-        await state.update_data(living_type=living_map.get(living_type, living_type))
-        
-        if living_type == "ttj":
-            # TTJ tanlagan bo'lsa - qayerdan qatnaydi savoli
-            await callback.message.edit_text(
-                text="🏢 KUAF ga qayerdan qatnaysiz?",
-                reply_markup=get_ttj_type_keyboard("back_q18")
-            )
-            await state.set_state(SurveyStates.q18_ttj_type)
-        elif living_type == "rent":
-            # Ijara savollari
-            await callback.message.edit_text(text=TEXTS['q19_rent_address'], reply_markup=get_back_keyboard("back_q18"))
-            await state.set_state(SurveyStates.q19_rent_address)
-        else:
-            # Ijaraga oid savollarni o'tkazish
-            await state.update_data(rent_address="", rent_location="", rent_owner="", ttj_location="")
-            await callback.message.edit_text(text=TEXTS['q22_working'], reply_markup=get_yes_no_keyboard("back_q18"))
-            await state.set_state(SurveyStates.q22_working)
-        
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q18: {e}")
-
-
-# Q18 TTJ - Qayerdan qatnaydi
-@router.callback_query(F.data.startswith("ttj_"), StateFilter(SurveyStates.q18_ttj_type))
-async def process_q18_ttj(callback: CallbackQuery, state: FSMContext):
-    """TTJ dan qayerdan qatnaydi"""
-    try:
-        ttj_type = callback.data.replace("ttj_", "")
-        ttj_map = {
-            'uydan': "Uydan",
-            'jevachi': "Jevachi TTJ dan",
-            'kuaf': "KUAF TTJ dan",
-            'texnika': "Texnika DXSH dan",
-            'kamolot': "Kamolot Ko'cha TTJ dan",
-            'family_med': "FAMILY MED TTJ dan",
-            'ijara': "Ijaradan (kvartira)"
-        }
-        await state.update_data(ttj_location=ttj_map.get(ttj_type, ttj_type))
-        
-        # Ijaraga oid savollarni o'tkazish
-        await state.update_data(rent_address="", rent_location="", rent_owner="")
-        await callback.message.edit_text(text=TEXTS['q22_working'], reply_markup=get_yes_no_keyboard("back_q18_ttj"))
-        await state.set_state(SurveyStates.q22_working)
-        
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q18_ttj: {e}")
-
-
-# Q19 - Ijara manzili
-@router.message(StateFilter(SurveyStates.q19_rent_address))
-async def process_q19(message: Message, state: FSMContext):
-    """Ijara manzili"""
-    try:
-        await state.update_data(rent_address=message.text.strip())
-        await message.answer(text=TEXTS['q20_rent_location'], reply_markup=get_location_keyboard("back_q19"))
-        await state.set_state(SurveyStates.q20_rent_location)
-    except Exception as e:
-        logger.error(f"Error in q19: {e}")
-
-
-# Q20 - Ijara lokatsiyasi
-@router.message(StateFilter(SurveyStates.q20_rent_location))
-async def process_q20(message: Message, state: FSMContext):
-    """Ijara lokatsiyasi"""
-    try:
-        # Orqaga tugmasi bosildi
-        if message.text == "⬅️ Orqaga":
-            await message.answer(text=TEXTS['q19_rent_address'], reply_markup=get_back_keyboard("back_q18"))
-            await state.set_state(SurveyStates.q19_rent_address)
             return
         
-        if message.location:
-            location = f"{message.location.latitude},{message.location.longitude}"
-            await state.update_data(rent_location=location)
-        elif message.text == "⏭ O'tkazib yuborish":
-            await state.update_data(rent_location="")
-        else:
-            await state.update_data(rent_location=message.text.strip())
-        
-        await message.answer(text=TEXTS['q21_rent_owner'], reply_markup=get_back_keyboard("back_q20"))
-        await state.set_state(SurveyStates.q21_rent_owner)
+        await answer_question(message, state, question, value, message.from_user.id)
     except Exception as e:
-        logger.error(f"Error in q20: {e}")
+        logger.error(f"Error in {question.id}: {e}")
 
 
-# Q21 - Ijara egasi
-@router.message(StateFilter(SurveyStates.q21_rent_owner))
-async def process_q21(message: Message, state: FSMContext):
-    """Ijara egasi"""
+# Tugma bilan javoblar (Ha/Yo'q va tanlovlar)
+@router.callback_query(SurveyQuestionFilter())
+async def process_survey_callback(callback: CallbackQuery, state: FSMContext, question: Question):
+    """Inline tugma bilan javob beriladigan savollar"""
     try:
-        await state.update_data(rent_owner=message.text.strip())
-        await message.answer(text=TEXTS['q22_working'], reply_markup=get_yes_no_keyboard("back_q21"))
-        await state.set_state(SurveyStates.q22_working)
-    except Exception as e:
-        logger.error(f"Error in q21: {e}")
-
-
-# Q22 - Ishlaysizmi
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q22_working))
-async def process_q22(callback: CallbackQuery, state: FSMContext):
-    """Ishlaysizmi"""
-    try:
-        answer = callback.data.split("_")[1]
-        
-        if answer == "yes":
-            await state.update_data(is_working="Ha")
-            # Avvalgi savolga qarab back button
-            data = await state.get_data()
-            living_type = data.get('living_type', '')
-            if "Ijaradan" in living_type:
-                back_btn = "back_q21"
-            elif "TTJ" in living_type:
-                back_btn = "back_q18_ttj"
-            else:
-                back_btn = "back_q18"
-            await callback.message.edit_text(text=TEXTS['q23_workplace'], reply_markup=get_back_keyboard(back_btn))
-            await state.set_state(SurveyStates.q23_workplace)
-        else:
-            await state.update_data(is_working="Yo'q", workplace="")
-            # Oilalikmisiz savoliga o'tish
-            await callback.message.edit_text(text=TEXTS['q24_married'], reply_markup=get_yes_no_keyboard("back_q22"))
-            await state.set_state(SurveyStates.q24_married)
-        
+        value = question.callback_answer(callback.data)
+        await answer_question(callback.message, state, question, value, callback.from_user.id, edit=True)
         await callback.answer()
     except Exception as e:
-        logger.error(f"Error in q22: {e}")
+        logger.error(f"Error in {question.id}: {e}")
 
 
-# Q23 - Ish joyi
-@router.message(StateFilter(SurveyStates.q23_workplace))
-async def process_q23(message: Message, state: FSMContext):
-    """Ish joyi"""
-    try:
-        await state.update_data(workplace=message.text.strip())
-        # Oilalikmisiz savoliga o'tish
-        await message.answer(text=TEXTS['q24_married'], reply_markup=get_yes_no_keyboard("back_q23"))
-        await state.set_state(SurveyStates.q24_married)
-    except Exception as e:
-        logger.error(f"Error in q23: {e}")
-
-
-# Q24 - Oilalikmisiz
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q24_married))
-async def process_q24(callback: CallbackQuery, state: FSMContext):
-    """Oilalikmisiz"""
-    try:
-        answer = callback.data.split("_")[1]
-        
-        if answer == "yes":
-            await state.update_data(is_married="Ha")
-        else:
-            await state.update_data(is_married="Yo'q")
-        
-        # Q25 - Xorijga chiqish pasporti savoliga o'tish
-        await callback.message.edit_text(text=TEXTS['q25_foreign_passport'], reply_markup=get_yes_no_keyboard("back_q24"))
-        await state.set_state(SurveyStates.q25_foreign_passport)
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q24: {e}")
-
-
-# Q25 - Xorijga chiqish pasporti
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q25_foreign_passport))
-async def process_q25(callback: CallbackQuery, state: FSMContext):
-    """Xorijga chiqish pasporti"""
-    try:
-        answer = callback.data.split("_")[1]
-        
-        if answer == "yes":
-            await state.update_data(has_foreign_passport="Ha")
-        else:
-            await state.update_data(has_foreign_passport="Yo'q")
-        
-        # Q26 - Ijtimoiy tarmoqlar savoliga o'tish
-        await callback.message.edit_text(text=TEXTS['q26_social_channels'], reply_markup=get_yes_no_keyboard("back_q25"))
-        await state.set_state(SurveyStates.q26_social_channels)
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q25: {e}")
-
-
-# Q26 - Ijtimoiy tarmoqlarda kanal/guruh
-@router.callback_query(F.data.startswith("answer_"), StateFilter(SurveyStates.q26_social_channels))
-async def process_q26(callback: CallbackQuery, state: FSMContext):
-    """Ijtimoiy tarmoqlarda kanal/guruh bormi"""
-    try:
-        answer = callback.data.split("_")[1]
-        
-        if answer == "yes":
-            await state.update_data(has_social_channels="Ha")
-            await callback.message.edit_text(text=TEXTS['q26_social_links'], reply_markup=get_back_keyboard("back_q26"))
-            await state.set_state(SurveyStates.q26_social_links)
-        else:
-            await state.update_data(has_social_channels="Yo'q", social_links="")
-            # So'rovnomani yakunlash
-            await finish_survey(callback.message, state, callback.from_user.id)
-        
-        await callback.answer()
-    except Exception as e:
-        logger.error(f"Error in q26: {e}")
-
-
-# Q26 - Ijtimoiy tarmoq linklari
-@router.message(StateFilter(SurveyStates.q26_social_links))
-async def process_q26_links(message: Message, state: FSMContext):
-    """Ijtimoiy tarmoq linklari"""
-    try:
-        await state.update_data(social_links=message.text.strip())
-        # So'rovnomani yakunlash
-        await finish_survey(message, state, message.from_user.id)
-    except Exception as e:
-        logger.error(f"Error in q26 links: {e}")
+async def answer_question(message: Message, state: FSMContext, question: Question, value: str,
+                          user_id: int, edit: bool = False):
+    """Javobni saqlash va grafdagi keyingi savolga o'tish"""
+    data = await state.update_data({question.field: value})
+    next_question = SURVEY.next(question, data)
+    if next_question is None:
+        await finish_survey(message, state, user_id)
+    else:
+        await ask_question(message, state, next_question, question.key, edit=edit)
 
 
 # So'rovnomani yakunlash
 async def finish_survey(message: Message, state: FSMContext, user_id: int):
     """So'rovnomani saqlash va yakunlash"""
     try:
-        data = await state.get_data()
+        # O'tkazib yuborilgan tarmoqlarning (orqaga qaytib o'zgartirilgan) eski javoblari bo'shatiladi
+        data = SURVEY.answers(await state.get_data())
         data['user_id'] = user_id
         
         success = await db.save_survey_response(data)
@@ -1149,6 +581,7 @@ async def finish_survey(message: Message, state: FSMContext, user_id: int):
         await message.answer(TEXTS['error'])
 
 
+
 # ================= ADMIN HANDLERS =================
 
 @router.message(Command("admin"))
@@ -1166,6 +599,29 @@ async def cmd_admin(message: Message, state: FSMContext):
         logger.error(f"Error in cmd_admin: {e}")
 
 
+@router.message(Command("metrics"))
+async def cmd_metrics(message: Message):
+    """Handler, DB va Telegram API kechikishlari"""
+    try:
+        if not (await is_super_admin(message.from_user.id) or await is_staff_member(message.from_user.id)):
+            await message.answer(TEXTS['access_denied'])
+            return
+        
+        lines = metrics.summary()
+        if db.query_log:
+            lines.append(f"\n🐢 Og'ir SQL so'rovlar (chegara {SLOW_QUERY_MS:.0f}ms):")
+            for item in db.query_log.stats(5):
+                flag = " ⚠️ SCAN" if item['full_scan'] else ""
+                lines.append(
+                    f"  • {item['count']} ta, o'rtacha {item['avg_ms']:.1f}ms, max {item['max_ms']:.0f}ms, "
+                    f"sekin {item['slow']}{flag}\n    {item['sql'][:200]}"
+                )
+        for chunk in split_message(lines):
+            await message.answer(chunk)
+    except Exception as e:
+        logger.error(f"Error in cmd_metrics: {e}")
+
+
 # Excel Export
 @router.callback_query(F.data == "admin_export")
 async def admin_export(callback: CallbackQuery, state: FSMContext):
@@ -1219,24 +675,31 @@ async def process_excel_import(message: Message, state: FSMContext):
         file_path = os.path.join(EXCEL_DIR, f"import_{message.from_user.id}_{datetime.now().timestamp()}.xlsx")
         await bot.download_file(file.file_path, file_path)
         
-        await message.answer("⏳ Import boshlanmoqda...")
-        result = await excel_handler.import_students(file_path)
-        
-        if result['success']:
-            await message.answer(
-                f"✅ Import yakunlandi!\n\n"
-                f"➕ Qo'shildi: {result['added']}\n"
-                f"🔄 Yangilandi: {result['updated']}\n"
-                f"⚠️ Xatolar: {len(result['errors'])}"
-            )
-        else:
-            await message.answer(f"❌ Import xatoligi:\n{result['errors'][:5]}")
+        # Import navbatga qo'yiladi - progress xabari fon rejimida yangilanadi
+        await import_jobs.submit(message.from_user.id, message.chat.id, file_path, message.document.file_name)
         
         await state.set_state(AdminStates.main_panel)
     except Exception as e:
         logger.error(f"Error in process_excel_import: {e}")
 
 
+@router.callback_query(F.data.startswith("cancel_import_"))
+async def cancel_import(callback: CallbackQuery, state: FSMContext):
+    """Importni bekor qilish"""
+    try:
+        if not await is_super_admin(callback.from_user.id):
+            await callback.answer("Faqat admin uchun", show_alert=True)
+            return
+        
+        job_id = int(callback.data.replace("cancel_import_", ""))
+        if await import_jobs.cancel(job_id):
+            await callback.answer("⛔ Import bekor qilinmoqda...")
+        else:
+            await callback.answer("Import allaqachon yakunlangan", show_alert=True)
+    except Exception as e:
+        logger.error(f"Error in cancel_import: {e}")
+
+
 # Statistika
 @router.callback_query(F.data == "admin_stats")
 async def admin_stats(callback: CallbackQuery, state: FSMContext):
@@ -1248,6 +711,23 @@ async def admin_stats(callback: CallbackQuery, state: FSMContext):
         response += f"👥 Jami talabalar: {stats['total_students']}\n"
         response += f"✅ To'ldirilgan so'rovnomalar: {stats['completed_surveys']}\n"
         response += f"👨‍💼 Xodimlar: {stats['total_staff']}\n"
+        
+        for dimension, title, suffix in (("faculty", "🏛 Fakultetlar", ""), ("course", "🎓 Kurslar", "-kurs")):
+            rows = await db.get_statistics_breakdown(dimension)
+            if not rows:
+                continue
+            response += f"\n{title}:\n"
+            for row in rows:
+                name = f"{row['key']}{suffix}" if row['key'] else "Ko'rsatilmagan"
+                percent = row['responses'] / row['students'] * 100
+                response += f"  • {name}: {row['responses']}/{row['students']} ({percent:.0f}%)\n"
+        
+        if CHANNEL_USERNAME:
+            sub = subscription_checker.stats()
+            response += (
+                f"\n📢 Obuna keshi: {sub['hit_rate']:.1f}% hit "
+                f"({sub['hits']} hit, {sub['coalesced']} birlashtirilgan, {sub['misses']} API)\n"
+            )
         response += f"\n📅 {datetime.now().strftime('%d.%m.%Y %H:%M')}"
         
         await callback.message.answer(response)
@@ -1256,6 +736,107 @@ async def admin_stats(callback: CallbackQuery, state: FSMContext):
         logger.error(f"Error in admin_stats: {e}")
 
 
+# To'ldirish holati (fakultet / kurs / guruh)
+def format_percent(completed: int, total: int) -> str:
+    return f"{completed}/{total} ({completed / total * 100:.0f}%)" if total else "0/0"
+
+
+def split_message(lines: list, limit: int = 4000) -> list:
+    """Uzun matnni Telegram limiti bo'yicha bo'laklarga ajratish"""
+    chunks, current = [], ""
+    for line in lines:
+        if current and len(current) + len(line) + 1 > limit:
+            chunks.append(current)
+            current = ""
+        current += line + "\n"
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def get_completion_by_faculty() -> Dict[str, list]:
+    """Hisobot qatorlarini fakultet bo'yicha guruhlash (fakultetlar alifbo tartibida)"""
+    faculties: Dict[str, list] = {}
+    for row in await db.get_completion_report():
+        faculties.setdefault(row['faculty'] or "Ko'rsatilmagan", []).append(row)
+    return dict(sorted(faculties.items()))
+
+
+def faculty_key(faculty: str) -> str:
+    """Fakultet tugmasi uchun barqaror qisqa kalit (ro'yxat o'zgarsa ham o'sha fakultet)"""
+    return hashlib.sha1(faculty.encode('utf-8')).hexdigest()[:12]
+
+
+@router.callback_query(F.data == "admin_completion")
+async def admin_completion(callback: CallbackQuery, state: FSMContext):
+    """Fakultet va kurslar bo'yicha to'ldirish foizi"""
+    try:
+        if not (await is_super_admin(callback.from_user.id) or await is_staff_member(callback.from_user.id)):
+            await callback.answer("Ruxsat yo'q", show_alert=True)
+            return
+        
+        faculties = await get_completion_by_faculty()
+        if not faculties:
+            await callback.answer("Talabalar mavjud emas", show_alert=True)
+            return
+        
+        lines = ["📈 TO'LDIRISH HOLATI\n"]
+        buttons = []
+        for faculty, rows in faculties.items():
+            lines.append(f"🏛 {faculty}: {format_percent(sum(r['completed'] for r in rows), sum(r['students'] for r in rows))}")
+            courses: Dict[str, list] = {}
+            for row in rows:
+                totals = courses.setdefault(row['course'] or '', [0, 0])
+                totals[0] += row['completed']
+                totals[1] += row['students']
+            for course, (completed, total) in sorted(courses.items()):
+                label = f"{course}-kurs" if course else "Kurs ko'rsatilmagan"
+                lines.append(f"   • {label}: {format_percent(completed, total)}")
+            buttons.append([InlineKeyboardButton(text=f"🏛 {faculty}"[:60], callback_data=f"completion_f_{faculty_key(faculty)}")])
+        lines.append(f"\n📅 {datetime.now().strftime('%d.%m.%Y %H:%M')}")
+        
+        chunks = split_message(lines)
+        for chunk in chunks[:-1]:
+            await callback.message.answer(chunk)
+        await callback.message.answer(
+            chunks[-1] + "\nGuruhlar ro'yxati uchun fakultetni tanlang:",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons)
+        )
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error in admin_completion: {e}")
+
+
+@router.callback_query(F.data.startswith("completion_f_"))
+async def admin_completion_faculty(callback: CallbackQuery, state: FSMContext):
+    """Fakultet guruhlari - eng kam to'ldirganlari birinchi"""
+    try:
+        if not (await is_super_admin(callback.from_user.id) or await is_staff_member(callback.from_user.id)):
+            await callback.answer("Ruxsat yo'q", show_alert=True)
+            return
+        
+        key = callback.data.replace("completion_f_", "")
+        faculties = await get_completion_by_faculty()
+        faculty = next((name for name in faculties if faculty_key(name) == key), None)
+        if faculty is None:
+            await callback.answer("Fakultet topilmadi (ro'yxat yangilangan), qaytadan oching", show_alert=True)
+            return
+        
+        rows = faculties[faculty]
+        rows = sorted(rows, key=lambda r: (r['completed'] / r['students'], r['course'] or '', r['group_name'] or ''))
+        lines = [f"🏛 {faculty} - guruhlar\n"]
+        for row in rows:
+            mark = "✅" if row['completed'] == row['students'] else ("❗" if row['completed'] == 0 else "⏳")
+            course = f" ({row['course']}-kurs)" if row['course'] else ""
+            lines.append(f"{mark} {row['group_name'] or '—'}{course}: {format_percent(row['completed'], row['students'])}")
+        
+        for chunk in split_message(lines):
+            await callback.message.answer(chunk)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error in admin_completion_faculty: {e}")
+
+
 # So'rovnomalarni tozalash
 @router.callback_query(F.data == "admin_clear_surveys")
 async def admin_clear_surveys(callback: CallbackQuery, state: FSMContext):
@@ -1400,10 +981,9 @@ async def process_announcement(message: Message, state: FSMContext):
             else:
                 await message.answer("❌ Xodim topilmadi")
         else:
-            # E'lon yuborish
+            # E'lon yuborish - navbatga qo'yiladi, progress alohida xabarda
             announcement = message.text.strip()
-            # TODO: Barcha foydalanuvchilarga yuborish
-            await message.answer(f"✅ E'lon saqlandi:\n\n{announcement}\n\n(Hozircha faqat saqlandi, yuborish funksiyasi keyinroq qo'shiladi)")
+            await broadcaster.submit(message.from_user.id, message.chat.id, announcement)
         
         await state.set_state(AdminStates.main_panel)
         await message.answer(text=TEXTS['admin_panel'], reply_markup=get_admin_keyboard())
@@ -1414,8 +994,74 @@ async def process_announcement(message: Message, state: FSMContext):
 
 
 # ================= MAIN =================
+async def serve(dispatcher: Dispatcher, allowed_updates: Optional[list] = None):
+    """Updatelarni qabul qilish: polling yoki webhook (BOT_MODE)"""
+    if BOT_MODE == 'webhook':
+        logger.info("Bot started (webhook)")
+        await run_webhook(
+            dispatcher, bot,
+            host=WEBAPP_HOST,
+            port=WEBAPP_PORT,
+            path=WEBHOOK_PATH,
+            base_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+            drain_timeout=WEBHOOK_DRAIN_TIMEOUT,
+            allowed_updates=allowed_updates,
+        )
+    else:
+        logger.info("Bot started (polling)")
+        # Oldin webhook rejimida ishlagan bo'lsa - polling bilan to'qnashmasligi uchun
+        await bot.delete_webhook()
+        await dispatcher.start_polling(bot, allowed_updates=allowed_updates)
+
+
+def run_worker(index: int, worker_queue):
+    """Worker protsessi (WORKERS > 1): supervisor yuborgan updatelarni ishlaydi"""
+    asyncio.run(_worker_main(index, worker_queue))
+
+
+async def start_metrics(port: int):
+    """Metrikalar endpointini ishga tushirish (METRICS_PORT=0 - o'chirilgan)"""
+    if not METRICS_PORT:
+        return None
+    try:
+        return await metrics.start_metrics_server(METRICS_HOST, port)
+    except OSError as e:
+        logger.error(f"Error starting metrics endpoint: {e}")
+        return None
+
+
+async def _worker_main(index: int, worker_queue):
+    excel_handler.cache_name = f"sorovnoma_natijalari_w{index}.xlsx"
+    metrics_runner = None
+    if db.query_log:
+        # Aylanma log fayli protsesslar orasida bo'lishilmaydi
+        root, ext = os.path.splitext(SLOW_QUERY_LOG)
+        db.query_log = SlowQueryLog(SLOW_QUERY_MS, f"{root}_w{index}{ext}")
+    try:
+        await db.init_db()
+        # Har bir worker o'z portida: METRICS_PORT + 1 + index
+        metrics_runner = await start_metrics(METRICS_PORT + 1 + index)
+        # Import va e'lonlarni har bir worker jadvaldan oladi (har biridan bir vaqtda
+        # bittadan), tugallanmaganlarini supervisor tiklagan
+        await import_jobs.start(resume=False)
+        await broadcaster.start(resume=False)
+        logger.info(f"Worker {index} started")
+        await serve_worker(dp, bot, worker_queue, refresh=db.refresh_staff)
+    except Exception as e:
+        logger.error(f"Error in worker {index}: {e}")
+    finally:
+        await import_jobs.stop()
+        await broadcaster.stop()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        db.close()
+
+
 async def main():
     """Botni ishga tushirish"""
+    metrics_runner = None
     try:
         await db.init_db()
         logger.info("Database initialized")
@@ -1424,11 +1070,29 @@ async def main():
         os.makedirs(EXPORT_DIR, exist_ok=True)
         os.makedirs('logs', exist_ok=True)
         
-        logger.info("Bot started")
-        await dp.start_polling(bot)
+        metrics_runner = await start_metrics(METRICS_PORT)
+        
+        if WORKERS > 1:
+            # Supervisor: updatelarni qabul qilib user_id bo'yicha workerlarga taqsimlaydi
+            await import_jobs.recover()
+            await broadcaster.recover()
+            pool = WorkerPool(WORKERS, run_worker)
+            pool.start()
+            try:
+                await serve(pool.dispatcher(), allowed_updates=dp.resolve_used_update_types())
+            finally:
+                await asyncio.to_thread(pool.stop)
+        else:
+            await import_jobs.start()
+            await broadcaster.start()
+            await serve(dp)
     except Exception as e:
         logger.error(f"Error in main: {e}")
     finally:
+        await import_jobs.stop()
+        await broadcaster.stop()
+        if metrics_runner:
+            await metrics_runner.cleanup()
         db.close()
 
 
@@ -0,0 +1,268 @@
+# broadcast.py - E'lonlarni barcha foydalanuvchilarga yuborish (rate limit + navbat)
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket: sekundiga `rate` ta token, eng ko'pi bilan `capacity` ta
+    to'planadi. RetryAfter kelganda pause() butun bucketni to'xtatib turadi.
+
+    Istalgan 1 soniyalik oynada `rate + capacity` tadan ko'p xabar ketmaydi,
+    shuning uchun capacity kichik (default 1) - xabarlar bir tekis yuboriladi.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Broadcaster:
+    """
+    E'lonlar navbati.
+
+    - E'lon yaratilganda barcha qabul qiluvchilar broadcast_queue jadvaliga
+      yoziladi; natijalar har `batch_size` ta xabardan keyin saqlanadi, shu
+      sababli restartdan keyin yuborish to'xtagan joyidan davom etadi.
+    - E'lon jadvaldan atomar olinadi (claim_broadcast_job): boshqa e'lon
+      yuborilayotgan bo'lsa hech kim olmaydi. Ko'p protsessli rejimda ham bir
+      vaqtda bitta protsess yuboradi - token bucket limiti umumiy bo'lib qoladi.
+      Boshqa protsessda qo'yilgan e'lon `poll_interval` soniya ichida olinadi.
+    - Global tezlik token bucket bilan cheklanadi (Telegram ~30 xabar/s),
+      bitta chatga esa `per_chat_interval` soniyada bittadan ko'p yuborilmaydi.
+    - TelegramRetryAfter - butun bucket ko'rsatilgan vaqtga to'xtaydi va
+      xabar qayta yuboriladi; botni bloklaganlar o'tkazib yuboriladi.
+    - Tugagach admin ga yuborilgan/xato sonlari va tezlik hisoboti yuboriladi.
+    """
+
+    MAX_RETRIES = 3
+
+    def __init__(
+        self,
+        db,
+        bot,
+        rate: float = 25.0,
+        per_chat_interval: float = 1.0,
+        concurrency: int = 10,
+        batch_size: int = 100,
+        progress_interval: float = 5.0,
+        poll_interval: float = 2.0,
+    ):
+        self.db = db
+        self.bot = bot
+        self.bucket = TokenBucket(rate)
+        self.per_chat_interval = per_chat_interval
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.poll_interval = poll_interval
+        self._last_sent: Dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @staticmethod
+    def format_report(job: Dict[str, Any], title: str, elapsed: float = None, sent_now: int = 0) -> str:
+        text = (
+            f"{title} (#{job['id']})\n\n"
+            f"👥 Jami: {job['total']}\n"
+            f"✅ Yuborildi: {job['sent']}\n"
+            f"🚫 Bloklagan: {job['blocked']}\n"
+            f"❌ Xatolik: {job['failed']}"
+        )
+        if elapsed:
+            text += f"\n⏱ Vaqt: {elapsed:.0f}s ({sent_now / elapsed:.1f} xabar/s)"
+        return text
+
+    async def start(self, resume: bool = True):
+        """
+        Workerni ishga tushirish. resume=True - avval tugallanmagan e'lonlarni tiklash
+        (ko'p protsessli rejimda buni supervisor workerlardan oldin bajaradi)
+        """
+        if resume:
+            await self.recover()
+        self._worker = asyncio.create_task(self._run())
+
+    async def recover(self):
+        """Oldingi ishga tushirishdan qolgan yuborilayotgan e'lonlar qayta navbatga"""
+        for job in await self.db.get_pending_broadcast_jobs():
+            if job['status'] == 'running':
+                await self.db.update_broadcast_job(job['id'], status='queued')
+                logger.info(f"Broadcast #{job['id']} requeued")
+
+    async def submit(self, admin_id: int, chat_id: int, text: str) -> Dict[str, int]:
+        """E'lonni navbatga qo'yish"""
+        created = await self.db.create_broadcast(admin_id, chat_id, text)
+        job = await self.db.get_broadcast_job(created['id'])
+        message = await self.bot.send_message(chat_id, self.format_report(job, "📢 E'lon navbatga qo'yildi"))
+        await self.db.update_broadcast_job(job['id'], message_id=message.message_id)
+        self._wakeup.set()
+        return created
+
+    async def stop(self, timeout: float = 30.0):
+        """Joriy paket yozilguncha kutib workerni to'xtatish (e'lon restartda davom etadi)"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._worker, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Broadcast worker did not stop in time")
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        while not self._stopping:
+            # submit() uyg'otadi; boshqa protsesslar qo'ygan e'lonlar - so'rov bilan
+            self._wakeup.clear()
+            try:
+                job = await self.db.claim_broadcast_job()
+            except Exception as e:
+                logger.error(f"Error claiming broadcast job: {e}")
+                job = None
+            if job is not None and self._stopping:
+                # To'xtash paytida olingan e'lon boshqa protsess (yoki restart) uchun qaytariladi
+                await self.db.update_broadcast_job(job['id'], expected_status='running', status='queued')
+                break
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(job)
+            except Exception as e:
+                logger.error(f"Broadcast #{job['id']} failed: {e}")
+                # Keyingi e'lonlar to'xtab qolmasligi uchun navbatdan chiqariladi
+                await self.db.update_broadcast_job(
+                    job['id'], expected_status='running',
+                    status='failed', finished_at=datetime.now().isoformat(' ', 'seconds')
+                )
+
+    async def _process(self, job: Dict[str, Any]):
+        job_id = job['id']
+        logger.info(f"Broadcast #{job_id} started: {job['total']} recipients")
+
+        started = time.monotonic()
+        last_edit = started
+        sent_now = 0
+        after_user_id = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(user_id: int) -> Tuple[int, str, Optional[str]]:
+            async with semaphore:
+                return await self._send(user_id, job['text'])
+
+        while not self._stopping:
+            batch = await self.db.get_broadcast_batch(job_id, after_user_id, self.batch_size)
+            if not batch:
+                break
+            after_user_id = batch[-1]
+
+            results: List[tuple] = await asyncio.gather(*(deliver(user_id) for user_id in batch))
+            await self.db.save_broadcast_results(job_id, results)
+            sent_now += sum(1 for _, status, _ in results if status == 'sent')
+
+            if time.monotonic() - last_edit >= self.progress_interval:
+                last_edit = time.monotonic()
+                job = await self.db.get_broadcast_job(job_id)
+                await self._edit(job, self.format_report(job, "📢 E'lon yuborilmoqda"))
+
+        if self._stopping:
+            # Bot to'xtatilmoqda - e'lon restartdan keyin to'xtagan joyidan davom etadi
+            await self.db.update_broadcast_job(job_id, status='queued')
+            logger.info(f"Broadcast #{job_id} interrupted by shutdown")
+            return
+
+        elapsed = time.monotonic() - started
+        await self.db.update_broadcast_job(
+            job_id, status='done', finished_at=datetime.now().isoformat(' ', 'seconds')
+        )
+        job = await self.db.get_broadcast_job(job_id)
+        logger.info(
+            f"Broadcast #{job_id} done: sent={job['sent']} blocked={job['blocked']} "
+            f"failed={job['failed']} in {elapsed:.1f}s"
+        )
+        report = self.format_report(job, "✅ E'lon yuborildi", elapsed, sent_now)
+        await self._edit(job, report)
+        try:
+            await self.bot.send_message(job['chat_id'], report)
+        except Exception as e:
+            logger.error(f"Error sending broadcast report: {e}")
+
+    async def _wait_chat(self, chat_id: int):
+        """Bitta chatga yuborish oralig'ini saqlash"""
+        now = time.monotonic()
+        last = self._last_sent.get(chat_id)
+        if last is not None and now - last < self.per_chat_interval:
+            await asyncio.sleep(self.per_chat_interval - (now - last))
+        self._last_sent[chat_id] = time.monotonic()
+        if len(self._last_sent) > 10000:
+            cutoff = time.monotonic() - self.per_chat_interval
+            self._last_sent = {cid: ts for cid, ts in self._last_sent.items() if ts > cutoff}
+
+    async def _send(self, user_id: int, text: str) -> Tuple[int, str, Optional[str]]:
+        for _ in range(self.MAX_RETRIES):
+            await self._wait_chat(user_id)
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(user_id, text)
+                return user_id, 'sent', None
+            except TelegramRetryAfter as e:
+                logger.warning(f"Broadcast flood limit, sleeping {e.retry_after}s")
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError as e:
+                return user_id, 'blocked', str(e)
+            except TelegramBadRequest as e:
+                return user_id, 'failed', str(e)
+            except Exception as e:
+                return user_id, 'failed', str(e)
+        return user_id, 'failed', "RetryAfter limit"
+
+    async def _edit(self, job: Dict[str, Any], text: str):
+        if not job.get('message_id'):
+            return
+        try:
+            await self.bot.edit_message_text(text=text, chat_id=job['chat_id'], message_id=job['message_id'])
+        except TelegramBadRequest as e:
+            if 'message is not modified' not in str(e):
+                logger.warning(f"Error editing broadcast progress: {e}")
+        except Exception as e:
+            logger.warning(f"Error editing broadcast progress: {e}")
@@ -3,512 +3,1453 @@
 import sqlite3
 import asyncio
 import os
+import time
 from datetime import datetime
-from typing import Optional, Dict, List, Any
-from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Any, Callable, Set
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import threading
 
+from metrics import observe_db
+from query_log import SlowQueryLog
+
+
+# students jadvalining import qilinadigan ustunlari (unique_id dan tashqari)
+STUDENT_FIELDS = (
+    'talaba_id', 'fullname', 'citizenship', 'country', 'nationality',
+    'region', 'district', 'gender', 'birth_date', 'passport', 'jshshir', 'passport_date',
+    'course', 'faculty', 'group_name', 'language', 'study_year', 'semester', 'graduate',
+    'specialty', 'education_type', 'education_form', 'payment_type', 'grant_type',
+    'previous_education', 'student_category', 'social_category', 'family_members', 'phone',
+)
+
+# survey_responses ning so'rovnomadan yoziladigan ustunlari
+RESPONSE_FIELDS = (
+    'user_id', 'unique_id', 'fullname', 'group_name',
+    'phone', 'permanent_address', 'permanent_location', 'previous_education', 'document_number',
+    'has_achievements', 'achievements',
+    'has_certificate', 'certificate_type', 'certificate_details', 'certificate_file',
+    'has_grant', 'grant_details',
+    'social_protection', 'iron_book', 'youth_book',
+    'father_name', 'father_alive', 'father_phone',
+    'mother_name', 'mother_alive', 'mother_phone', 'parents_together',
+    'living_type', 'ttj_location', 'rent_address', 'rent_location', 'rent_owner',
+    'is_working', 'workplace', 'is_married',
+    'has_foreign_passport', 'has_social_channels', 'social_links',
+)
+
+# survey_responses bilan JOIN qilinadigan (exportga chiqadigan) talaba ustunlari
+RESPONSE_JOIN_FIELDS = (
+    'talaba_id', 'citizenship', 'country', 'nationality',
+    'region', 'district', 'gender', 'birth_date', 'passport',
+    'jshshir', 'passport_date', 'course', 'faculty',
+    'language', 'study_year', 'semester', 'graduate',
+    'specialty', 'education_type', 'education_form',
+    'payment_type', 'grant_type', 'student_category',
+    'social_category', 'family_members',
+)
+
+# Statistika kesimlari: nomi -> students ustuni
+STATS_DIMENSIONS = {
+    'faculty': 'faculty',
+    'course': 'course',
+    'group': 'group_name',
+}
+
+
+def _bump_counter(scope: str, key_expr: str, delta: str, source: str = '') -> str:
+    """stats_counters ga delta qo'shadigan trigger buyrug'i"""
+    return f"""
+        INSERT INTO stats_counters (scope, key, value)
+        SELECT '{scope}', {key_expr}, {delta} {source or 'WHERE true'}
+        ON CONFLICT(scope, key) DO UPDATE SET value = value + excluded.value;"""
+
 
 class Database:
-    """Thread-safe SQLite database manager"""
+    """Thread-safe SQLite database manager
+
+    Yozish amallari bitta writer threadda ketma-ket bajariladi, o'qish
+    amallari esa read-only connectionlar pulida parallel ishlaydi. Shu
+    sababli sqlite3 chaqiruvlari hech qachon event loopni bloklamaydi.
+    """
     
-    def __init__(self, db_path: str):
+    # Takroriy javoblarni tozalashda bitta tranzaksiyada o'chiriladigan qatorlar
+    DEDUP_BATCH_SIZE = 500
+    
+    def __init__(
+        self,
+        db_path: str,
+        read_pool_size: int = 4,
+        keep_response_history: bool = True,
+        slow_query_ms: float = 0,
+        slow_query_log: str = 'logs/slow_queries.log',
+    ):
         self.db_path = db_path
+        # Sekin so'rovlar jurnali (slow_query_ms > 0 bo'lsa yoqiladi)
+        self.query_log = SlowQueryLog(slow_query_ms, slow_query_log) if slow_query_ms > 0 else None
+        # Qayta topshirilganda eski javob survey_response_history ga ko'chiriladi
+        self.keep_response_history = keep_response_history
         self._local = threading.local()
         self._init_lock = asyncio.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._readers = ThreadPoolExecutor(max_workers=read_pool_size, thread_name_prefix='db-reader')
+        # Xodimlar keshi: init_db da yuklanadi, add/remove_staff bilan yangilanadi
+        self._staff_ids: Optional[Set[int]] = None
+        # To'ldirish hisoboti keshi: (stats_generation, qatorlar)
+        self._completion_cache: Optional[tuple] = None
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
     
-    def _get_connection(self):
+    def _get_connection(self, readonly: bool = False):
         """Har bir thread uchun alohida connection"""
         if not hasattr(self._local, 'connection'):
-            self._local.connection = sqlite3.connect(
+            conn = sqlite3.connect(
                 self.db_path,
                 check_same_thread=False,
                 timeout=30.0,
                 isolation_level=None
             )
-            self._local.connection.row_factory = sqlite3.Row
-            self._local.connection.execute("PRAGMA journal_mode=WAL")
-            self._local.connection.execute("PRAGMA synchronous=NORMAL")
-            self._local.connection.execute("PRAGMA cache_size=10000")
-            self._local.connection.execute("PRAGMA temp_store=MEMORY")
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA cache_size=10000")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            if readonly:
+                conn.execute("PRAGMA query_only=ON")
+            with self._connections_lock:
+                self._connections.append(conn)
+            self._local.connection = conn
         return self._local.connection
     
-    @asynccontextmanager
-    async def get_cursor(self):
-        """Async cursor"""
-        conn = self._get_connection()
+    @contextmanager
+    def get_cursor(self, write: bool = False):
+        """Joriy thread connectioni uchun cursor (faqat executor ichida)"""
+        conn = self._get_connection(readonly=not write)
         cursor = conn.cursor()
+        if self.query_log:
+            cursor = self.query_log.wrap(cursor)
+        if write:
+            cursor.execute("BEGIN IMMEDIATE")
         try:
             yield cursor
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
+            if conn.in_transaction:
+                conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
         finally:
             cursor.close()
     
+    def _call(self, write: bool, fn: Callable, args: tuple, submitted: float):
+        # Metrika: navbatda kutish, bajarilish vaqti (commit bilan) va qatorlar soni
+        started = time.perf_counter()
+        rows = 0
+        try:
+            with self.get_cursor(write=write) as cursor:
+                result = fn(cursor, *args)
+                rows = len(result) if isinstance(result, list) else max(cursor.rowcount, 0)
+            return result
+        finally:
+            observe_db(
+                getattr(fn, '__name__', 'unknown').lstrip('_'),
+                'write' if write else 'read',
+                started - submitted,
+                time.perf_counter() - started,
+                rows,
+            )
+    
+    async def run_read(self, fn: Callable, *args):
+        """fn(cursor, *args) ni read-only pulda bajarish"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._call, False, fn, args, time.perf_counter())
+    
+    async def run_write(self, fn: Callable, *args):
+        """fn(cursor, *args) ni writer threadda bitta tranzaksiyada bajarish"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._call, True, fn, args, time.perf_counter())
+    
     async def get_next_unique_id(self) -> str:
-        """Keyingi unikal ID (1, 2, 3, ...)"""
-        async with self.get_cursor() as cursor:
-            cursor.execute("SELECT MAX(CAST(unique_id AS INTEGER)) as max_id FROM students WHERE unique_id IS NOT NULL")
-            row = cursor.fetchone()
-            if row and row['max_id']:
-                next_id = int(row['max_id']) + 1
-            else:
-                next_id = 1
-            return str(next_id)
+        """Keyingi unikal ID ni band qilish (1, 2, 3, ...)"""
+        first_id = await self.run_write(self._allocate_unique_ids, 1)
+        return str(first_id)
+    
+    def _allocate_unique_ids(self, cursor, count: int) -> int:
+        """
+        Ketma-ket `count` ta unikal ID band qilish, birinchisini qaytaradi.
+        Writer tranzaksiyasi (BEGIN IMMEDIATE) ichida bajariladi, shuning uchun
+        parallel importlar bir xil ID olmaydi.
+        """
+        cursor.execute(
+            "UPDATE sequences SET value = value + ? WHERE name = 'student_unique_id'",
+            (count,)
+        )
+        cursor.execute("SELECT value FROM sequences WHERE name = 'student_unique_id'")
+        last_id = cursor.fetchone()['value']
+        return last_id - count + 1
     
     async def init_db(self):
         """Ma'lumotlar bazasini yaratish"""
         async with self._init_lock:
-            async with self.get_cursor() as cursor:
-                # Talabalar jadvali - Excel ustunlari bilan
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS students (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        unique_id TEXT UNIQUE NOT NULL,
-                        talaba_id TEXT,
-                        fullname TEXT NOT NULL,
-                        citizenship TEXT,
-                        country TEXT,
-                        nationality TEXT,
-                        region TEXT,
-                        district TEXT,
-                        gender TEXT,
-                        birth_date TEXT,
-                        passport TEXT,
-                        jshshir TEXT,
-                        passport_date TEXT,
-                        course TEXT,
-                        faculty TEXT,
-                        group_name TEXT,
-                        language TEXT,
-                        study_year TEXT,
-                        semester TEXT,
-                        graduate TEXT,
-                        specialty TEXT,
-                        education_type TEXT,
-                        education_form TEXT,
-                        payment_type TEXT,
-                        grant_type TEXT,
-                        previous_education TEXT,
-                        student_category TEXT,
-                        social_category TEXT,
-                        family_members TEXT,
-                        phone TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
+            await self.run_write(self._init_schema)
+            await self._ensure_unique_responses()
+            await self.refresh_staff()
+    
+    def _init_schema(self, cursor):
+        # Talabalar jadvali - Excel ustunlari bilan
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS students (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                unique_id TEXT UNIQUE NOT NULL,
+                talaba_id TEXT,
+                fullname TEXT NOT NULL,
+                citizenship TEXT,
+                country TEXT,
+                nationality TEXT,
+                region TEXT,
+                district TEXT,
+                gender TEXT,
+                birth_date TEXT,
+                passport TEXT,
+                jshshir TEXT,
+                passport_date TEXT,
+                course TEXT,
+                faculty TEXT,
+                group_name TEXT,
+                language TEXT,
+                study_year TEXT,
+                semester TEXT,
+                graduate TEXT,
+                specialty TEXT,
+                education_type TEXT,
+                education_form TEXT,
+                payment_type TEXT,
+                grant_type TEXT,
+                previous_education TEXT,
+                student_category TEXT,
+                social_category TEXT,
+                family_members TEXT,
+                phone TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # So'rovnoma javoblari jadvali
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS survey_responses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                unique_id TEXT NOT NULL,
+                fullname TEXT,
+                group_name TEXT,
+                
+                -- Asosiy ma'lumotlar
+                phone TEXT,
+                permanent_address TEXT,
+                permanent_location TEXT,
+                previous_education TEXT,
+                document_number TEXT,
+                
+                -- Yutuqlar
+                has_achievements TEXT,
+                achievements TEXT,
+                
+                -- Sertifikat
+                has_certificate TEXT,
+                certificate_type TEXT,
+                certificate_details TEXT,
+                certificate_file TEXT,
+                
+                -- Grant
+                has_grant TEXT,
+                grant_details TEXT,
+                
+                -- Ijtimoiy holat
+                social_protection TEXT,
+                iron_book TEXT,
+                youth_book TEXT,
                 
-                # So'rovnoma javoblari jadvali
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS survey_responses (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        unique_id TEXT NOT NULL,
-                        fullname TEXT,
-                        group_name TEXT,
-                        
-                        -- Asosiy ma'lumotlar
-                        phone TEXT,
-                        permanent_address TEXT,
-                        permanent_location TEXT,
-                        previous_education TEXT,
-                        document_number TEXT,
-                        
-                        -- Yutuqlar
-                        has_achievements TEXT,
-                        achievements TEXT,
-                        
-                        -- Sertifikat
-                        has_certificate TEXT,
-                        certificate_type TEXT,
-                        certificate_details TEXT,
-                        certificate_file TEXT,
-                        
-                        -- Grant
-                        has_grant TEXT,
-                        grant_details TEXT,
-                        
-                        -- Ijtimoiy holat
-                        social_protection TEXT,
-                        iron_book TEXT,
-                        youth_book TEXT,
-                        
-                        -- Ota ma'lumotlari
-                        father_name TEXT,
-                        father_alive TEXT,
-                        father_phone TEXT,
-                        
-                        -- Ona ma'lumotlari
-                        mother_name TEXT,
-                        mother_alive TEXT,
-                        mother_phone TEXT,
-                        parents_together TEXT,
-                        
-                        -- Yashash joyi
-                        living_type TEXT,
-                        ttj_location TEXT,
-                        rent_address TEXT,
-                        rent_location TEXT,
-                        rent_owner TEXT,
-                        
-                        -- Ish
-                        is_working TEXT,
-                        workplace TEXT,
-                        
-                        -- Oila holati
-                        is_married TEXT,
-                        
-                        -- Pasport va ijtimoiy tarmoqlar
-                        has_foreign_passport TEXT,
-                        has_social_channels TEXT,
-                        social_links TEXT,
-                        
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (unique_id) REFERENCES students(unique_id)
-                    )
-                """)
+                -- Ota ma'lumotlari
+                father_name TEXT,
+                father_alive TEXT,
+                father_phone TEXT,
                 
-                # Xodimlar jadvali
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS staff (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        telegram_id INTEGER UNIQUE NOT NULL,
-                        fullname TEXT,
-                        added_by INTEGER,
-                        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
+                -- Ona ma'lumotlari
+                mother_name TEXT,
+                mother_alive TEXT,
+                mother_phone TEXT,
+                parents_together TEXT,
                 
-                # Foydalanuvchilar holati
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS user_states (
-                        user_id INTEGER PRIMARY KEY,
-                        current_state TEXT,
-                        temp_data TEXT,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
+                -- Yashash joyi
+                living_type TEXT,
+                ttj_location TEXT,
+                rent_address TEXT,
+                rent_location TEXT,
+                rent_owner TEXT,
                 
-                # Indexlar
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_unique_id ON students(unique_id)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_passport ON students(passport)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_jshshir ON students(jshshir)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_talaba_id ON students(talaba_id)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_survey_unique_id ON survey_responses(unique_id)")
+                -- Ish
+                is_working TEXT,
+                workplace TEXT,
+                
+                -- Oila holati
+                is_married TEXT,
+                
+                -- Pasport va ijtimoiy tarmoqlar
+                has_foreign_passport TEXT,
+                has_social_channels TEXT,
+                social_links TEXT,
+                
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (unique_id) REFERENCES students(unique_id)
+            )
+        """)
+        
+        # Javoblar tarixi: qayta topshirilganda almashtirilgan eski javoblar
+        history_columns = ', '.join(
+            f"{field} {'INTEGER' if field == 'user_id' else 'TEXT'}" for field in RESPONSE_FIELDS
+        )
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS survey_response_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                response_id INTEGER NOT NULL,
+                {history_columns},
+                created_at TIMESTAMP,
+                replaced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_response_history_unique_id ON survey_response_history(unique_id)")
+        
+        # Ketma-ketliklar (unikal ID hisoblagichi)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sequences (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        # Hisoblagich ishga tushishda bir marta mavjud ID lar bilan tenglashtiriladi
+        cursor.execute("INSERT OR IGNORE INTO sequences (name, value) VALUES ('student_unique_id', 0)")
+        cursor.execute("""
+            UPDATE sequences SET value = MAX(value, (
+                SELECT COALESCE(MAX(CAST(unique_id AS INTEGER)), 0) FROM students
+            ))
+            WHERE name = 'student_unique_id'
+        """)
+        
+        # Export keshi generatsiyasi: mavjud export qatorlarini o'zgartiradigan
+        # har bir o'zgarishda oshadi (yangi javoblar qo'shilishi bundan mustasno)
+        cursor.execute("INSERT OR IGNORE INTO sequences (name, value) VALUES ('export_generation', 0)")
+        bump = "UPDATE sequences SET value = value + 1 WHERE name = 'export_generation';"
+        joined_changed = ' OR '.join(f"OLD.{field} IS NOT NEW.{field}" for field in RESPONSE_JOIN_FIELDS)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_export_gen_responses_update
+            AFTER UPDATE ON survey_responses
+            BEGIN {bump} END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_export_gen_responses_delete
+            AFTER DELETE ON survey_responses
+            BEGIN {bump} END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_export_gen_students_update
+            AFTER UPDATE ON students
+            WHEN OLD.unique_id IS NOT NEW.unique_id OR {joined_changed}
+            BEGIN {bump} END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_export_gen_students_insert
+            AFTER INSERT ON students
+            WHEN EXISTS (SELECT 1 FROM survey_responses WHERE unique_id = NEW.unique_id)
+            BEGIN {bump} END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_export_gen_students_delete
+            AFTER DELETE ON students
+            WHEN EXISTS (SELECT 1 FROM survey_responses WHERE unique_id = OLD.unique_id)
+            BEGIN {bump} END
+        """)
+        
+        # Xodimlar jadvali
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS staff (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                telegram_id INTEGER UNIQUE NOT NULL,
+                fullname TEXT,
+                added_by INTEGER,
+                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Foydalanuvchilar holati
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_states (
+                user_id INTEGER PRIMARY KEY,
+                current_state TEXT,
+                temp_data TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Import vazifalari (fon rejimida ketma-ket bajariladi)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS import_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER,
+                file_path TEXT NOT NULL,
+                file_name TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                rows_processed INTEGER DEFAULT 0,
+                added INTEGER DEFAULT 0,
+                updated INTEGER DEFAULT 0,
+                error_count INTEGER DEFAULT 0,
+                error_message TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        """)
+        
+        # E'lonlar (broadcast) va ularning yuborish navbati
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                total INTEGER DEFAULT 0,
+                sent INTEGER DEFAULT 0,
+                blocked INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_queue (
+                job_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                error TEXT,
+                PRIMARY KEY (job_id, user_id)
+            ) WITHOUT ROWID
+        """)
+        
+        # Indexlar
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_unique_id ON students(unique_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_passport ON students(passport)")
+        # find_student passportni katta harf bilan qidiradi - expression index
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_passport_upper ON students(UPPER(passport))")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_jshshir ON students(jshshir)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_talaba_id ON students(talaba_id)")
+        # To'ldirish hisoboti: GROUP BY tartibida covering index scan
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_students_completion
+            ON students(faculty, course, group_name, unique_id)
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_import_jobs_status ON import_jobs(status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs(status)")
+        
+        self._init_stats_counters(cursor)
+    
+    def _init_stats_counters(self, cursor):
+        """
+        Statistika hisoblagichlari: jami talabalar/javoblar/xodimlar va
+        fakultet, kurs, guruh kesimida talabalar va javoblar soni.
+        Triggerlar bilan yangilanadi, ishga tushishda qaytadan hisoblanadi.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, key)
+            ) WITHOUT ROWID
+        """)
+        
+        # Javob talabaning kesimlariga unique_id orqali bog'lanadi (export JOIN kabi)
+        def student_of(unique_id: str) -> str:
+            return f"FROM students s WHERE s.unique_id = {unique_id} LIMIT 1"
+        
+        def responses_of(unique_id: str) -> str:
+            return f"(SELECT COUNT(*) FROM survey_responses r WHERE r.unique_id = {unique_id})"
+        
+        def student_dims(row: str, sign: str) -> str:
+            return ''.join(
+                _bump_counter(f"students_{dim}", f"COALESCE({row}.{column}, '')", sign)
+                for dim, column in STATS_DIMENSIONS.items()
+            )
+        
+        def response_dims(row: str, sign: str, count: str) -> str:
+            return ''.join(
+                _bump_counter(f"responses_{dim}", f"COALESCE({row}.{column}, '')", f"{sign}{count}", f"WHERE {count} > 0")
+                for dim, column in STATS_DIMENSIONS.items()
+            )
+        
+        def response_dims_via_student(unique_id: str, sign: str) -> str:
+            return ''.join(
+                _bump_counter(f"responses_{dim}", f"COALESCE(s.{column}, '')", f"{sign}1", student_of(unique_id))
+                for dim, column in STATS_DIMENSIONS.items()
+            )
+        
+        dims_changed = ' OR '.join(
+            [f"OLD.{column} IS NOT NEW.{column}" for column in STATS_DIMENSIONS.values()]
+            + ["OLD.unique_id IS NOT NEW.unique_id"]
+        )
+        triggers = {
+            'trg_stats_students_insert': f"""
+                AFTER INSERT ON students BEGIN
+                    {_bump_counter('total', "'students'", '1')}
+                    {student_dims('NEW', '+1')}
+                    {response_dims('NEW', '+', responses_of('NEW.unique_id'))}
+                END""",
+            'trg_stats_students_delete': f"""
+                AFTER DELETE ON students BEGIN
+                    {_bump_counter('total', "'students'", '-1')}
+                    {student_dims('OLD', '-1')}
+                    {response_dims('OLD', '-', responses_of('OLD.unique_id'))}
+                END""",
+            'trg_stats_students_update': f"""
+                AFTER UPDATE ON students WHEN {dims_changed} BEGIN
+                    {student_dims('OLD', '-1')}
+                    {student_dims('NEW', '+1')}
+                    {response_dims('OLD', '-', responses_of('OLD.unique_id'))}
+                    {response_dims('NEW', '+', responses_of('NEW.unique_id'))}
+                END""",
+            'trg_stats_responses_insert': f"""
+                AFTER INSERT ON survey_responses BEGIN
+                    {_bump_counter('total', "'responses'", '1')}
+                    {response_dims_via_student('NEW.unique_id', '+')}
+                END""",
+            'trg_stats_responses_delete': f"""
+                AFTER DELETE ON survey_responses BEGIN
+                    {_bump_counter('total', "'responses'", '-1')}
+                    {response_dims_via_student('OLD.unique_id', '-')}
+                END""",
+            'trg_stats_responses_update': f"""
+                AFTER UPDATE OF unique_id ON survey_responses WHEN OLD.unique_id IS NOT NEW.unique_id BEGIN
+                    {response_dims_via_student('OLD.unique_id', '-')}
+                    {response_dims_via_student('NEW.unique_id', '+')}
+                END""",
+            'trg_stats_staff_insert': f"""
+                AFTER INSERT ON staff BEGIN
+                    {_bump_counter('total', "'staff'", '1')}
+                END""",
+            'trg_stats_staff_delete': f"""
+                AFTER DELETE ON staff BEGIN
+                    {_bump_counter('total', "'staff'", '-1')}
+                END""",
+        }
+        for name, body in triggers.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+        
+        # Statistika generatsiyasi: hisoblagichlardan farqli backfillda nolga
+        # tushmaydi - protsesslar kesh qilingan hisobotni shu bo'yicha tekshiradi
+        cursor.execute("INSERT OR IGNORE INTO sequences (name, value) VALUES ('stats_generation', 0)")
+        bump = "UPDATE sequences SET value = value + 1 WHERE name = 'stats_generation';"
+        generation_events = {
+            'trg_stats_gen_students_insert': "AFTER INSERT ON students",
+            'trg_stats_gen_students_delete': "AFTER DELETE ON students",
+            'trg_stats_gen_students_update': f"AFTER UPDATE ON students WHEN {dims_changed}",
+            'trg_stats_gen_responses_insert': "AFTER INSERT ON survey_responses",
+            'trg_stats_gen_responses_delete': "AFTER DELETE ON survey_responses",
+            'trg_stats_gen_responses_update': (
+                "AFTER UPDATE OF unique_id ON survey_responses WHEN OLD.unique_id IS NOT NEW.unique_id"
+            ),
+        }
+        for name, event in generation_events.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {bump} END")
+        
+        # Qayta hisoblash (backfill): triggerlardan oldingi yoki tashqi
+        # o'zgarishlar bo'lsa ham hisoblagichlar jadvallar bilan mos bo'ladi
+        cursor.execute("DELETE FROM stats_counters")
+        cursor.execute("""
+            INSERT INTO stats_counters (scope, key, value)
+            SELECT 'total', 'students', COUNT(*) FROM students
+            UNION ALL SELECT 'total', 'responses', COUNT(*) FROM survey_responses
+            UNION ALL SELECT 'total', 'staff', COUNT(*) FROM staff
+        """)
+        for dim, column in STATS_DIMENSIONS.items():
+            cursor.execute(f"""
+                INSERT INTO stats_counters (scope, key, value)
+                SELECT 'students_{dim}', COALESCE({column}, ''), COUNT(*)
+                FROM students GROUP BY COALESCE({column}, '')
+            """)
+            cursor.execute(f"""
+                INSERT INTO stats_counters (scope, key, value)
+                SELECT 'responses_{dim}', COALESCE(s.{column}, ''), COUNT(*)
+                FROM survey_responses r
+                JOIN students s ON s.unique_id = r.unique_id
+                GROUP BY COALESCE(s.{column}, '')
+            """)
     
     async def find_student(self, search_value: str) -> Optional[Dict[str, Any]]:
         """Talabani qidirish (unique_id, passport, talaba_id, jshshir)"""
+        return await self.run_read(self._find_student, search_value)
+    
+    def _find_student(self, cursor, search_value: str) -> Optional[Dict[str, Any]]:
+        for sql, params in self.student_lookup_queries(search_value):
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+            if row:
+                return dict(row)
+        return None
+    
+    @staticmethod
+    def student_lookup_queries(search_value: str) -> List[tuple]:
+        """
+        find_student bajaradigan so'rovlar (tartib bilan).
+        Har biri bitta index bo'yicha qidiradi - EXPLAIN bilan tekshirish mumkin.
+        """
         search_value = search_value.strip().upper()
         
-        async with self.get_cursor() as cursor:
-            # JSHSHIR (14 raqam)
-            if search_value.isdigit() and len(search_value) == 14:
-                cursor.execute("SELECT * FROM students WHERE jshshir = ?", (search_value,))
-            # Talaba ID (12 raqam)
-            elif search_value.isdigit() and len(search_value) == 12:
-                cursor.execute("SELECT * FROM students WHERE talaba_id = ?", (search_value,))
-            # Boshqa raqamlar (unique_id yoki talaba_id)
-            elif search_value.isdigit():
-                cursor.execute("SELECT * FROM students WHERE unique_id = ? OR talaba_id = ?", (search_value, search_value))
-            # Passport (AA1234567)
-            else:
-                cursor.execute("SELECT * FROM students WHERE UPPER(passport) = ?", (search_value,))
-            
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        # JSHSHIR (14 raqam)
+        if search_value.isdigit() and len(search_value) == 14:
+            return [("SELECT * FROM students WHERE jshshir = ?", (search_value,))]
+        # Talaba ID (12 raqam)
+        if search_value.isdigit() and len(search_value) == 12:
+            return [("SELECT * FROM students WHERE talaba_id = ?", (search_value,))]
+        # Boshqa raqamlar (avval unique_id, keyin talaba_id)
+        if search_value.isdigit():
+            return [
+                ("SELECT * FROM students WHERE unique_id = ?", (search_value,)),
+                ("SELECT * FROM students WHERE talaba_id = ?", (search_value,)),
+            ]
+        # Passport (AA1234567) - idx_students_passport_upper
+        return [("SELECT * FROM students WHERE UPPER(passport) = ?", (search_value,))]
     
     async def save_survey_response(self, data: Dict[str, Any]) -> bool:
         """So'rovnoma javobini saqlash"""
         try:
-            async with self.get_cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO survey_responses (
-                        user_id, unique_id, fullname, group_name,
-                        phone, permanent_address, permanent_location, previous_education, document_number,
-                        has_achievements, achievements,
-                        has_certificate, certificate_type, certificate_details, certificate_file,
-                        has_grant, grant_details,
-                        social_protection, iron_book, youth_book,
-                        father_name, father_alive, father_phone,
-                        mother_name, mother_alive, mother_phone, parents_together,
-                        living_type, ttj_location, rent_address, rent_location, rent_owner,
-                        is_working, workplace, is_married,
-                        has_foreign_passport, has_social_channels, social_links
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    data.get('user_id'),
-                    data.get('unique_id'),
-                    data.get('fullname'),
-                    data.get('group_name') or data.get('group_number'),
-                    data.get('phone'),
-                    data.get('permanent_address'),
-                    data.get('permanent_location'),
-                    data.get('previous_education'),
-                    data.get('document_number'),
-                    data.get('has_achievements'),
-                    data.get('achievements'),
-                    data.get('has_certificate'),
-                    data.get('certificate_type'),
-                    data.get('certificate_details'),
-                    data.get('certificate_file'),
-                    data.get('has_grant'),
-                    data.get('grant_details'),
-                    data.get('social_protection'),
-                    data.get('iron_book'),
-                    data.get('youth_book'),
-                    data.get('father_name'),
-                    data.get('father_alive'),
-                    data.get('father_phone'),
-                    data.get('mother_name'),
-                    data.get('mother_alive'),
-                    data.get('mother_phone'),
-                    data.get('parents_together'),
-                    data.get('living_type'),
-                    data.get('ttj_location'),
-                    data.get('rent_address'),
-                    data.get('rent_location'),
-                    data.get('rent_owner'),
-                    data.get('is_working'),
-                    data.get('workplace'),
-                    data.get('is_married'),
-                    data.get('has_foreign_passport'),
-                    data.get('has_social_channels'),
-                    data.get('social_links')
-                ))
-                return True
+            return await self.run_write(self._save_survey_response, data)
         except Exception as e:
             print(f"Error saving survey: {e}")
             return False
     
+    def _save_survey_response(self, cursor, data: Dict[str, Any]) -> bool:
+        # Har bir talabaga bitta javob: qayta topshirilsa javob yangilanadi
+        values = {field: data.get(field) for field in RESPONSE_FIELDS}
+        values['group_name'] = data.get('group_name') or data.get('group_number')
+        if self.keep_response_history:
+            self._archive_responses(cursor, "unique_id = ?", (values['unique_id'],))
+        
+        columns = ', '.join(RESPONSE_FIELDS)
+        placeholders = ', '.join('?' * len(RESPONSE_FIELDS))
+        updates = ', '.join(f"{field} = excluded.{field}" for field in RESPONSE_FIELDS if field != 'unique_id')
+        cursor.execute(f"""
+            INSERT INTO survey_responses ({columns}) VALUES ({placeholders})
+            ON CONFLICT(unique_id) DO UPDATE SET {updates}, created_at = CURRENT_TIMESTAMP
+        """, tuple(values.values()))
+        return True
+    
+    def _archive_responses(self, cursor, where: str, params: tuple):
+        """survey_responses qatorlarini survey_response_history ga nusxalash"""
+        columns = ', '.join(RESPONSE_FIELDS)
+        cursor.execute(f"""
+            INSERT INTO survey_response_history (response_id, {columns}, created_at)
+            SELECT id, {columns}, created_at FROM survey_responses WHERE {where}
+        """, params)
+    
+    async def _ensure_unique_responses(self):
+        """
+        Bir martalik migratsiya: har bir unique_id uchun faqat oxirgi javob
+        qoldiriladi (eskilari tarixga ko'chiriladi), so'ng unikal indeks yaratiladi.
+        Tozalash alohida kichik tranzaksiyalarda - writer uzoq band bo'lmaydi.
+        """
+        if await self.run_read(self._has_unique_responses_index):
+            return
+        removed = 0
+        after_id = 0
+        while True:
+            count, after_id = await self.run_write(self._dedupe_responses_batch, after_id, self.DEDUP_BATCH_SIZE)
+            if not count:
+                break
+            removed += count
+        removed += await self.run_write(self._create_unique_responses_index)
+        if removed:
+            print(f"Survey responses deduplicated: {removed} duplicates moved to history")
+    
+    def _has_unique_responses_index(self, cursor) -> bool:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_survey_unique_id'")
+        return cursor.fetchone() is not None
+    
+    def _dedupe_responses_batch(self, cursor, after_id: int, limit: int) -> tuple:
+        """id > after_id dan boshlab `limit` ta eskirgan javobni tarixga ko'chirish: (soni, oxirgi id)"""
+        cursor.execute("""
+            SELECT r.id FROM survey_responses r
+            WHERE r.id > ? AND EXISTS (
+                SELECT 1 FROM survey_responses n WHERE n.unique_id = r.unique_id AND n.id > r.id
+            )
+            ORDER BY r.id
+            LIMIT ?
+        """, (after_id, limit))
+        ids = [row['id'] for row in cursor.fetchall()]
+        if not ids:
+            return 0, after_id
+        where = f"id IN ({', '.join('?' * len(ids))})"
+        self._archive_responses(cursor, where, ids)
+        cursor.execute(f"DELETE FROM survey_responses WHERE {where}", ids)
+        return len(ids), ids[-1]
+    
+    def _create_unique_responses_index(self, cursor) -> int:
+        # Oxirgi paketlardan keyin qo'shilgan takrorlar ham shu tranzaksiyada tozalanadi
+        removed = 0
+        after_id = 0
+        while True:
+            count, after_id = self._dedupe_responses_batch(cursor, after_id, self.DEDUP_BATCH_SIZE)
+            if not count:
+                break
+            removed += count
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_survey_unique_id ON survey_responses(unique_id)")
+        cursor.execute("DROP INDEX IF EXISTS idx_survey_unique_id")
+        return removed
+    
     async def get_all_students(self) -> List[Dict]:
         """Barcha talabalarni olish"""
-        async with self.get_cursor() as cursor:
-            cursor.execute("SELECT * FROM students ORDER BY id")
-            return [dict(row) for row in cursor.fetchall()]
+        return await self.run_read(self._get_all_students)
+    
+    def _get_all_students(self, cursor) -> List[Dict]:
+        return [dict(row) for row in self.iter_students(cursor)]
+    
+    def iter_students(self, cursor, batch_size: int = 1000):
+        """Talabalarni cursor orqali bo'laklab o'qish (generator, executor ichida)"""
+        cursor.execute("SELECT * FROM students ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
     
     async def get_all_responses(self) -> List[Dict]:
         """Barcha so'rovnoma javoblarini olish"""
-        async with self.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT sr.*, 
-                       s.talaba_id, s.citizenship, s.country, s.nationality,
-                       s.region, s.district, s.gender, s.birth_date, s.passport,
-                       s.jshshir, s.passport_date, s.course, s.faculty,
-                       s.language, s.study_year, s.semester, s.graduate,
-                       s.specialty, s.education_type, s.education_form,
-                       s.payment_type, s.grant_type, s.student_category,
-                       s.social_category, s.family_members
-                FROM survey_responses sr
-                LEFT JOIN students s ON sr.unique_id = s.unique_id
-                ORDER BY sr.created_at DESC
-            """)
-            return [dict(row) for row in cursor.fetchall()]
+        return await self.run_read(self._get_all_responses)
+    
+    def _get_all_responses(self, cursor) -> List[Dict]:
+        return [dict(row) for row in self.iter_responses(cursor)]
+    
+    def iter_responses(self, cursor, batch_size: int = 1000, after_id: Optional[int] = None):
+        """
+        So'rovnoma javoblarini cursor orqali bo'laklab o'qish (generator, executor ichida).
+        after_id berilsa - faqat undan keyingi javoblar, ID tartibida (export keshiga qo'shish uchun).
+        """
+        joined = ', '.join(f"s.{field}" for field in RESPONSE_JOIN_FIELDS)
+        if after_id is None:
+            where, order, params = "", "sr.created_at DESC, sr.id DESC", ()
+        else:
+            where, order, params = "WHERE sr.id > ?", "sr.id", (after_id,)
+        cursor.execute(f"""
+            SELECT sr.*, {joined}
+            FROM survey_responses sr
+            LEFT JOIN students s ON sr.unique_id = s.unique_id
+            {where}
+            ORDER BY {order}
+        """, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    
+    def get_export_fingerprint(self, cursor) -> Dict[str, int]:
+        """
+        Export keshi uchun belgi: generation (JOIN natijasini o'zgartiruvchi
+        har bir o'zgarishda triggerlar oshiradi) va oxirgi javob ID si.
+        """
+        cursor.execute("""
+            SELECT (SELECT value FROM sequences WHERE name = 'export_generation') AS generation,
+                   (SELECT COALESCE(MAX(id), 0) FROM survey_responses) AS high_water
+        """)
+        return dict(cursor.fetchone())
     
     async def get_statistics(self) -> Dict[str, int]:
         """Statistika"""
-        async with self.get_cursor() as cursor:
-            cursor.execute("SELECT COUNT(*) as count FROM students")
-            total_students = cursor.fetchone()['count']
-            
-            cursor.execute("SELECT COUNT(*) as count FROM survey_responses")
-            completed_surveys = cursor.fetchone()['count']
-            
-            cursor.execute("SELECT COUNT(*) as count FROM staff")
-            total_staff = cursor.fetchone()['count']
-            
-            return {
-                'total_students': total_students,
-                'completed_surveys': completed_surveys,
-                'total_staff': total_staff
-            }
+        return await self.run_read(self._get_statistics)
+    
+    def _get_statistics(self, cursor) -> Dict[str, int]:
+        # stats_counters dan o'qiladi - jadval hajmiga bog'liq emas
+        cursor.execute("SELECT key, value FROM stats_counters WHERE scope = 'total'")
+        totals = {row['key']: row['value'] for row in cursor.fetchall()}
+        
+        return {
+            'total_students': totals.get('students', 0),
+            'completed_surveys': totals.get('responses', 0),
+            'total_staff': totals.get('staff', 0)
+        }
+    
+    async def get_statistics_breakdown(self, dimension: str) -> List[Dict[str, Any]]:
+        """
+        Kesim bo'yicha statistika (dimension: faculty, course, group):
+        [{'key', 'students', 'responses'}, ...] - talabalar soni bo'yicha kamayish tartibida
+        """
+        return await self.run_read(self._get_statistics_breakdown, dimension)
+    
+    def _get_statistics_breakdown(self, cursor, dimension: str) -> List[Dict[str, Any]]:
+        if dimension not in STATS_DIMENSIONS:
+            raise ValueError(f"Unknown statistics dimension: {dimension}")
+        cursor.execute("""
+            SELECT st.key AS key, st.value AS students, COALESCE(rs.value, 0) AS responses
+            FROM stats_counters st
+            LEFT JOIN stats_counters rs ON rs.scope = ? AND rs.key = st.key
+            WHERE st.scope = ? AND st.value > 0
+            ORDER BY st.value DESC, st.key
+        """, (f"responses_{dimension}", f"students_{dimension}"))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    async def get_completion_report(self) -> List[Dict[str, Any]]:
+        """
+        Fakultet / kurs / guruh kesimida so'rovnoma to'ldirilishi:
+        [{'faculty', 'course', 'group_name', 'students', 'completed'}, ...].
+        Natija stats_generation bilan keshlanadi: triggerlar talabalar yoki javoblar
+        o'zgarganda uni oshiradi, shuning uchun boshqa protsessdagi o'zgarish ham
+        keyingi so'rovdayoq ko'rinadi.
+        """
+        self._completion_cache = await self.run_read(self._get_completion_report, self._completion_cache)
+        return self._completion_cache[1]
+    
+    def _get_completion_report(self, cursor, cached: Optional[tuple] = None) -> tuple:
+        # Generatsiya va natija bitta snapshotdan
+        cursor.execute("BEGIN")
+        cursor.execute("SELECT value FROM sequences WHERE name = 'stats_generation'")
+        generation = cursor.fetchone()['value']
+        if cached is not None and cached[0] == generation:
+            return cached
+        
+        # Bitta agregat JOIN: students idx_students_completion bo'yicha tartibda
+        # o'qiladi, javoblar uq_survey_unique_id orqali topiladi (talabaga bitta javob)
+        cursor.execute("""
+            SELECT s.faculty AS faculty, s.course AS course, s.group_name AS group_name,
+                   COUNT(*) AS students,
+                   COUNT(r.unique_id) AS completed
+            FROM students s
+            LEFT JOIN survey_responses r ON r.unique_id = s.unique_id
+            GROUP BY s.faculty, s.course, s.group_name
+        """)
+        return generation, [dict(row) for row in cursor.fetchall()]
     
     async def clear_all_surveys(self) -> int:
         """Barcha so'rovnoma javoblarini o'chirish"""
         try:
-            async with self.get_cursor() as cursor:
-                cursor.execute("SELECT COUNT(*) as count FROM survey_responses")
-                count = cursor.fetchone()['count']
-                cursor.execute("DELETE FROM survey_responses")
-                return count
+            return await self.run_write(self._clear_all_surveys)
         except Exception as e:
             print(f"Error clearing surveys: {e}")
             return 0
     
+    def _clear_all_surveys(self, cursor) -> int:
+        cursor.execute("SELECT COUNT(*) as count FROM survey_responses")
+        count = cursor.fetchone()['count']
+        cursor.execute("DELETE FROM survey_responses")
+        cursor.execute("DELETE FROM survey_response_history")
+        return count
+    
     async def add_student(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Talaba qo'shish yoki yangilash"""
         try:
-            async with self.get_cursor() as cursor:
-                passport = data.get('passport', '')
-                jshshir = data.get('jshshir', '')
-                talaba_id = data.get('talaba_id', '')
-                
-                existing = None
-                
-                # Passport bo'yicha qidirish
-                if passport:
-                    cursor.execute("SELECT * FROM students WHERE passport = ?", (passport,))
-                    existing = cursor.fetchone()
-                
-                # JSHSHIR bo'yicha qidirish
-                if not existing and jshshir:
-                    cursor.execute("SELECT * FROM students WHERE jshshir = ?", (jshshir,))
-                    existing = cursor.fetchone()
-                
-                # Talaba ID bo'yicha qidirish
-                if not existing and talaba_id:
-                    cursor.execute("SELECT * FROM students WHERE talaba_id = ?", (talaba_id,))
-                    existing = cursor.fetchone()
-                
-                if existing:
-                    # Yangilash
-                    cursor.execute("""
-                        UPDATE students SET
-                            talaba_id = COALESCE(?, talaba_id),
-                            fullname = COALESCE(?, fullname),
-                            citizenship = COALESCE(?, citizenship),
-                            country = COALESCE(?, country),
-                            nationality = COALESCE(?, nationality),
-                            region = COALESCE(?, region),
-                            district = COALESCE(?, district),
-                            gender = COALESCE(?, gender),
-                            birth_date = COALESCE(?, birth_date),
-                            passport = COALESCE(?, passport),
-                            jshshir = COALESCE(?, jshshir),
-                            passport_date = COALESCE(?, passport_date),
-                            course = COALESCE(?, course),
-                            faculty = COALESCE(?, faculty),
-                            group_name = COALESCE(?, group_name),
-                            language = COALESCE(?, language),
-                            study_year = COALESCE(?, study_year),
-                            semester = COALESCE(?, semester),
-                            graduate = COALESCE(?, graduate),
-                            specialty = COALESCE(?, specialty),
-                            education_type = COALESCE(?, education_type),
-                            education_form = COALESCE(?, education_form),
-                            payment_type = COALESCE(?, payment_type),
-                            grant_type = COALESCE(?, grant_type),
-                            previous_education = COALESCE(?, previous_education),
-                            student_category = COALESCE(?, student_category),
-                            social_category = COALESCE(?, social_category),
-                            family_members = COALESCE(?, family_members),
-                            phone = COALESCE(?, phone),
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    """, (
-                        data.get('talaba_id'),
-                        data.get('fullname'),
-                        data.get('citizenship'),
-                        data.get('country'),
-                        data.get('nationality'),
-                        data.get('region'),
-                        data.get('district'),
-                        data.get('gender'),
-                        data.get('birth_date'),
-                        data.get('passport'),
-                        data.get('jshshir'),
-                        data.get('passport_date'),
-                        data.get('course'),
-                        data.get('faculty'),
-                        data.get('group_name'),
-                        data.get('language'),
-                        data.get('study_year'),
-                        data.get('semester'),
-                        data.get('graduate'),
-                        data.get('specialty'),
-                        data.get('education_type'),
-                        data.get('education_form'),
-                        data.get('payment_type'),
-                        data.get('grant_type'),
-                        data.get('previous_education'),
-                        data.get('student_category'),
-                        data.get('social_category'),
-                        data.get('family_members'),
-                        data.get('phone'),
-                        existing['id']
-                    ))
-                    return {'action': 'updated', 'unique_id': existing['unique_id']}
-                else:
-                    # Yangi unikal ID
-                    unique_id = await self.get_next_unique_id()
-                    
-                    cursor.execute("""
-                        INSERT INTO students (
-                            unique_id, talaba_id, fullname, citizenship, country, nationality,
-                            region, district, gender, birth_date, passport, jshshir, passport_date,
-                            course, faculty, group_name, language, study_year, semester, graduate,
-                            specialty, education_type, education_form, payment_type, grant_type,
-                            previous_education, student_category, social_category, family_members, phone
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        unique_id,
-                        data.get('talaba_id'),
-                        data.get('fullname'),
-                        data.get('citizenship'),
-                        data.get('country'),
-                        data.get('nationality'),
-                        data.get('region'),
-                        data.get('district'),
-                        data.get('gender'),
-                        data.get('birth_date'),
-                        data.get('passport'),
-                        data.get('jshshir'),
-                        data.get('passport_date'),
-                        data.get('course'),
-                        data.get('faculty'),
-                        data.get('group_name'),
-                        data.get('language'),
-                        data.get('study_year'),
-                        data.get('semester'),
-                        data.get('graduate'),
-                        data.get('specialty'),
-                        data.get('education_type'),
-                        data.get('education_form'),
-                        data.get('payment_type'),
-                        data.get('grant_type'),
-                        data.get('previous_education'),
-                        data.get('student_category'),
-                        data.get('social_category'),
-                        data.get('family_members'),
-                        data.get('phone')
-                    ))
-                    return {'action': 'added', 'unique_id': unique_id}
+            return await self.run_write(self._add_student, data)
         except Exception as e:
             print(f"Error adding student: {e}")
             return {'action': 'error', 'error': str(e)}
     
-    async def is_staff(self, telegram_id: int) -> bool:
-        """Xodim tekshirish"""
-        async with self.get_cursor() as cursor:
-            cursor.execute("SELECT 1 FROM staff WHERE telegram_id = ?", (telegram_id,))
-            return cursor.fetchone() is not None
+    def _add_student(self, cursor, data: Dict[str, Any]) -> Dict[str, Any]:
+        passport = data.get('passport', '')
+        jshshir = data.get('jshshir', '')
+        talaba_id = data.get('talaba_id', '')
+        
+        existing = None
+        
+        # Passport bo'yicha qidirish
+        if passport:
+            cursor.execute("SELECT * FROM students WHERE passport = ?", (passport,))
+            existing = cursor.fetchone()
+        
+        # JSHSHIR bo'yicha qidirish
+        if not existing and jshshir:
+            cursor.execute("SELECT * FROM students WHERE jshshir = ?", (jshshir,))
+            existing = cursor.fetchone()
+        
+        # Talaba ID bo'yicha qidirish
+        if not existing and talaba_id:
+            cursor.execute("SELECT * FROM students WHERE talaba_id = ?", (talaba_id,))
+            existing = cursor.fetchone()
+        
+        if existing:
+            # Yangilash
+            cursor.execute("""
+                UPDATE students SET
+                    talaba_id = COALESCE(?, talaba_id),
+                    fullname = COALESCE(?, fullname),
+                    citizenship = COALESCE(?, citizenship),
+                    country = COALESCE(?, country),
+                    nationality = COALESCE(?, nationality),
+                    region = COALESCE(?, region),
+                    district = COALESCE(?, district),
+                    gender = COALESCE(?, gender),
+                    birth_date = COALESCE(?, birth_date),
+                    passport = COALESCE(?, passport),
+                    jshshir = COALESCE(?, jshshir),
+                    passport_date = COALESCE(?, passport_date),
+                    course = COALESCE(?, course),
+                    faculty = COALESCE(?, faculty),
+                    group_name = COALESCE(?, group_name),
+                    language = COALESCE(?, language),
+                    study_year = COALESCE(?, study_year),
+                    semester = COALESCE(?, semester),
+                    graduate = COALESCE(?, graduate),
+                    specialty = COALESCE(?, specialty),
+                    education_type = COALESCE(?, education_type),
+                    education_form = COALESCE(?, education_form),
+                    payment_type = COALESCE(?, payment_type),
+                    grant_type = COALESCE(?, grant_type),
+                    previous_education = COALESCE(?, previous_education),
+                    student_category = COALESCE(?, student_category),
+                    social_category = COALESCE(?, social_category),
+                    family_members = COALESCE(?, family_members),
+                    phone = COALESCE(?, phone),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (
+                data.get('talaba_id'),
+                data.get('fullname'),
+                data.get('citizenship'),
+                data.get('country'),
+                data.get('nationality'),
+                data.get('region'),
+                data.get('district'),
+                data.get('gender'),
+                data.get('birth_date'),
+                data.get('passport'),
+                data.get('jshshir'),
+                data.get('passport_date'),
+                data.get('course'),
+                data.get('faculty'),
+                data.get('group_name'),
+                data.get('language'),
+                data.get('study_year'),
+                data.get('semester'),
+                data.get('graduate'),
+                data.get('specialty'),
+                data.get('education_type'),
+                data.get('education_form'),
+                data.get('payment_type'),
+                data.get('grant_type'),
+                data.get('previous_education'),
+                data.get('student_category'),
+                data.get('social_category'),
+                data.get('family_members'),
+                data.get('phone'),
+                existing['id']
+            ))
+            return {'action': 'updated', 'unique_id': existing['unique_id']}
+        else:
+            # Yangi unikal ID
+            unique_id = str(self._allocate_unique_ids(cursor, 1))
+            
+            cursor.execute("""
+                INSERT INTO students (
+                    unique_id, talaba_id, fullname, citizenship, country, nationality,
+                    region, district, gender, birth_date, passport, jshshir, passport_date,
+                    course, faculty, group_name, language, study_year, semester, graduate,
+                    specialty, education_type, education_form, payment_type, grant_type,
+                    previous_education, student_category, social_category, family_members, phone
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                unique_id,
+                data.get('talaba_id'),
+                data.get('fullname'),
+                data.get('citizenship'),
+                data.get('country'),
+                data.get('nationality'),
+                data.get('region'),
+                data.get('district'),
+                data.get('gender'),
+                data.get('birth_date'),
+                data.get('passport'),
+                data.get('jshshir'),
+                data.get('passport_date'),
+                data.get('course'),
+                data.get('faculty'),
+                data.get('group_name'),
+                data.get('language'),
+                data.get('study_year'),
+                data.get('semester'),
+                data.get('graduate'),
+                data.get('specialty'),
+                data.get('education_type'),
+                data.get('education_form'),
+                data.get('payment_type'),
+                data.get('grant_type'),
+                data.get('previous_education'),
+                data.get('student_category'),
+                data.get('social_category'),
+                data.get('family_members'),
+                data.get('phone')
+            ))
+            return {'action': 'added', 'unique_id': unique_id}
+    
+    async def bulk_upsert_students(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Talabalarni bitta tranzaksiyada ommaviy qo'shish/yangilash.
+        Har bir yozuvda 'row' (Excel qator raqami) bo'lishi mumkin -
+        xatolar shu raqam bilan qaytariladi.
+        """
+        return await self.run_write(self._bulk_upsert_students, records)
+    
+    def _bulk_upsert_students(self, cursor, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        result = {'added': 0, 'updated': 0, 'errors': []}
+        
+        # Validatsiya qatorma-qator
+        valid = []
+        for idx, rec in enumerate(records, 1):
+            row_no = rec.get('row', idx)
+            if not rec.get('fullname'):
+                result['errors'].append((row_no, "F.I.O bo'sh"))
+                continue
+            valid.append((row_no, rec))
+        
+        if not valid:
+            return result
+        
+        # Set-based merge xato bersa (constraint, noto'g'ri tur) bo'lak bekor qilinadi
+        # va qatorlar bittadan yoziladi: xato qatorlar raqami bilan qaytadi, qolganlari saqlanadi
+        cursor.execute("SAVEPOINT bulk_merge")
+        try:
+            added, updated = self._merge_staged_students(cursor, valid)
+        except sqlite3.Error as e:
+            cursor.execute("ROLLBACK TO bulk_merge")
+            cursor.execute("RELEASE bulk_merge")
+            print(f"Bulk student merge failed, falling back to per-row upsert: {e}")
+            self._upsert_students_per_row(cursor, valid, result)
+            result['errors'].sort(key=lambda error: error[0])
+        else:
+            cursor.execute("RELEASE bulk_merge")
+            result['added'] += added
+            result['updated'] += updated
+        return result
+    
+    def _upsert_students_per_row(self, cursor, rows: List[tuple], result: Dict[str, Any]):
+        """Har bir qator alohida SAVEPOINT ostida: xato faqat shu qatorni bekor qiladi"""
+        for row_no, rec in rows:
+            cursor.execute("SAVEPOINT student_row")
+            try:
+                outcome = self._add_student(cursor, rec)
+            except sqlite3.Error as e:
+                cursor.execute("ROLLBACK TO student_row")
+                result['errors'].append((row_no, str(e)))
+            else:
+                result[outcome['action']] += 1
+            finally:
+                cursor.execute("RELEASE student_row")
+    
+    def _merge_staged_students(self, cursor, rows: List[tuple]) -> tuple:
+        """Staging jadval orqali set-based merge, (qo'shildi, yangilandi) qaytaradi"""
+        added = updated = 0
+        columns = ', '.join(STUDENT_FIELDS)
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS students_staging (
+                row_no INTEGER PRIMARY KEY,
+                match_id INTEGER,
+                new_unique_id TEXT,
+                action TEXT,
+                round INTEGER,
+                {columns}
+            )
+        """)
+        cursor.execute("DELETE FROM temp.students_staging")
+        
+        # 1. Staging jadvalga yuklash
+        staged = [(row_no, *[rec.get(field) for field in STUDENT_FIELDS]) for row_no, rec in rows]
+        placeholders = ', '.join('?' * (len(STUDENT_FIELDS) + 1))
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO temp.students_staging (row_no, {columns}) VALUES ({placeholders})",
+            staged
+        )
+        
+        # 2. Mavjud talabalar bilan moslashtirish: passport -> JSHSHIR -> talaba ID
+        self._match_staged_students(cursor)
+        cursor.execute("UPDATE temp.students_staging SET action = 'update' WHERE match_id IS NOT NULL")
+        
+        # 3. Yangi talabalar: har bir kalit bo'yicha fayldagi birinchi qator qo'shiladi,
+        #    keyingi takrorlar esa shu talabani yangilaydi (ketma-ket importdagi kabi)
+        while True:
+            cursor.execute("""
+                WITH pending AS (
+                    SELECT row_no,
+                           CASE WHEN passport IS NULL OR passport = '' THEN row_no
+                                ELSE MIN(row_no) OVER (PARTITION BY passport) END AS p_first,
+                           CASE WHEN jshshir IS NULL OR jshshir = '' THEN row_no
+                                ELSE MIN(row_no) OVER (PARTITION BY jshshir) END AS j_first,
+                           CASE WHEN talaba_id IS NULL OR talaba_id = '' THEN row_no
+                                ELSE MIN(row_no) OVER (PARTITION BY talaba_id) END AS t_first
+                    FROM temp.students_staging
+                    WHERE match_id IS NULL
+                )
+                SELECT row_no FROM pending
+                WHERE p_first = row_no AND j_first = row_no AND t_first = row_no
+                ORDER BY row_no
+            """)
+            leaders = [row['row_no'] for row in cursor.fetchall()]
+            if not leaders:
+                break
+            
+            next_id = self._allocate_unique_ids(cursor, len(leaders))
+            cursor.executemany(
+                "UPDATE temp.students_staging SET new_unique_id = ?, action = 'insert' WHERE row_no = ?",
+                [(str(next_id + i), row_no) for i, row_no in enumerate(leaders)]
+            )
+            cursor.execute(f"""
+                INSERT INTO students (unique_id, {columns})
+                SELECT new_unique_id, {columns}
+                FROM temp.students_staging
+                WHERE action = 'insert' AND match_id IS NULL
+                ORDER BY row_no
+            """)
+            added += cursor.rowcount
+            cursor.execute("""
+                UPDATE temp.students_staging
+                SET match_id = (SELECT s.id FROM students s WHERE s.unique_id = students_staging.new_unique_id)
+                WHERE action = 'insert' AND match_id IS NULL
+            """)
+            
+            # Qolgan takrorlar yangi qo'shilgan talabalarga bog'lanadi
+            self._match_staged_students(cursor)
+            cursor.execute("""
+                UPDATE temp.students_staging SET action = 'update'
+                WHERE match_id IS NOT NULL AND action IS NULL
+            """)
+        
+        # 4. Yangilash: bitta talabaga bir nechta qator tushsa, fayl tartibida qo'llanadi
+        assignments = ',\n'.join(
+            f"{field} = COALESCE(b.{field}, students.{field})" for field in STUDENT_FIELDS
+        )
+        round_no = 0
+        while True:
+            round_no += 1
+            cursor.execute("""
+                UPDATE temp.students_staging SET round = ?
+                WHERE row_no IN (
+                    SELECT MIN(row_no) FROM temp.students_staging
+                    WHERE action = 'update' AND round IS NULL
+                    GROUP BY match_id
+                )
+            """, (round_no,))
+            if cursor.rowcount == 0:
+                break
+            updated += cursor.rowcount
+            cursor.execute(f"""
+                UPDATE students SET
+                    {assignments},
+                    updated_at = CURRENT_TIMESTAMP
+                FROM temp.students_staging AS b
+                WHERE b.round = ? AND students.id = b.match_id
+            """, (round_no,))
+        
+        cursor.execute("DELETE FROM temp.students_staging")
+        return added, updated
+    
+    def _match_staged_students(self, cursor):
+        """Staging qatorlarini mavjud talabalarga bog'lash"""
+        for field in ('passport', 'jshshir', 'talaba_id'):
+            cursor.execute(f"""
+                UPDATE temp.students_staging
+                SET match_id = (
+                    SELECT s.id FROM students s
+                    WHERE s.{field} = students_staging.{field}
+                    LIMIT 1
+                )
+                WHERE match_id IS NULL AND {field} IS NOT NULL AND {field} != ''
+            """)
+    
+    async def load_user_state(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Foydalanuvchining saqlangan FSM holati"""
+        return await self.run_read(self._load_user_state, user_id)
+    
+    def _load_user_state(self, cursor, user_id: int) -> Optional[Dict[str, Any]]:
+        cursor.execute(
+            "SELECT current_state, temp_data FROM user_states WHERE user_id = ?",
+            (user_id,)
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    
+    async def save_user_states(self, rows: List[tuple], deleted: List[int]) -> None:
+        """FSM holatlarini ommaviy yozish: rows = [(user_id, state, data_json), ...]"""
+        await self.run_write(self._save_user_states, rows, deleted)
+    
+    def _save_user_states(self, cursor, rows: List[tuple], deleted: List[int]) -> None:
+        if rows:
+            cursor.executemany("""
+                INSERT INTO user_states (user_id, current_state, temp_data, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    current_state = excluded.current_state,
+                    temp_data = excluded.temp_data,
+                    updated_at = CURRENT_TIMESTAMP
+            """, rows)
+        if deleted:
+            cursor.executemany(
+                "DELETE FROM user_states WHERE user_id = ?",
+                [(user_id,) for user_id in deleted]
+            )
+    
+    async def create_import_job(self, admin_id: int, chat_id: int, file_path: str, file_name: str = None) -> int:
+        """Yangi import vazifasi (status='queued'), ID qaytariladi"""
+        return await self.run_write(self._create_import_job, admin_id, chat_id, file_path, file_name)
+    
+    def _create_import_job(self, cursor, admin_id: int, chat_id: int, file_path: str, file_name: str = None) -> int:
+        cursor.execute(
+            "INSERT INTO import_jobs (admin_id, chat_id, file_path, file_name) VALUES (?, ?, ?, ?)",
+            (admin_id, chat_id, file_path, file_name)
+        )
+        return cursor.lastrowid
+    
+    async def update_import_job(self, job_id: int, expected_status: str = None, **fields) -> bool:
+        """
+        Import vazifasi ustunlarini yangilash (status, progress, ...).
+        expected_status berilsa - faqat vazifa shu holatda bo'lsa (boshqa protsess
+        o'zgartirib ulgurmagan bo'lsa). Yangilangan bo'lsa True.
+        """
+        return await self.run_write(self._update_import_job, job_id, fields, expected_status)
+    
+    def _update_import_job(self, cursor, job_id: int, fields: Dict[str, Any], expected_status: str = None) -> bool:
+        if not fields:
+            return False
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        sql = f"UPDATE import_jobs SET {assignments} WHERE id = ?"
+        params = [*fields.values(), job_id]
+        if expected_status is not None:
+            sql += " AND status = ?"
+            params.append(expected_status)
+        cursor.execute(sql, params)
+        return cursor.rowcount > 0
+    
+    async def claim_import_job(self) -> Optional[Dict[str, Any]]:
+        """
+        Navbatdagi eng eski vazifani olish (status='running'). Boshqa vazifa
+        bajarilayotgan bo'lsa None - barcha protsesslar bo'yicha bir vaqtda bitta import.
+        """
+        return await self.run_write(self._claim_import_job)
+    
+    def _claim_import_job(self, cursor) -> Optional[Dict[str, Any]]:
+        # Writer tranzaksiyasi (BEGIN IMMEDIATE) ichida - tekshiruv va belgilash atomar
+        cursor.execute("SELECT 1 FROM import_jobs WHERE status IN ('running', 'cancelling') LIMIT 1")
+        if cursor.fetchone():
+            return None
+        cursor.execute("SELECT * FROM import_jobs WHERE status = 'queued' ORDER BY id LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['status'] = 'running'
+        job['started_at'] = datetime.now().isoformat(' ', 'seconds')
+        cursor.execute(
+            "UPDATE import_jobs SET status = 'running', started_at = ? WHERE id = ?",
+            (job['started_at'], job['id'])
+        )
+        return job
+    
+    async def get_import_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        return await self.run_read(self._get_import_job, job_id)
+    
+    def _get_import_job(self, cursor, job_id: int) -> Optional[Dict[str, Any]]:
+        cursor.execute("SELECT * FROM import_jobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    
+    async def get_pending_import_jobs(self) -> List[Dict[str, Any]]:
+        """Tugallanmagan (navbatdagi yoki to'xtab qolgan) vazifalar, yaratilish tartibida"""
+        return await self.run_read(self._get_pending_import_jobs)
+    
+    def _get_pending_import_jobs(self, cursor) -> List[Dict[str, Any]]:
+        cursor.execute("SELECT * FROM import_jobs WHERE status IN ('queued', 'running', 'cancelling') ORDER BY id")
+        return [dict(row) for row in cursor.fetchall()]
+    
+    async def create_broadcast(self, admin_id: int, chat_id: int, text: str) -> Dict[str, int]:
+        """
+        E'lon yaratish: barcha ma'lum foydalanuvchilar (so'rovnoma to'ldirganlar
+        va botdan foydalanganlar) broadcast_queue ga bitta tranzaksiyada yoziladi
+        """
+        return await self.run_write(self._create_broadcast, admin_id, chat_id, text)
+    
+    def _create_broadcast(self, cursor, admin_id: int, chat_id: int, text: str) -> Dict[str, int]:
+        cursor.execute(
+            "INSERT INTO broadcast_jobs (admin_id, chat_id, text) VALUES (?, ?, ?)",
+            (admin_id, chat_id, text)
+        )
+        job_id = cursor.lastrowid
+        cursor.execute("""
+            INSERT OR IGNORE INTO broadcast_queue (job_id, user_id)
+            SELECT ?, user_id FROM survey_responses WHERE user_id IS NOT NULL
+            UNION
+            SELECT ?, user_id FROM user_states WHERE user_id IS NOT NULL
+        """, (job_id, job_id))
+        total = cursor.rowcount
+        cursor.execute("UPDATE broadcast_jobs SET total = ? WHERE id = ?", (total, job_id))
+        return {'id': job_id, 'total': total}
+    
+    async def update_broadcast_job(self, job_id: int, expected_status: str = None, **fields) -> bool:
+        """
+        E'lon ustunlarini yangilash. expected_status berilsa - faqat e'lon shu
+        holatda bo'lsa. Yangilangan bo'lsa True.
+        """
+        return await self.run_write(self._update_broadcast_job, job_id, fields, expected_status)
+    
+    def _update_broadcast_job(self, cursor, job_id: int, fields: Dict[str, Any], expected_status: str = None) -> bool:
+        if not fields:
+            return False
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        sql = f"UPDATE broadcast_jobs SET {assignments} WHERE id = ?"
+        params = [*fields.values(), job_id]
+        if expected_status is not None:
+            sql += " AND status = ?"
+            params.append(expected_status)
+        cursor.execute(sql, params)
+        return cursor.rowcount > 0
+    
+    async def claim_broadcast_job(self) -> Optional[Dict[str, Any]]:
+        """
+        Navbatdagi eng eski e'lonni olish (status='running'). Boshqa e'lon
+        yuborilayotgan bo'lsa None - barcha protsesslar bo'yicha bir vaqtda bitta
+        e'lon, shuning uchun Telegram limiti (~30 xabar/s) umumiy saqlanadi.
+        """
+        return await self.run_write(self._claim_broadcast_job)
+    
+    def _claim_broadcast_job(self, cursor) -> Optional[Dict[str, Any]]:
+        # Writer tranzaksiyasi (BEGIN IMMEDIATE) ichida - tekshiruv va belgilash atomar
+        cursor.execute("SELECT 1 FROM broadcast_jobs WHERE status = 'running' LIMIT 1")
+        if cursor.fetchone():
+            return None
+        cursor.execute("SELECT * FROM broadcast_jobs WHERE status = 'queued' ORDER BY id LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['status'] = 'running'
+        job['started_at'] = job['started_at'] or datetime.now().isoformat(' ', 'seconds')
+        cursor.execute(
+            "UPDATE broadcast_jobs SET status = 'running', started_at = ? WHERE id = ?",
+            (job['started_at'], job['id'])
+        )
+        return job
+    
+    async def get_broadcast_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        return await self.run_read(self._get_broadcast_job, job_id)
+    
+    def _get_broadcast_job(self, cursor, job_id: int) -> Optional[Dict[str, Any]]:
+        cursor.execute("SELECT * FROM broadcast_jobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    
+    async def get_pending_broadcast_jobs(self) -> List[Dict[str, Any]]:
+        return await self.run_read(self._get_pending_broadcast_jobs)
+    
+    def _get_pending_broadcast_jobs(self, cursor) -> List[Dict[str, Any]]:
+        cursor.execute("SELECT * FROM broadcast_jobs WHERE status IN ('queued', 'running') ORDER BY id")
+        return [dict(row) for row in cursor.fetchall()]
+    
+    async def get_broadcast_batch(self, job_id: int, after_user_id: int, limit: int) -> List[int]:
+        """Hali yuborilmagan foydalanuvchilar (user_id bo'yicha keyset pagination)"""
+        return await self.run_read(self._get_broadcast_batch, job_id, after_user_id, limit)
+    
+    def _get_broadcast_batch(self, cursor, job_id: int, after_user_id: int, limit: int) -> List[int]:
+        cursor.execute("""
+            SELECT user_id FROM broadcast_queue
+            WHERE job_id = ? AND user_id > ? AND status = 'pending'
+            ORDER BY user_id
+            LIMIT ?
+        """, (job_id, after_user_id, limit))
+        return [row['user_id'] for row in cursor.fetchall()]
+    
+    async def save_broadcast_results(self, job_id: int, results: List[tuple]) -> None:
+        """
+        Yuborish natijalarini yozish: results = [(user_id, status, error), ...].
+        Navbat va hisoblagichlar bitta tranzaksiyada yangilanadi
+        """
+        await self.run_write(self._save_broadcast_results, job_id, results)
+    
+    def _save_broadcast_results(self, cursor, job_id: int, results: List[tuple]) -> None:
+        cursor.executemany(
+            "UPDATE broadcast_queue SET status = ?, error = ? WHERE job_id = ? AND user_id = ?",
+            [(status, error, job_id, user_id) for user_id, status, error in results]
+        )
+        counts = {'sent': 0, 'blocked': 0, 'failed': 0}
+        for _, status, _ in results:
+            counts[status] += 1
+        cursor.execute("""
+            UPDATE broadcast_jobs
+            SET sent = sent + ?, blocked = blocked + ?, failed = failed + ?
+            WHERE id = ?
+        """, (counts['sent'], counts['blocked'], counts['failed'], job_id))
+    
+    async def refresh_staff(self):
+        """Xodimlar keshini bazadan qayta yuklash"""
+        self._staff_ids = await self.run_read(self._load_staff_ids)
+    
+    def _load_staff_ids(self, cursor) -> Set[int]:
+        cursor.execute("SELECT telegram_id FROM staff")
+        return {row['telegram_id'] for row in cursor.fetchall()}
+    
+    async def is_staff(self, telegram_id: int, fresh: bool = False) -> bool:
+        """
+        Xodim tekshirish (keshdan, bazaga murojaatsiz).
+        fresh=True - bazadan o'qiladi (boshqa protsessdagi o'zgarish ham ko'rinadi), kesh yangilanadi
+        """
+        if self._staff_ids is not None and not fresh:
+            return telegram_id in self._staff_ids
+        is_staff = await self.run_read(self._is_staff, telegram_id)
+        if self._staff_ids is not None:
+            if is_staff:
+                self._staff_ids.add(telegram_id)
+            else:
+                self._staff_ids.discard(telegram_id)
+        return is_staff
+    
+    def _is_staff(self, cursor, telegram_id: int) -> bool:
+        cursor.execute("SELECT 1 FROM staff WHERE telegram_id = ?", (telegram_id,))
+        return cursor.fetchone() is not None
     
     async def add_staff(self, telegram_id: int, fullname: str = None) -> bool:
         """Xodim qo'shish"""
         try:
-            async with self.get_cursor() as cursor:
-                cursor.execute(
-                    "INSERT OR IGNORE INTO staff (telegram_id, fullname) VALUES (?, ?)",
-                    (telegram_id, fullname)
-                )
-                return cursor.rowcount > 0
+            added = await self.run_write(self._add_staff, telegram_id, fullname)
         except Exception:
             return False
+        if self._staff_ids is not None:
+            self._staff_ids.add(telegram_id)
+        return added
+    
+    def _add_staff(self, cursor, telegram_id: int, fullname: str = None) -> bool:
+        cursor.execute(
+            "INSERT OR IGNORE INTO staff (telegram_id, fullname) VALUES (?, ?)",
+            (telegram_id, fullname)
+        )
+        return cursor.rowcount > 0
     
     async def remove_staff(self, telegram_id: int) -> bool:
         """Xodim o'chirish"""
         try:
-            async with self.get_cursor() as cursor:
-                cursor.execute("DELETE FROM staff WHERE telegram_id = ?", (telegram_id,))
-                return cursor.rowcount > 0
+            removed = await self.run_write(self._remove_staff, telegram_id)
         except Exception:
             return False
+        if self._staff_ids is not None:
+            self._staff_ids.discard(telegram_id)
+        return removed
+    
+    def _remove_staff(self, cursor, telegram_id: int) -> bool:
+        cursor.execute("DELETE FROM staff WHERE telegram_id = ?", (telegram_id,))
+        return cursor.rowcount > 0
     
     def close(self):
-        """Connection yopish"""
-        if hasattr(self._local, 'connection'):
-            self._local.connection.close()
-            del self._local.connection
+        """Executorlarni to'xtatish va barcha connectionlarni yopish"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        if self.query_log:
+            self.query_log.write_summary()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
@@ -0,0 +1,176 @@
+# dispatch.py - FSM holati va callback data bo'yicha indekslangan router
+
+import operator
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.filters import Command
+from aiogram.fsm.state import State, StatesGroup
+from magic_filter.operations import CallOperation, ComparatorOperation, GetAttributeOperation
+
+# Indeks ishlatiladigan update turlari (qolganlari oddiy ro'yxat bo'yicha)
+INDEXED_EVENTS = ('message', 'callback_query')
+
+_NO_STATE_MATCH = object()
+
+
+def filter_states(filter_object: FilterObject) -> Optional[Tuple[Optional[str], ...]]:
+    """
+    Filtr faqat shu FSM holatlarida o'tadimi: StateFilter yoki `states`
+    atributli filtr. Aniqlab bo'lmasa (yoki "*") - None.
+    """
+    if filter_object.magic is not None:
+        return None
+    items = getattr(filter_object.callback, 'states', None)
+    if not items:
+        return None
+    states: List[Optional[str]] = []
+    for item in items:
+        if isinstance(item, State):
+            item = item.state
+        elif isinstance(item, type) and issubclass(item, StatesGroup):
+            states.extend(item.__all_states_names__)
+            continue
+        if item == '*' or not (item is None or isinstance(item, str)):
+            return None
+        states.append(item)
+    return tuple(states)
+
+
+def filter_data_key(filter_object: FilterObject) -> Optional[Tuple[str, str]]:
+    """F.data == "x" -> ('exact', "x"), F.data.startswith("x") -> ('prefix', "x"), aks holda None"""
+    magic = filter_object.magic
+    if magic is None:
+        return None
+    ops = magic._operations
+    if not ops or not isinstance(ops[0], GetAttributeOperation) or ops[0].name != 'data':
+        return None
+    if (len(ops) == 2 and isinstance(ops[1], ComparatorOperation)
+            and ops[1].comparator is operator.eq and isinstance(ops[1].right, str)):
+        return 'exact', ops[1].right
+    if (len(ops) == 3 and isinstance(ops[1], GetAttributeOperation) and ops[1].name == 'startswith'
+            and isinstance(ops[2], CallOperation) and not ops[2].kwargs
+            and len(ops[2].args) == 1 and isinstance(ops[2].args[0], str)):
+        return 'prefix', ops[2].args[0]
+    return None
+
+
+def filter_command_prefixes(filter_object: FilterObject) -> Optional[str]:
+    """Command filtri faqat matni shu belgilardan biri bilan boshlangan xabarda o'tadi ("/")"""
+    callback = filter_object.callback
+    if not isinstance(callback, Command):
+        return None
+    return callback.prefix or None
+
+
+class IndexedEventObserver(TelegramEventObserver):
+    """
+    Handlerlarni har bir update uchun ro'yxat boshidan tekshirish o'rniga
+    nomzodlar indeksdan olinadi: FSM holati, aniq callback data, prefiks yoki
+    buyruq belgisi ("/") bo'yicha. Indekslab bo'lmaydigan handlerlar har doim
+    nomzod. Nomzodlar ro'yxatdagi tartibda va to'liq filtrlari bilan
+    tekshiriladi - indeks faqat mos kelmasligi aniq bo'lganlarini tashlaydi,
+    natija oddiy Router bilan bir xil.
+    """
+
+    def __init__(self, router: Router, event_name: str):
+        super().__init__(router=router, event_name=event_name)
+        self._always: List[Tuple[int, HandlerObject]] = []
+        self._by_state: Dict[Optional[str], List[Tuple[int, HandlerObject]]] = defaultdict(list)
+        self._by_data: Dict[str, List[Tuple[int, HandlerObject]]] = defaultdict(list)
+        self._by_prefix: Dict[str, List[Tuple[int, HandlerObject]]] = defaultdict(list)
+        self._prefix_lengths: List[int] = []
+        self._by_command_char: Dict[str, List[Tuple[int, HandlerObject]]] = defaultdict(list)
+        # (holat, aniq data, prefikslar, buyruq belgisi) -> tartiblangan nomzodlar
+        self._cache: Dict[tuple, Tuple[HandlerObject, ...]] = {}
+
+    def register(self, callback, *filters, flags=None, **kwargs):
+        super().register(callback, *filters, flags=flags, **kwargs)
+        self._index(len(self.handlers) - 1, self.handlers[-1])
+        return callback
+
+    def _index(self, position: int, handler: HandlerObject):
+        entry = (position, handler)
+        states = data_key = command_chars = None
+        for filter_object in handler.filters or ():
+            states = states or filter_states(filter_object)
+            data_key = data_key or filter_data_key(filter_object)
+            command_chars = command_chars or filter_command_prefixes(filter_object)
+
+        # Eng tanlovchan kalit: aniq data > holat > buyruq > prefiks
+        if data_key and data_key[0] == 'exact':
+            self._by_data[data_key[1]].append(entry)
+        elif states:
+            for state in states:
+                self._by_state[state].append(entry)
+        elif command_chars:
+            for char in command_chars:
+                self._by_command_char[char].append(entry)
+        elif data_key:
+            self._by_prefix[data_key[1]].append(entry)
+            self._prefix_lengths = sorted({len(prefix) for prefix in self._by_prefix})
+        else:
+            self._always.append(entry)
+        self._cache.clear()
+
+    def candidates(self, event: Any, raw_state: Optional[str]) -> Tuple[HandlerObject, ...]:
+        """Update uchun tekshiriladigan handlerlar (ro'yxatdagi tartibda)"""
+        data = getattr(event, 'data', None)
+        exact = prefixes = None
+        if isinstance(data, str):
+            if data in self._by_data:
+                exact = data
+            prefixes = tuple(
+                data[:length] for length in self._prefix_lengths
+                if len(data) >= length and data[:length] in self._by_prefix
+            )
+        state = raw_state if raw_state in self._by_state else _NO_STATE_MATCH
+        # Command filtri kabi: text yoki caption, boshidagi bo'shliqsiz
+        text = getattr(event, 'text', None) or getattr(event, 'caption', None)
+        char = text.lstrip()[:1] if isinstance(text, str) else None
+        char = char if char in self._by_command_char else None
+
+        key = (state, exact, prefixes, char)
+        handlers = self._cache.get(key)
+        if handlers is None:
+            entries = list(self._always)
+            entries.extend(self._by_state.get(state, ()))
+            entries.extend(self._by_data.get(exact, ()))
+            for prefix in prefixes or ():
+                entries.extend(self._by_prefix[prefix])
+            entries.extend(self._by_command_char.get(char, ()))
+            entries.sort(key=lambda entry: entry[0])
+            handlers = self._cache[key] = tuple(handler for _, handler in entries)
+        return handlers
+
+    async def trigger(self, event, **kwargs: Any) -> Any:
+        for handler in self.candidates(event, kwargs.get('raw_state')):
+            kwargs["handler"] = handler
+            result, data = await handler.check(event, **kwargs)
+            if result:
+                kwargs.update(data)
+                try:
+                    wrapped_inner = self.outer_middleware.wrap_middlewares(
+                        self._resolve_middlewares(),
+                        handler.call,
+                    )
+                    return await wrapped_inner(event, kwargs)
+                except SkipHandler:
+                    continue
+
+        return UNHANDLED
+
+
+class IndexedRouter(Router):
+    """Router: message va callback_query handlerlari indeks orqali tanlanadi"""
+
+    def __init__(self, *, name: Optional[str] = None):
+        super().__init__(name=name)
+        for event_name in INDEXED_EVENTS:
+            observer = IndexedEventObserver(router=self, event_name=event_name)
+            setattr(self, event_name, observer)
+            self.observers[event_name] = observer
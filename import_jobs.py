@@ -0,0 +1,261 @@
+# import_jobs.py - Talabalar importini fon rejimida bajarish (navbat + progress)
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+
+class ImportJobQueue:
+    """
+    Import vazifalari navbati.
+
+    - Har bir yuklangan fayl import_jobs jadvaliga yoziladi (navbat - shu
+      jadval); Telegram handler darhol javob qaytaradi.
+    - Vazifa jadvaldan atomar olinadi (claim_import_job): boshqa vazifa
+      bajarilayotgan bo'lsa hech kim olmaydi. Shu sababli ko'p protsessli
+      rejimda ham bir vaqtda bitta import ishlaydi. Boshqa protsessda
+      qo'yilgan vazifa `poll_interval` soniya ichida olinadi.
+    - Progress xabari `progress_interval` soniyada bir martadan ko'p
+      tahrirlanmaydi (Telegram limitlari).
+    - Bekor qilish tugmasi importni keyingi bo'lakdan oldin to'xtatadi.
+    - Xatolar bo'lsa, oxirida .txt hisobot yuboriladi.
+    - Restartda tugallanmagan vazifalar qayta navbatga qo'yiladi
+      (import idempotent - qayta ishlash ma'lumotni buzmaydi).
+    """
+
+    def __init__(self, db, excel_handler, bot, progress_interval: float = 3.0, poll_interval: float = 2.0):
+        self.db = db
+        self.excel_handler = excel_handler
+        self.bot = bot
+        self.progress_interval = progress_interval
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._current_id: Optional[int] = None
+        self._cancel_event: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @staticmethod
+    def cancel_keyboard(job_id: int) -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="⛔ Bekor qilish", callback_data=f"cancel_import_{job_id}")]
+        ])
+
+    @staticmethod
+    def format_progress(job_id: int, title: str, result: Dict[str, Any]) -> str:
+        return (
+            f"{title} (#{job_id})\n\n"
+            f"📄 Qatorlar: {result.get('rows', 0)}\n"
+            f"➕ Qo'shildi: {result.get('added', 0)}\n"
+            f"🔄 Yangilandi: {result.get('updated', 0)}\n"
+            f"⚠️ Xatolar: {len(result.get('errors', []))}"
+        )
+
+    async def start(self, resume: bool = True):
+        """
+        Workerni ishga tushirish. resume=True - avval tugallanmagan vazifalarni tiklash
+        (ko'p protsessli rejimda buni supervisor workerlardan oldin bajaradi)
+        """
+        if resume:
+            await self.recover()
+        self._worker = asyncio.create_task(self._run())
+
+    async def recover(self):
+        """Oldingi ishga tushirishdan qolgan vazifalar: bajarilayotganlari qayta navbatga"""
+        for job in await self.db.get_pending_import_jobs():
+            if job['status'] == 'cancelling':
+                await self.db.update_import_job(
+                    job['id'], status='cancelled', finished_at=datetime.now().isoformat(' ', 'seconds')
+                )
+            elif job['status'] == 'running':
+                await self.db.update_import_job(job['id'], status='queued')
+                logger.info(f"Import job #{job['id']} requeued")
+
+    async def submit(self, admin_id: int, chat_id: int, file_path: str, file_name: str = None) -> int:
+        """Vazifani navbatga qo'yish va progress xabarini yuborish"""
+        job_id = await self.db.create_import_job(admin_id, chat_id, file_path, file_name)
+
+        position = sum(1 for job in await self.db.get_pending_import_jobs() if job['id'] < job_id)
+        title = "🕒 Import navbatda" if position else "⏳ Import boshlanmoqda"
+        message = await self.bot.send_message(
+            chat_id,
+            self.format_progress(job_id, title, {}),
+            reply_markup=self.cancel_keyboard(job_id)
+        )
+        await self.db.update_import_job(job_id, message_id=message.message_id)
+
+        self._wakeup.set()
+        return job_id
+
+    async def cancel(self, job_id: int) -> bool:
+        """Navbatdagi yoki bajarilayotgan vazifani bekor qilish"""
+        if job_id == self._current_id and self._cancel_event is not None:
+            self._cancel_event.set()
+            return True
+
+        # Navbatdagi vazifa: faqat hali hech kim olmagan bo'lsa
+        if await self.db.update_import_job(
+            job_id, expected_status='queued',
+            status='cancelled', finished_at=datetime.now().isoformat(' ', 'seconds')
+        ):
+            job = await self.db.get_import_job(job_id)
+            await self._edit(job, self.format_progress(job_id, "⛔ Import bekor qilindi", {}))
+            return True
+        # Boshqa protsessda bajarilmoqda - u keyingi bo'lakda statusni tekshiradi
+        return await self.db.update_import_job(job_id, expected_status='running', status='cancelling')
+
+    async def stop(self, timeout: float = 30.0):
+        """Joriy bo'lak yozilguncha kutib workerni to'xtatish (vazifa restartda davom etadi)"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._worker, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Import worker did not stop in time")
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        while not self._stopping:
+            # submit() uyg'otadi; boshqa protsesslar qo'ygan vazifalar - so'rov bilan
+            self._wakeup.clear()
+            try:
+                job = await self.db.claim_import_job()
+            except Exception as e:
+                logger.error(f"Error claiming import job: {e}")
+                job = None
+            if job is not None and self._stopping:
+                # To'xtash paytida olingan vazifa boshqa protsess (yoki restart) uchun qaytariladi
+                await self.db.update_import_job(job['id'], expected_status='running', status='queued')
+                break
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(job)
+            except Exception as e:
+                logger.error(f"Import job #{job['id']} failed: {e}")
+                await self.db.update_import_job(
+                    job['id'], status='failed', error_message=str(e),
+                    finished_at=datetime.now().isoformat(' ', 'seconds')
+                )
+            finally:
+                self._current_id = None
+                self._cancel_event = None
+
+    async def _process(self, job: Dict[str, Any]):
+        job_id = job['id']
+        self._current_id = job_id
+        self._cancel_event = asyncio.Event()
+        logger.info(f"Import job #{job_id} started: {job['file_name']}")
+
+        last_edit = 0.0
+
+        async def progress(result: Dict[str, Any]):
+            nonlocal last_edit
+            await self.db.update_import_job(
+                job_id,
+                rows_processed=result['rows'],
+                added=result['added'],
+                updated=result['updated'],
+                error_count=len(result['errors'])
+            )
+            current = await self.db.get_import_job(job_id)
+            if current and current['status'] == 'cancelling':
+                self._cancel_event.set()
+            now = time.monotonic()
+            if now - last_edit >= self.progress_interval:
+                last_edit = now
+                await self._edit(
+                    job,
+                    self.format_progress(job_id, "⏳ Import davom etmoqda", result),
+                    self.cancel_keyboard(job_id)
+                )
+
+        result = await self.excel_handler.import_students(
+            job['file_path'], progress=progress, cancel_event=self._cancel_event
+        )
+
+        if result['cancelled'] and self._stopping:
+            # Bot to'xtatilmoqda - vazifa restartdan keyin qaytadan bajariladi
+            await self.db.update_import_job(job_id, status='queued')
+            logger.info(f"Import job #{job_id} interrupted by shutdown")
+            return
+
+        if result['cancelled']:
+            status, title = 'cancelled', "⛔ Import bekor qilindi"
+        elif result['success']:
+            status, title = 'done', "✅ Import yakunlandi!"
+        else:
+            status, title = 'failed', "❌ Import xatoligi"
+
+        await self.db.update_import_job(
+            job_id,
+            status=status,
+            rows_processed=result['rows'],
+            added=result['added'],
+            updated=result['updated'],
+            error_count=len(result['errors']),
+            error_message=result['errors'][0] if status == 'failed' and result['errors'] else None,
+            finished_at=datetime.now().isoformat(' ', 'seconds')
+        )
+        logger.info(
+            f"Import job #{job_id} {status}: rows={result['rows']} added={result['added']} "
+            f"updated={result['updated']} errors={len(result['errors'])}"
+        )
+
+        await self._edit(job, self.format_progress(job_id, title, result))
+        if result['errors']:
+            await self._send_error_report(job, result['errors'])
+
+    async def _send_error_report(self, job: Dict[str, Any], errors: list):
+        report_path = os.path.join(self.excel_handler.export_dir, f"import_{job['id']}_xatolar.txt")
+        try:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                f.write(f"Import #{job['id']}: {job['file_name'] or os.path.basename(job['file_path'])}\n")
+                f.write(f"Xatolar soni: {len(errors)}\n\n")
+                f.write('\n'.join(errors))
+                f.write('\n')
+            await self.bot.send_document(
+                job['chat_id'],
+                document=FSInputFile(report_path),
+                caption=f"⚠️ Import #{job['id']} xatolari hisoboti"
+            )
+        except Exception as e:
+            logger.error(f"Error sending import report: {e}")
+        finally:
+            if os.path.exists(report_path):
+                os.remove(report_path)
+
+    async def _edit(self, job: Dict[str, Any], text: str, reply_markup: InlineKeyboardMarkup = None):
+        """Progress xabarini tahrirlash; Telegram xatolari importni to'xtatmaydi"""
+        if not job.get('message_id'):
+            return
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=job['chat_id'],
+                message_id=job['message_id'],
+                reply_markup=reply_markup
+            )
+        except TelegramBadRequest as e:
+            if 'message is not modified' not in str(e):
+                logger.warning(f"Error editing import progress: {e}")
+        except Exception as e:
+            logger.warning(f"Error editing import progress: {e}")
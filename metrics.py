@@ -0,0 +1,266 @@
+# metrics.py - Ishlash vaqti metrikalari: handlerlar, ma'lumotlar bazasi, Telegram API
+
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Soniyalarda (1ms ... 10s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Series:
+    __slots__ = ('buckets', 'total', 'count')
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Yorliqlar bo'yicha histogram (Prometheus bucketlari). Thread-safe."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.bounds = buckets
+        self._series: Dict[tuple, _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = _Series(len(self.bounds) + 1)
+            series.buckets[index] += 1
+            series.total += value
+            series.count += 1
+
+    def snapshot(self) -> Dict[tuple, Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(s.buckets), s.total, s.count) for key, s in self._series.items()}
+
+    def quantile(self, buckets: List[int], count: int, q: float) -> float:
+        """Bucketlar ichida chiziqli interpolyatsiya bilan taxminiy kvantil"""
+        target = q * count
+        cumulative = 0
+        for index, in_bucket in enumerate(buckets):
+            if in_bucket and cumulative + in_bucket >= target:
+                if index >= len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                return lower + (self.bounds[index] - lower) * (target - cumulative) / in_bucket
+            cumulative += in_bucket
+        return 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (buckets, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, in_bucket in zip(self.bounds + (float('inf'),), buckets):
+                cumulative += in_bucket
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labels, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Counter:
+    """Yorliqlar bo'yicha hisoblagich. Thread-safe."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self) -> Dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Protsess ichidagi barcha metrikalar (har bir worker protsessida alohida)"""
+
+    def __init__(self):
+        self.metrics: List[Any] = []
+        self.started = time.time()
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...]) -> Histogram:
+        metric = Histogram(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...]) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text formati (0.0.4)"""
+        lines = [
+            "# HELP bot_uptime_seconds Seconds since process start",
+            "# TYPE bot_uptime_seconds gauge",
+            f"bot_uptime_seconds {time.time() - self.started:.0f}",
+        ]
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+UPDATE_SECONDS = registry.histogram(
+    'bot_update_seconds', "Full update processing time by update type", ('type',))
+HANDLER_SECONDS = registry.histogram(
+    'bot_handler_seconds', "Handler latency by handler name and FSM state", ('handler', 'state'))
+DB_SECONDS = registry.histogram(
+    'bot_db_seconds', "Database call execution time by method", ('method', 'mode'))
+DB_WAIT_SECONDS = registry.histogram(
+    'bot_db_queue_wait_seconds', "Time a database call waited for a free connection thread", ('mode',))
+DB_ROWS = registry.counter(
+    'bot_db_rows_total', "Rows returned or changed by database calls", ('method',))
+API_SECONDS = registry.histogram(
+    'bot_api_seconds', "Telegram Bot API request time by method and outcome", ('method', 'status'))
+
+
+def observe_db(method: str, mode: str, waited: float, elapsed: float, rows: int):
+    """Database._call dan chaqiriladi (DB threadida)"""
+    DB_WAIT_SECONDS.observe(waited, mode)
+    DB_SECONDS.observe(elapsed, method, mode)
+    if rows:
+        DB_ROWS.inc(rows, method)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """dp.update outer middleware: updatening umumiy ishlanish vaqti"""
+
+    async def __call__(self, handler, event, data: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_SECONDS.observe(time.perf_counter() - start, event.event_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: handler nomi va FSM holati bo'yicha kechikish"""
+
+    async def __call__(self, handler, event, data: Dict[str, Any]) -> Any:
+        handler_object = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object else 'unknown'
+        state = data.get('raw_state') or '-'
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - start, name, state)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """bot.session middleware: Telegram API metodlari vaqti"""
+
+    async def __call__(self, make_request, bot, method):
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - start, method.__api_method__, status)
+
+
+def setup_metrics(dp, bot):
+    """Dispatcher va bot sessiyasiga metrika middlewarelarini ulash"""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_middleware = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ('update', 'error'):
+            observer.middleware(handler_middleware)
+    bot.session.middleware(ApiMetricsMiddleware())
+
+
+def summary(limit: int = 10) -> List[str]:
+    """Admin /metrics buyrug'i uchun qisqa hisobot: umumiy vaqt bo'yicha eng og'irlari"""
+    sections = [
+        ("⏱ Updatelar", UPDATE_SECONDS),
+        ("🧩 Handlerlar", HANDLER_SECONDS),
+        ("🗄 Ma'lumotlar bazasi", DB_SECONDS),
+        ("📡 Telegram API", API_SECONDS),
+    ]
+    lines = [f"📈 Metrikalar (ishlash vaqti: {time.time() - registry.started:.0f}s)"]
+    for title, histogram in sections:
+        rows = sorted(histogram.snapshot().items(), key=lambda item: item[1][1], reverse=True)
+        lines.append(f"\n{title}:")
+        if not rows:
+            lines.append("  —")
+            continue
+        for key, (buckets, total, count) in rows[:limit]:
+            p50 = histogram.quantile(buckets, count, 0.5) * 1000
+            p95 = histogram.quantile(buckets, count, 0.95) * 1000
+            lines.append(
+                f"  • {' / '.join(str(v) for v in key)}: {count} ta, "
+                f"o'rtacha {total / count * 1000:.1f}ms, p50 {p50:.1f}ms, p95 {p95:.1f}ms"
+            )
+    wait = DB_WAIT_SECONDS.snapshot()
+    if wait:
+        lines.append("\n⌛ DB navbatida kutish:")
+        for (mode,), (buckets, total, count) in sorted(wait.items()):
+            lines.append(
+                f"  • {mode}: o'rtacha {total / count * 1000:.1f}ms, "
+                f"p95 {DB_WAIT_SECONDS.quantile(buckets, count, 0.95) * 1000:.1f}ms"
+            )
+    return lines
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """GET /metrics - Prometheus text formatidagi lokal endpoint"""
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'},
+        )
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return runner
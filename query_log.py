@@ -0,0 +1,216 @@
+# query_log.py - Sekin SQL so'rovlar jurnali (vaqt, EXPLAIN QUERY PLAN, agregat statistika)
+
+import logging
+import os
+import re
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+# Reja olinadigan buyruqlar (BEGIN, CREATE, PRAGMA ... uchun reja yo'q)
+_PLANNABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+def normalize_sql(sql: str) -> str:
+    """Statistika kaliti: bo'shliqlar siqiladi, (?, ?, ?) ro'yxatlari bitta ko'rinishga keltiriladi"""
+    return _PLACEHOLDER_LIST.sub('?, ...', _WHITESPACE.sub(' ', sql).strip())
+
+
+def is_full_scan(detail: str) -> bool:
+    """'SCAN students' / 'SCAN TABLE students' - indekssiz to'liq o'qish"""
+    return detail.startswith('SCAN') and 'USING' not in detail
+
+
+class _StatementStats:
+    __slots__ = ('count', 'total', 'max', 'slow', 'plan', 'full_scan')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.plan: Optional[List[str]] = None
+        self.full_scan = False
+
+
+class SlowQueryLog:
+    """
+    Har bir SQL buyruq vaqtini (execute + fetch) o'lchaydi va normallashgan
+    matn bo'yicha agregatlaydi. `threshold_ms` dan sekin buyruqlar uchun
+    EXPLAIN QUERY PLAN olinadi va aylanma (rotating) log fayliga yoziladi.
+    Parametrlar yozilmaydi - ularda shaxsiy ma'lumot (pasport) bo'ladi.
+    """
+
+    def __init__(self, threshold_ms: float, log_path: str, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 3):
+        self.threshold = threshold_ms / 1000
+        self._stats: Dict[str, _StatementStats] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(f"slow_queries:{log_path}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+            handler = RotatingFileHandler(
+                log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+            )
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(threadName)s - %(message)s'))
+            self.logger.addHandler(handler)
+
+    def wrap(self, cursor):
+        return InstrumentedCursor(cursor, self)
+
+    def record(self, cursor, sql: str, params: Any, elapsed: float, rows: int):
+        key = normalize_sql(sql)
+        slow = elapsed >= self.threshold
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _StatementStats()
+            stats.count += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            if slow:
+                stats.slow += 1
+            need_plan = slow and stats.plan is None
+        if not slow:
+            return
+
+        if need_plan:
+            plan = self._explain(cursor, sql, params)
+            with self._lock:
+                stats.plan = plan
+                stats.full_scan = any(is_full_scan(detail) for detail in plan)
+        flag = " [FULL SCAN]" if stats.full_scan else ""
+        message = f"{elapsed * 1000:.1f}ms rows={rows}{flag} | {key}"
+        if need_plan and stats.plan:
+            message += ''.join(f"\n    {detail}" for detail in stats.plan)
+        self.logger.warning(message)
+
+    def _explain(self, cursor, sql: str, params: Any) -> List[str]:
+        """Sekin buyruqning rejasi (o'sha connection va parametrlar bilan)"""
+        if not sql.lstrip().upper().startswith(_PLANNABLE) or params is None:
+            return []
+        plan_cursor = cursor.connection.cursor()
+        try:
+            plan_cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[3] for row in plan_cursor.fetchall()]
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        finally:
+            plan_cursor.close()
+
+    def stats(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Umumiy vaqt bo'yicha eng og'ir buyruqlar"""
+        with self._lock:
+            items = [
+                {
+                    'sql': key,
+                    'count': s.count,
+                    'total_ms': s.total * 1000,
+                    'avg_ms': s.total / s.count * 1000,
+                    'max_ms': s.max * 1000,
+                    'slow': s.slow,
+                    'full_scan': s.full_scan,
+                    'plan': list(s.plan or []),
+                }
+                for key, s in self._stats.items()
+            ]
+        items.sort(key=lambda item: item['total_ms'], reverse=True)
+        return items[:limit]
+
+    def write_summary(self, limit: int = 20):
+        """Agregat statistikani log fayliga yozish (Database.close da)"""
+        items = self.stats(limit)
+        if not items:
+            return
+        lines = ["Query summary (top by total time):"]
+        for item in items:
+            flag = " [FULL SCAN]" if item['full_scan'] else ""
+            lines.append(
+                f"  {item['total_ms']:.0f}ms total, {item['count']} calls, avg {item['avg_ms']:.2f}ms, "
+                f"max {item['max_ms']:.1f}ms, slow {item['slow']}{flag} | {item['sql'][:300]}"
+            )
+        self.logger.info('\n'.join(lines))
+
+
+class InstrumentedCursor:
+    """
+    sqlite3.Cursor o'rami: buyruq vaqti execute dan keyingi execute (yoki
+    close) gacha bo'lgan fetch vaqtini ham o'z ichiga oladi - SELECT ning
+    asosiy ishi fetch paytida bajariladi.
+    """
+
+    def __init__(self, cursor, query_log: SlowQueryLog):
+        self._cursor = cursor
+        self._log = query_log
+        self._sql: Optional[str] = None
+        self._params: Any = None
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            self._log.record(self._cursor, sql, self._params, self._elapsed, self._rows)
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def _begin(self, sql: str, params: Any):
+        self._finish()
+        self._sql = sql
+        self._params = params
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def execute(self, sql: str, params: Any = ()):
+        self._begin(sql, params)
+        self._timed(self._cursor.execute, sql, params)
+        self._rows = max(self._cursor.rowcount, 0)
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        # Reja uchun birinchi parametrlar to'plami (faqat ro'yxat bo'lsa)
+        first = seq_of_params[0] if isinstance(seq_of_params, (list, tuple)) and seq_of_params else None
+        self._begin(sql, first)
+        self._timed(self._cursor.executemany, sql, seq_of_params)
+        self._rows = max(self._cursor.rowcount, 0)
+        return self
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size: int = None):
+        rows = self._timed(self._cursor.fetchmany, size if size is not None else self._cursor.arraysize)
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self._timed(self._cursor.__next__)
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
@@ -0,0 +1,162 @@
+# storage.py - SQLite asosidagi FSM storage (user_states jadvali)
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey, DEFAULT_DESTINY
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Record:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    user_states jadvali ustidagi aiogram FSM storage.
+
+    O'qish - read-through kesh: foydalanuvchi holati birinchi murojaatda
+    bazadan olinadi, keyin faqat xotiradan o'qiladi.
+    Yozish - coalescing: har bir update_data faqat yozuvni "dirty" qiladi,
+    fon vazifasi esa `flush_interval` soniyada bir marta barcha
+    o'zgarishlarni bitta tranzaksiyada bazaga yozadi. Shu sababli
+    xabarlarga qo'shimcha kechikish qo'shilmaydi, restartda esa chala
+    so'rovnomalar yo'qolmaydi.
+
+    Faqat shaxsiy chatdagi (chat_id == user_id) holatlar saqlanadi,
+    qolganlari xotirada turadi.
+
+    Kesh LRU: `max_cached` dan oshsa eng eski toza (bazaga yozilgan)
+    yozuvlar chiqariladi; tozalangan holatlar yozilishi bilan keshdan o'chadi.
+    """
+
+    def __init__(self, db, flush_interval: float = 1.0, max_cached: int = 10000):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_cached = max_cached
+        self._cache: "OrderedDict[StorageKey, _Record]" = OrderedDict()
+        self._dirty: Set[StorageKey] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    @staticmethod
+    def _persistent(key: StorageKey) -> bool:
+        return (
+            key.chat_id == key.user_id
+            and key.destiny == DEFAULT_DESTINY
+            and not key.thread_id
+            and not key.business_connection_id
+        )
+
+    async def _record(self, key: StorageKey) -> _Record:
+        """Keshdan olish, bo'lmasa bazadan yuklash"""
+        record = self._cache.get(key)
+        if record is not None:
+            self._cache.move_to_end(key)
+            return record
+
+        loaded = _Record()
+        if self._persistent(key):
+            row = await self.db.load_user_state(key.user_id)
+            if row:
+                loaded.state = row['current_state']
+                loaded.data = json.loads(row['temp_data']) if row['temp_data'] else {}
+        # Yuklash paytida boshqa coroutine yozib qo'ygan bo'lishi mumkin
+        record = self._cache.setdefault(key, loaded)
+        self._evict()
+        return record
+
+    def _evict(self):
+        """Eng eski toza yozuvlarni chiqarish (dirty va xotiradagi holatlar qoladi)"""
+        excess = len(self._cache) - self.max_cached
+        if excess <= 0:
+            return
+        stale = []
+        for key in self._cache:
+            if len(stale) >= excess:
+                break
+            if key not in self._dirty and self._persistent(key):
+                stale.append(key)
+        for key in stale:
+            del self._cache[key]
+
+    def _mark_dirty(self, key: StorageKey, record: _Record):
+        # Yozuv await paytida keshdan chiqarilgan bo'lishi mumkin
+        self._cache[key] = record
+        if not self._persistent(key):
+            return
+        self._dirty.add(key)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        record.data = data.copy()
+        self._mark_dirty(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key)).data.copy()
+
+    async def _flush_loop(self):
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Barcha o'zgargan holatlarni bazaga yozish"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            keys, self._dirty = self._dirty, set()
+
+            rows = []
+            deleted = []
+            for key in keys:
+                record = self._cache[key]
+                if record.state is None and not record.data:
+                    deleted.append(key.user_id)
+                else:
+                    rows.append((key.user_id, record.state, json.dumps(record.data, ensure_ascii=False)))
+
+            try:
+                await self.db.save_user_states(rows, deleted)
+            except asyncio.CancelledError:
+                self._dirty |= keys
+                raise
+            except Exception as e:
+                logger.error(f"Error flushing FSM states: {e}")
+                self._dirty |= keys
+                return
+
+            # Tozalangan holatlar bazada yo'q - keshda saqlash shart emas
+            for key in keys:
+                record = self._cache.get(key)
+                if (record is not None and key not in self._dirty
+                        and record.state is None and not record.data):
+                    del self._cache[key]
+            self._evict()
+
+    async def close(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
@@ -0,0 +1,122 @@
+# subscription.py - Kanal obunasini tekshirish (TTL kesh + parallel cheklov)
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionChecker:
+    """
+    bot.get_chat_member natijalarini keshlaydi.
+
+    - Ijobiy va salbiy natijalar alohida TTL bilan saqlanadi
+      (obuna bo'lgan talaba uzoq vaqt tekshirilmaydi, obuna bo'lmagan
+      esa tez orada qayta tekshiriladi).
+    - Bitta foydalanuvchi uchun parallel tekshiruvlar bitta so'rovga
+      birlashtiriladi.
+    - Telegram API ga bir vaqtda ketadigan so'rovlar soni cheklanadi.
+    - Ijobiy va salbiy natijalar alohida tekshiruv vaqti tartibida turadi
+      (har birining TTL i bitta - boshidagisi birinchi eskiradi): muddati
+      o'tganlar har bir yangi natijada o'chiriladi, hajmi `max_cached` dan oshmaydi.
+    """
+
+    def __init__(
+        self,
+        bot,
+        channel_username: str,
+        positive_ttl: float = 600.0,
+        negative_ttl: float = 30.0,
+        min_recheck: float = 3.0,
+        max_concurrency: int = 10,
+        max_cached: int = 50000,
+    ):
+        self.bot = bot
+        self.channel_username = channel_username
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.min_recheck = min_recheck
+        self.max_cached = max_cached
+        self._cache: Dict[int, Tuple[bool, float]] = {}
+        # Natija turi -> {user_id: tekshiruv vaqti}, eng eskisi boshida
+        self._expiry: Dict[bool, "OrderedDict[int, float]"] = {True: OrderedDict(), False: OrderedDict()}
+        self._inflight: Dict[int, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def check(self, user_id: int, recheck: bool = False) -> bool:
+        """
+        Obunani tekshirish. recheck=True ("Obunani tekshirish" tugmasi) salbiy
+        natijani `min_recheck` soniyadan keyin qayta so'raydi.
+        """
+        cached = self._cache.get(user_id)
+        if cached is not None:
+            subscribed, checked_at = cached
+            age = time.monotonic() - checked_at
+            ttl = self.positive_ttl if subscribed else self.negative_ttl
+            if recheck and not subscribed:
+                ttl = min(ttl, self.min_recheck)
+            if age < ttl:
+                self.hits += 1
+                return subscribed
+
+        task = self._inflight.get(user_id)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.create_task(self._fetch(user_id))
+        self._inflight[user_id] = task
+        task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, user_id: int) -> bool:
+        async with self._semaphore:
+            try:
+                member = await self.bot.get_chat_member(chat_id=f"@{self.channel_username}", user_id=user_id)
+            except Exception as e:
+                # Xatolikda foydalanuvchi bloklanmaydi va natija keshlanmaydi
+                logger.error(f"Error checking subscription: {e}")
+                return True
+        subscribed = member.status in ['creator', 'administrator', 'member']
+        now = time.monotonic()
+        previous = self._cache.get(user_id)
+        if previous is not None:
+            del self._expiry[previous[0]][user_id]
+        self._cache[user_id] = (subscribed, now)
+        self._expiry[subscribed][user_id] = now
+        self._prune(now)
+        return subscribed
+
+    def _prune(self, now: float):
+        """Muddati o'tgan va hajmdan ortiq eng eski natijalarni o'chirish"""
+        for subscribed, ttl in ((True, self.positive_ttl), (False, self.negative_ttl)):
+            order = self._expiry[subscribed]
+            while order and now - next(iter(order.values())) >= ttl:
+                user_id, _ = order.popitem(last=False)
+                del self._cache[user_id]
+
+        while len(self._cache) > self.max_cached:
+            # Ikkala navbat boshidan eng eski tekshirilgani
+            oldest = min(
+                (order for order in self._expiry.values() if order),
+                key=lambda order: next(iter(order.values())),
+            )
+            user_id, _ = oldest.popitem(last=False)
+            del self._cache[user_id]
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses + self.coalesced
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'cached_users': len(self._cache),
+            'hit_rate': (self.hits + self.coalesced) / total * 100 if total else 0.0,
+        }
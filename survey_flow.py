@@ -0,0 +1,199 @@
+# survey_flow.py - So'rovnoma savollari grafi (deklarativ ta'rif)
+#
+# Har bir savol: SurveyStates holati, TEXTS kaliti, javob turi, saqlanadigan
+# maydon va keyingi savol qoidasi. bot.py dagi umumiy handlerlar joriy FSM
+# holati bo'yicha savolni lug'atdan oladi; "orqaga" tugmasi talaba bosib
+# o'tgan yo'ldagi oldingi savolga qaytaradi (yo'l grafdan hisoblanadi).
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+YES = "Ha"
+NO = "Yo'q"
+
+# Javob turlari: text va location - xabar, yes_no va choice - inline tugma
+TEXT = 'text'
+LOCATION = 'location'
+YES_NO = 'yes_no'
+CHOICE = 'choice'
+MESSAGE_KINDS = (TEXT, LOCATION)
+
+# Endi so'ralmaydigan, lekin jadvalda qolgan ustunlar (bo'sh saqlanadi)
+RETIRED_FIELDS = ('certificate_file',)
+
+NextRule = Union[None, str, Callable[[Dict], Optional[str]]]
+
+
+@dataclass
+class Question:
+    """
+    id - SurveyStates holati nomi; key - orqaga tugmasi uchun qisqa nom (back_<key>)
+    kind - javob turi; field - javob saqlanadigan maydon
+    next - keyingi savol id si (None - so'rovnoma yakuni) yoki data bo'yicha tanlovchi funksiya
+    branches - javob qiymati -> keyingi savol (next dan ustun)
+    options - choice uchun (callback qo'shimchasi, tugma matni, saqlanadigan qiymat)
+    """
+    id: str
+    key: str
+    kind: str
+    field: str
+    next: NextRule = None
+    branches: Dict[str, str] = field(default_factory=dict)
+    options: Tuple[Tuple[str, str, str], ...] = ()
+    prefix: str = ''
+    text: str = ''
+
+    def __post_init__(self):
+        self.text = self.text or self.id
+        if self.kind == YES_NO:
+            self.prefix = self.prefix or 'answer_'
+        self._values = {suffix: value for suffix, _, value in self.options}
+
+    def callback_answer(self, data: str) -> str:
+        """Callback data dan saqlanadigan qiymat"""
+        suffix = data[len(self.prefix):]
+        if self.kind == YES_NO:
+            return YES if suffix == 'yes' else NO
+        return self._values.get(suffix, suffix)
+
+
+class Survey:
+    """Savollar grafi: id va key bo'yicha lug'atlar, yo'l bo'yicha navigatsiya"""
+
+    def __init__(self, questions: List[Question]):
+        self.questions = questions
+        self.first = questions[0]
+        self.by_id = {q.id: q for q in questions}
+        self.by_key = {q.key: q for q in questions}
+        for q in questions:
+            for target in [q.next, *q.branches.values()]:
+                if isinstance(target, str) and target not in self.by_id:
+                    raise ValueError(f"{q.id}: unknown next question {target}")
+
+    def next(self, question: Question, data: Dict) -> Optional[Question]:
+        """Javob saqlangandan keyin keyingi savol (None - yakun)"""
+        target = question.branches.get(data.get(question.field), question.next)
+        if callable(target):
+            target = target(data)
+        return self.by_id[target] if target else None
+
+    def path(self, data: Dict) -> Iterator[Question]:
+        """Talaba bosib o'tgan yo'l: birinchi javobsiz savolgacha (u ham kiradi)"""
+        question = self.first
+        for _ in range(len(self.questions)):
+            if question is None:
+                return
+            yield question
+            if question.field not in data:
+                return
+            question = self.next(question, data)
+
+    def previous(self, question_id: str, data: Dict) -> Optional[Question]:
+        """Yo'lda berilgan savoldan oldingi savol (birinchi savol uchun None)"""
+        previous = None
+        for question in self.path(data):
+            if question.id == question_id:
+                return previous
+            previous = question
+        return None
+
+    def answers(self, data: Dict) -> Dict:
+        """Saqlash uchun javoblar: yo'ldan tashqaridagi (o'tkazilgan) savollar bo'sh"""
+        visited = {q.field for q in self.path(data)}
+        result = dict(data)
+        for q in self.questions:
+            if q.field not in visited:
+                result[q.field] = ""
+        for name in RETIRED_FIELDS:
+            result.setdefault(name, "")
+        return result
+
+
+def _after_mother(data: Dict) -> str:
+    # Ota hayot bo'lsa - ota-ona birgami, aks holda to'g'ridan-to'g'ri yashash joyi
+    return 'q17_parents_together' if data.get('father_alive') == YES else 'q18_living_type'
+
+
+CERTIFICATE_OPTIONS = (
+    ('ielts', "IELTS", "IELTS"),
+    ('milliy', "Milliy sertifikat", "MILLIY"),
+    ('toefl_ibt', "TOEFL iBT", "TOEFL_IBT"),
+    ('toefl_itp', "TOEFL ITP", "TOEFL_ITP"),
+    ('cambridge', "Cambridge", "CAMBRIDGE"),
+    ('linguaskill', "Linguaskill", "LINGUASKILL"),
+    ('duolingo', "Duolingo", "DUOLINGO"),
+    ('cefr', "CEFR", "CEFR"),
+    ('other', "Boshqa", "OTHER"),
+)
+
+LIVING_OPTIONS = (
+    ('home', "🏠 Uydan (oila bilan)", "Uydan (oila bilan)"),
+    ('ttj', "🏢 TTJ (talabalar turar joyi)", "TTJ"),
+    ('rent', "🏘 Ijaradan", "Ijaradan"),
+    ('relatives', "👨‍👩‍👧 Qarindoshlarnikida", "Qarindoshlarnikida"),
+)
+
+TTJ_OPTIONS = (
+    ('uydan', "Uydan", "Uydan"),
+    ('jevachi', "Jevachi TTJ dan", "Jevachi TTJ dan"),
+    ('kuaf', "KUAF TTJ dan", "KUAF TTJ dan"),
+    ('texnika', "Texnika DXSH dan", "Texnika DXSH dan"),
+    ('kamolot', "Kamolot Ko'cha TTJ dan", "Kamolot Ko'cha TTJ dan"),
+    ('family_med', "FAMILY MED TTJ dan", "FAMILY MED TTJ dan"),
+    ('ijara', "Ijaradan (kvartira)", "Ijaradan (kvartira)"),
+)
+
+SURVEY = Survey([
+    Question('q1_phone', 'q1', TEXT, 'phone', next='q2_address'),
+    Question('q2_address', 'q2', TEXT, 'permanent_address', next='q3_location'),
+    Question('q3_location', 'q3', LOCATION, 'permanent_location', next='q4_previous_education'),
+    Question('q4_previous_education', 'q4', TEXT, 'previous_education', next='q5_document'),
+    Question('q5_document', 'q5', TEXT, 'document_number', next='q6_achievements'),
+
+    Question('q6_achievements', 'q6', YES_NO, 'has_achievements',
+             branches={YES: 'q6_achievements_details'}, next='q7_certificate'),
+    Question('q6_achievements_details', 'q6_details', TEXT, 'achievements', next='q7_certificate'),
+
+    Question('q7_certificate', 'q7', YES_NO, 'has_certificate',
+             branches={YES: 'q7_certificate_type'}, next='q9_grant'),
+    Question('q7_certificate_type', 'q7_type', CHOICE, 'certificate_type', prefix='cert_',
+             options=CERTIFICATE_OPTIONS, next='q7_certificate_details'),
+    Question('q7_certificate_details', 'q7_details', TEXT, 'certificate_details', next='q9_grant'),
+
+    Question('q9_grant', 'q9', YES_NO, 'has_grant',
+             branches={YES: 'q9_grant_details'}, next='q10_social_protection'),
+    Question('q9_grant_details', 'q9_details', TEXT, 'grant_details', next='q10_social_protection'),
+
+    Question('q10_social_protection', 'q10', YES_NO, 'social_protection', next='q11_iron_book'),
+    Question('q11_iron_book', 'q11', YES_NO, 'iron_book', next='q12_youth_book'),
+    Question('q12_youth_book', 'q12', YES_NO, 'youth_book', next='q14_father_alive'),
+
+    # Ota-ona: avval hayotdami, "Ha" bo'lsa ismi va telefoni
+    Question('q14_father_alive', 'q14', YES_NO, 'father_alive',
+             branches={YES: 'q13_father_name'}, next='q16_mother_alive'),
+    Question('q13_father_name', 'q13', TEXT, 'father_name', next='q14_father_phone'),
+    Question('q14_father_phone', 'q14_phone', TEXT, 'father_phone', next='q16_mother_alive'),
+    Question('q16_mother_alive', 'q16', YES_NO, 'mother_alive',
+             branches={YES: 'q15_mother_name'}, next=_after_mother),
+    Question('q15_mother_name', 'q15', TEXT, 'mother_name', next='q16_mother_phone'),
+    Question('q16_mother_phone', 'q16_phone', TEXT, 'mother_phone', next=_after_mother),
+    Question('q17_parents_together', 'q17', YES_NO, 'parents_together', next='q18_living_type'),
+
+    # Yashash joyi: TTJ va ijara uchun qo'shimcha savollar
+    Question('q18_living_type', 'q18', CHOICE, 'living_type', prefix='living_', options=LIVING_OPTIONS,
+             branches={"TTJ": 'q18_ttj_type', "Ijaradan": 'q19_rent_address'}, next='q22_working'),
+    Question('q18_ttj_type', 'q18_ttj', CHOICE, 'ttj_location', prefix='ttj_', options=TTJ_OPTIONS,
+             next='q22_working'),
+    Question('q19_rent_address', 'q19', TEXT, 'rent_address', next='q20_rent_location'),
+    Question('q20_rent_location', 'q20', LOCATION, 'rent_location', next='q21_rent_owner'),
+    Question('q21_rent_owner', 'q21', TEXT, 'rent_owner', next='q22_working'),
+
+    Question('q22_working', 'q22', YES_NO, 'is_working',
+             branches={YES: 'q23_workplace'}, next='q24_married'),
+    Question('q23_workplace', 'q23', TEXT, 'workplace', next='q24_married'),
+    Question('q24_married', 'q24', YES_NO, 'is_married', next='q25_foreign_passport'),
+    Question('q25_foreign_passport', 'q25', YES_NO, 'has_foreign_passport', next='q26_social_channels'),
+    Question('q26_social_channels', 'q26', YES_NO, 'has_social_channels',
+             branches={YES: 'q26_social_links'}),
+    Question('q26_social_links', 'q26_links', TEXT, 'social_links'),
+])
@@ -0,0 +1,128 @@
+# webhook.py - Webhook rejimi (aiohttp server, long polling o'rniga)
+
+import asyncio
+import logging
+import signal
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    SimpleRequestHandler + parallel update cheklovi va graceful drain.
+
+    Update fon vazifasida ishlanadi, lekin vazifa faqat bo'sh slot olingandan
+    keyin yaratiladi: bir vaqtda `max_concurrency` tadan ko'p vazifa bo'lmaydi,
+    slot kutayotganlar esa ochiq HTTP so'rovlar (Telegram max_connections) bilan
+    cheklanadi - Telegram javobni kutib, yangi update yubormay turadi.
+    To'xtatishda yangi so'rovlar 503 bilan rad etiladi (Telegram ularni keyin
+    qayta yuboradi), boshlangan updatelar esa `drain_timeout` soniyagacha
+    tugatiladi. Bot sessiyasi bu yerda yopilmaydi - run_webhook server
+    to'liq to'xtagandan keyin yopadi.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_concurrency: int = 50,
+                 drain_timeout: float = 30.0, **kwargs: Any):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.drain_timeout = drain_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._closing = False
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update: Dict[str, Any] = await request.json(loads=bot.session.json_loads)
+        await self._semaphore.acquire()
+        if self._closing:
+            self._semaphore.release()
+            return web.Response(status=503, text="Shutting down")
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        task.add_done_callback(lambda _: self._semaphore.release())
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self._closing:
+            return web.Response(status=503, text="Shutting down")
+        return await super().handle(request)
+
+    async def close(self) -> None:
+        self._closing = True
+        tasks = set(self._background_feed_update_tasks)
+        if tasks:
+            logger.info(f"Draining {len(tasks)} webhook updates")
+            done, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                # Bekor qilingan handlerlarning finally bloklari ham tugashi kutiladi
+                await asyncio.wait(pending)
+                logger.warning(f"{len(pending)} webhook updates cancelled after drain timeout")
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    host: str,
+    port: int,
+    path: str,
+    base_url: Optional[str] = None,
+    secret_token: Optional[str] = None,
+    max_concurrency: int = 50,
+    drain_timeout: float = 30.0,
+    allowed_updates: Optional[list] = None,
+):
+    """
+    aiohttp serverini ishga tushirib SIGINT/SIGTERM gacha kutish.
+
+    base_url berilsa webhook Telegramda ro'yxatdan o'tkaziladi; bo'sh bo'lsa
+    server faqat lokal ishlaydi (yozib olingan update JSON larini POST qilib
+    sinash uchun).
+    """
+    app = web.Application()
+    handler = LimitedRequestHandler(
+        dp, bot,
+        secret_token=secret_token,
+        max_concurrency=max_concurrency,
+        drain_timeout=drain_timeout,
+    )
+    # Avval handler (drain), keyin dispatcher shutdown (storage flush), oxirida sessiya
+    handler.register(app, path=path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"Webhook server listening on {host}:{port}{path}")
+
+    if base_url:
+        await bot.set_webhook(
+            url=base_url.rstrip('/') + path,
+            secret_token=secret_token or None,
+            allowed_updates=allowed_updates if allowed_updates is not None else dp.resolve_used_update_types(),
+            max_connections=min(max_concurrency, 100),
+        )
+        logger.info(f"Webhook set: {base_url.rstrip('/')}{path}")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("Webhook server stopping")
+        # Webhook o'chirilmaydi - restart paytida updatelar Telegramda navbatda turadi
+        try:
+            await runner.cleanup()
+        finally:
+            await bot.session.close()
@@ -0,0 +1,145 @@
+# workers.py - Ko'p protsessli rejim: supervisor + user_id bo'yicha shardlangan workerlar
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+class ShardingMiddleware(BaseMiddleware):
+    """
+    Supervisor dispatcheridagi update middleware: updateni o'zi ishlamaydi,
+    balki `user_id % N` bo'yicha workerga yuboradi. Bitta foydalanuvchining
+    barcha updatelari doim bitta workerga tushadi (FSM keshi, obuna keshi
+    va update tartibi shu workerda qoladi).
+    """
+
+    def __init__(self, queues: List[Any]):
+        self.queues = queues
+
+    async def __call__(self, handler, event: Update, data: Dict[str, Any]) -> Any:
+        user = data.get('event_from_user')
+        chat = data.get('event_chat')
+        key = user.id if user else (chat.id if chat else 0)
+        self.queues[key % len(self.queues)].put(event.model_dump(mode='json', exclude_unset=True))
+        return None
+
+
+class WorkerPool:
+    """
+    N ta worker protsessi. Har bir worker `target(index, queue)` ni ishga
+    tushiradi - u o'zining Bot, Dispatcher va Database ulanishlarini yaratadi
+    (umumiy WAL bazaga). Protsesslar spawn usulida yaratiladi.
+    """
+
+    def __init__(self, count: int, target: Callable[[int, Any], None]):
+        self.count = count
+        self.target = target
+        self._context = multiprocessing.get_context('spawn')
+        self.queues = [self._context.Queue() for _ in range(count)]
+        self.processes: List[multiprocessing.Process] = []
+
+    def start(self):
+        for index, worker_queue in enumerate(self.queues):
+            process = self._context.Process(
+                target=self.target,
+                args=(index, worker_queue),
+                name=f"bot-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+        logger.info(f"Started {self.count} worker processes")
+
+    def dispatcher(self) -> Dispatcher:
+        """Faqat updatelarni workerlarga taqsimlaydigan dispatcher"""
+        forward = Dispatcher()
+        forward.update.outer_middleware(ShardingMiddleware(self.queues))
+        return forward
+
+    def stop(self, timeout: float = 60.0):
+        """Workerlarga to'xtash signalini yuborish va ular navbatni tugatishini kutish"""
+        for worker_queue in self.queues:
+            worker_queue.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in time, terminating")
+                process.terminate()
+        logger.info("Worker processes stopped")
+
+
+def _next_update(worker_queue, parent_pid: int):
+    """Navbatdan update olish; supervisor o'lgan bo'lsa None (to'xtash)"""
+    while True:
+        try:
+            return worker_queue.get(timeout=1.0)
+        except queue_module.Empty:
+            if os.getppid() != parent_pid:
+                return None
+
+
+async def serve_worker(
+    dp: Dispatcher,
+    bot: Bot,
+    worker_queue,
+    max_concurrency: int = 50,
+    refresh: Optional[Callable[[], Awaitable[None]]] = None,
+    refresh_interval: float = 30.0,
+):
+    """
+    Worker tsikli: supervisordan kelgan updatelarni dp.feed_raw_update orqali
+    ishlash. `refresh` (masalan, xodimlar keshi) har `refresh_interval`
+    soniyada chaqiriladi - boshqa workerlardagi o'zgarishlarni ko'rish uchun.
+
+    SIGINT/SIGTERM e'tiborga olinmaydi: worker supervisor yuborgan None
+    signalidan keyin navbatdagi va boshlangan updatelarni tugatib to'xtaydi.
+    """
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, signal.SIG_IGN)
+
+    loop = asyncio.get_running_loop()
+    parent_pid = os.getppid()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = set()
+
+    async def handle(update: Dict[str, Any]):
+        async with semaphore:
+            try:
+                await dp.feed_raw_update(bot, update)
+            except Exception as e:
+                logger.error(f"Error handling update {update.get('update_id')}: {e}")
+
+    async def refresher():
+        while True:
+            await asyncio.sleep(refresh_interval)
+            try:
+                await refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing worker cache: {e}")
+
+    refresh_task = asyncio.create_task(refresher()) if refresh else None
+    await dp.emit_startup(bot=bot)
+    try:
+        while True:
+            update = await loop.run_in_executor(None, _next_update, worker_queue, parent_pid)
+            if update is None:
+                break
+            task = asyncio.create_task(handle(update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+    finally:
+        if refresh_task:
+            refresh_task.cancel()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()